@@ -0,0 +1,239 @@
+"""
+Analytics module for Task Manager
+Workload and completion statistics computed over columnar NumPy arrays
+
+The tasks are loaded once into arrays (course and status as integer
+codes, dates as datetime64) and every statistic is a vectorized pass over
+them: weekly load histograms with np.bincount, a course x week due-density
+matrix, overdue counts and completion lead times (due minus completed_at)
+with percentiles. The web app rebuilds the arrays from its search index
+only when the index changes; the desktop app uses its synced snapshot.
+
+Lead times need `completed_at`, which counters.py stamps on status
+changes; tasks finished before that field existed are left out of them.
+NumPy is imported on first use.
+"""
+import threading
+from datetime import datetime, timedelta
+from task_utils import ACTIVE_STATUSES, DONE_STATUSES
+
+PAST_WEEKS = 8
+FUTURE_WEEKS = 12
+
+
+class TaskColumns:
+    """
+    Task fields as parallel NumPy arrays.
+
+    Attributes:
+        courses (list): Course names; course_codes index into it.
+        statuses (list): Status names; status_codes index into it.
+        course_codes, status_codes (ndarray): int32 codes per task.
+        start, due, completed (ndarray): datetime64[s] per task (NaT when missing or invalid).
+    """
+
+    def __init__(self, courses, statuses, course_codes, status_codes, start, due, completed):
+        self.courses = courses
+        self.statuses = statuses
+        self.course_codes = course_codes
+        self.status_codes = status_codes
+        self.start = start
+        self.due = due
+        self.completed = completed
+
+    def __len__(self):
+        return len(self.due)
+
+
+def _dates(values):
+    import numpy as np
+    try:
+        return np.array(values, dtype="datetime64[s]")
+    except ValueError:
+        # One bad value should not fail the whole column
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(value, "s"))
+            except (ValueError, TypeError):
+                parsed.append(np.datetime64("NaT", "s"))
+        return np.array(parsed, dtype="datetime64[s]")
+
+
+def _date_string(value):
+    # Stored dates are "YYYY-MM-DD HH:MM:SS"; anything else becomes NaT without a slow per-value parse
+    if isinstance(value, str) and len(value) == 19 and value[4] == "-" and value[10] == " ":
+        return value
+    return None
+
+
+def _timestamp(value):
+    return value.timestamp() if isinstance(value, datetime) else float("nan")
+
+
+def _local_times(timestamps):
+    # completed_at is a UTC server timestamp while start/due are naive local times; shift by
+    # the current UTC offset (off by an hour across a DST change, which lead times can bear)
+    import numpy as np
+    seconds = np.array(timestamps, dtype=np.float64)
+    missing = np.isnan(seconds)
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    local = np.where(missing, 0, seconds + offset).astype(np.int64).astype("datetime64[s]")
+    local[missing] = np.datetime64("NaT")
+    return local
+
+
+def _codes(values):
+    # Dictionary-encodes a string column (non-strings become ""); returns (int32 codes, names)
+    import numpy as np
+    names = {}
+    codes = [names.setdefault(value if isinstance(value, str) else "", len(names)) for value in values]
+    return np.array(codes, dtype=np.int32), list(names)
+
+
+def load_columns(rows):
+    """
+    Builds the columnar arrays for a set of tasks.
+
+    Args:
+        rows (iterable): (doc_id, task) pairs.
+
+    Returns:
+        TaskColumns: The arrays.
+    """
+    tasks = [task for _, task in rows]
+    course_codes, courses = _codes([task.get("course") for task in tasks])
+    status_codes, statuses = _codes([task.get("status") for task in tasks])
+    return TaskColumns(courses, statuses, course_codes, status_codes,
+                       _dates([_date_string(task.get("start")) for task in tasks]),
+                       _dates([_date_string(task.get("due")) for task in tasks]),
+                       _local_times([_timestamp(task.get("completed_at")) for task in tasks]))
+
+
+def _lead_stats(hours):
+    import numpy as np
+    if not len(hours):
+        return {"count": 0, "on_time_rate": None, "median_hours": None, "mean_hours": None,
+                "p10_hours": None, "p90_hours": None}
+    p10, median, p90 = np.percentile(hours, [10, 50, 90])
+    return {"count": int(len(hours)), "on_time_rate": float(np.mean(hours >= 0)),
+            "median_hours": round(float(median), 1), "mean_hours": round(float(np.mean(hours)), 1),
+            "p10_hours": round(float(p10), 1), "p90_hours": round(float(p90), 1)}
+
+
+def compute(columns, now=None, past_weeks=PAST_WEEKS, future_weeks=FUTURE_WEEKS):
+    """
+    Computes workload and completion statistics.
+
+    Args:
+        columns (TaskColumns): From load_columns().
+        now (datetime): Reference time (defaults to now).
+        past_weeks (int): Full weeks before the current one in the weekly histogram.
+        future_weeks (int): Weeks after the current one in the weekly histogram.
+
+    Returns:
+        dict: {"total", "active", "completed", "overdue",
+               "weeks": [{"start", "due", "active", "done"}],
+               "courses": [{"course", "total", "active", "overdue", "due_next_7_days",
+                            "per_week", "weekly": [...], "lead_time": {...}}],
+               "lead_time": {"count", "on_time_rate", "median_hours", "mean_hours", "p10_hours", "p90_hours"}}
+    """
+    import numpy as np
+    now = now or datetime.now()
+    now64 = np.datetime64(now.replace(microsecond=0), "s")
+    n_courses = len(columns.courses)
+
+    active = np.isin(columns.status_codes,
+                     [i for i, status in enumerate(columns.statuses) if status in ACTIVE_STATUSES])
+    done = np.isin(columns.status_codes,
+                   [i for i, status in enumerate(columns.statuses) if status in DONE_STATUSES])
+    has_due = ~np.isnat(columns.due)
+    overdue = active & has_due & (columns.due < now64)
+    due_soon = active & has_due & (columns.due >= now64) & (columns.due < now64 + np.timedelta64(7, "D"))
+
+    # Weekly histograms: bucket = whole weeks since the Monday `past_weeks` weeks ago
+    monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    first = np.datetime64(monday - timedelta(weeks=past_weeks), "s")
+    n_weeks = past_weeks + 1 + future_weeks
+    week = np.full(len(columns), -1, dtype=np.int64)
+    week[has_due] = (columns.due[has_due] - first) // np.timedelta64(7, "D")
+    in_range = (week >= 0) & (week < n_weeks)
+    weekly_due = np.bincount(week[in_range], minlength=n_weeks)
+    weekly_active = np.bincount(week[in_range & active], minlength=n_weeks)
+    weekly_done = np.bincount(week[in_range & done], minlength=n_weeks)
+    # Course x week due-density matrix in one bincount
+    density = np.bincount(columns.course_codes[in_range] * n_weeks + week[in_range],
+                          minlength=n_courses * n_weeks).reshape(n_courses, n_weeks)
+
+    per_course_total = np.bincount(columns.course_codes, minlength=n_courses)
+    per_course_active = np.bincount(columns.course_codes[active], minlength=n_courses)
+    per_course_overdue = np.bincount(columns.course_codes[overdue], minlength=n_courses)
+    per_course_soon = np.bincount(columns.course_codes[due_soon], minlength=n_courses)
+
+    # Completion lead time in hours: positive = finished before the deadline
+    finished = done & has_due & ~np.isnat(columns.completed)
+    lead_hours = (columns.due[finished] - columns.completed[finished]) / np.timedelta64(1, "h")
+    lead_courses = columns.course_codes[finished]
+
+    weeks = [{"start": (monday + timedelta(weeks=i - past_weeks)).strftime("%Y-%m-%d"),
+              "due": int(weekly_due[i]), "active": int(weekly_active[i]), "done": int(weekly_done[i])}
+             for i in range(n_weeks)]
+    courses = []
+    for code in np.argsort(-per_course_total, kind="stable"):
+        if not columns.courses[code]:
+            continue
+        courses.append({
+            "course": columns.courses[code],
+            "total": int(per_course_total[code]),
+            "active": int(per_course_active[code]),
+            "overdue": int(per_course_overdue[code]),
+            "due_next_7_days": int(per_course_soon[code]),
+            "per_week": round(float(density[code].mean()), 2),
+            "weekly": density[code].tolist(),
+            "lead_time": _lead_stats(lead_hours[lead_courses == code]),
+        })
+
+    return {
+        "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "total": int(len(columns)),
+        "active": int(active.sum()),
+        "completed": int(done.sum()),
+        "overdue": int(overdue.sum()),
+        "weeks": weeks,
+        "courses": courses,
+        "lead_time": _lead_stats(lead_hours),
+    }
+
+
+def analyze(rows, now=None):
+    """load_columns() then compute(), for callers without a cache (e.g. the desktop app)."""
+    return compute(load_columns(rows), now)
+
+
+class AnalyticsCache:
+    """
+    Keeps the columnar arrays for the current version of a TaskIndex.
+
+    Args:
+        index (TaskIndex): The index the arrays are built from.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._columns = None
+        self._version = None
+
+    def columns(self):
+        version = self.index.version
+        with self._lock:
+            if self._version == version:
+                return self._columns
+        columns = load_columns(self.index.rows())
+        with self._lock:
+            self._columns, self._version = columns, version
+        return columns
+
+    def compute(self, now=None):
+        """compute() over the cached arrays; they are rebuilt only after the index changed."""
+        return compute(self.columns(), now)
@@ -0,0 +1,142 @@
+"""
+Archive module for Task Manager
+Moves finished history out of the hot `tasks` collection into `tasks_archive`
+
+A task is archived once it is Completed or Graded, or is a recurring
+instance, and its due date is more than ARCHIVE_AFTER_DAYS days in the
+past. Each move copies the task to the archive under the same ID and
+deletes it from `tasks` in one batch, leaving a deletion tombstone (so
+incremental sync drops it) and decrementing the dashboard counters.
+Code that creates missing recurring occurrences checks is_archived() so
+archived ones are not recreated.
+
+The web app runs this daily; run it by hand with:
+
+    python archive.py [--days N]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from firestore_utils import get_db
+from task_utils import DONE_STATUSES, STORAGE_FORMAT
+from sync import stamp, deletions_col, BATCH_LIMIT
+import counters
+
+ARCHIVE_COLLECTION = "tasks_archive"
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_PAGE_SIZE = 50
+
+# Archive copy, task delete and tombstone per task, plus one counters write per batch
+_TASKS_PER_BATCH = (BATCH_LIMIT - 1) // 3
+
+
+def archive_col(col, db=None):
+    """Returns the archive collection that sits next to a tasks collection."""
+    parent = col.parent
+    if parent is not None:
+        return parent.collection(ARCHIVE_COLLECTION)
+    return (db or get_db()).collection(ARCHIVE_COLLECTION)
+
+
+def is_archivable(task, cutoff):
+    """
+    Checks whether a task is finished history that should leave the hot collection.
+
+    Args:
+        task (dict): Task fields.
+        cutoff (str): Due date (STORAGE_FORMAT) before which finished tasks are archived.
+    """
+    due = task.get("due")
+    if not isinstance(due, str) or due >= cutoff:
+        return False
+    return task.get("status") in DONE_STATUSES or bool(task.get("is_recurring_instance"))
+
+
+def archive_tasks(col, days=ARCHIVE_AFTER_DAYS):
+    """
+    Moves finished tasks due more than `days` days ago into the archive, in batches.
+
+    Args:
+        col: The tasks collection.
+        days (int): Age in days, by due date, after which finished tasks are archived.
+
+    Returns:
+        int: Number of tasks archived.
+    """
+    from firebase_admin import firestore
+    db = get_db()
+    cutoff = (datetime.now() - timedelta(days=days)).strftime(STORAGE_FORMAT)
+    target = archive_col(col)
+    tombstones = deletions_col(col)
+
+    # A single range filter needs no composite index; status is checked here
+    docs = [doc for doc in col.where("due", "<", cutoff).stream() if is_archivable(doc.to_dict(), cutoff)]
+
+    archived = 0
+    for i in range(0, len(docs), _TASKS_PER_BATCH):
+        batch = db.batch()
+        delta = None
+        for doc in docs[i:i + _TASKS_PER_BATCH]:
+            task = doc.to_dict()
+            batch.set(target.document(doc.id), {**task, "archived_at": firestore.SERVER_TIMESTAMP})
+            batch.delete(doc.reference)
+            batch.set(tombstones.document(doc.id), stamp({"task_id": doc.id}))
+            delta = counters.diff(task, None, delta)
+        counters.write_delta(batch, col, delta)
+        batch.commit()
+        archived += len(docs[i:i + _TASKS_PER_BATCH])
+    if archived:
+        print(f"[INFO] Archived {archived} finished tasks due before {cutoff}.")
+    return archived
+
+
+def is_archived(col, name, due):
+    """
+    Checks whether a task with this name and due time was archived.
+
+    The desktop app's reminder loop creates a recurring task's next occurrence
+    when it is missing from `tasks`; an occurrence that was archived is not
+    missing and must not be created again.
+
+    Args:
+        col: The tasks collection.
+        name (str): Task name.
+        due (str): Due date (STORAGE_FORMAT).
+    """
+    query = archive_col(col).where("name", "==", name).where("due", "==", due).limit(1)
+    return any(True for _ in query.stream())
+
+
+def archive_page_query(col, after=None, page_size=ARCHIVE_PAGE_SIZE, db=None):
+    """
+    Builds the query for one page of archived tasks, most recently due first.
+
+    Args:
+        col: The tasks collection.
+        after: Snapshot of the last archived task on the previous page, or None for the first page.
+        page_size (int): Tasks per page.
+
+    Returns:
+        Query: Stream it with the sync or async client; a full page means there may be more.
+    """
+    from firebase_admin import firestore
+    query = archive_col(col, db).order_by("due", direction=firestore.Query.DESCENDING)
+    if after is not None and after.exists:
+        query = query.start_after(after)
+    return query.limit(page_size)
+
+
+def archive_count(col, db=None):
+    """Counts archived tasks with an aggregation query (sync client)."""
+    return int(archive_col(col, db).count().get()[0][0].value)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from firestore_utils import get_tasks_col
+
+    load_dotenv()
+    days = ARCHIVE_AFTER_DAYS
+    if "--days" in sys.argv:
+        days = int(sys.argv[sys.argv.index("--days") + 1])
+    print(f"✅ Archived {archive_tasks(get_tasks_col(), days)} tasks finished more than {days} days ago.")
@@ -0,0 +1,242 @@
+"""
+Assets module for Task Manager
+Serves the content-hashed static bundles and compresses text responses
+
+build_assets.py writes static/dist/<name>.<hash>.<ext> with .gz and .br
+variants next to each file and a manifest.json mapping names to them.
+Templates link assets through asset_url(name); hashed files are served
+with a one-year immutable Cache-Control (their URL changes whenever
+their content does) in the best encoding the browser accepts, so no
+compression happens per request. Without a manifest the templates fall
+back to the CDN links and static/src files.
+
+HTML, JSON and calendar responses are compressed on the fly (brotli when
+the optional `brotli` package is installed, otherwise gzip).
+"""
+import gzip
+import json
+import os
+import threading
+from metrics import inc, describe
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE_TYPES = ("text/html", "application/json", "text/calendar", "text/plain")
+# Smaller bodies fit in one packet anyway
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Dynamic responses use fast settings; build_assets.py uses the maximum for static files
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+_lock = threading.Lock()
+_manifest = None
+_manifest_mtime = None
+
+describe("compressed_responses_total", "Responses compressed on the fly, by encoding")
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def manifest():
+    """
+    Returns the build manifest ({name: hashed file name}), or None if build_assets.py has not run.
+
+    The file is re-read when it changes, so a rebuild takes effect without a restart.
+    """
+    global _manifest, _manifest_mtime
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return None
+    with _lock:
+        if mtime != _manifest_mtime:
+            try:
+                with open(MANIFEST_PATH) as f:
+                    _manifest = json.load(f)["files"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[ERROR] Could not read {MANIFEST_PATH}: {e}")
+                _manifest = None
+            _manifest_mtime = mtime
+        return _manifest
+
+
+def accepted_encodings(accept_encoding):
+    """Parses an Accept-Encoding header into the set of encodings with a non-zero q-value."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding, available=("br", "gzip")):
+    """Picks the first encoding in `available` the client accepts (None for identity)."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def asset_file(filename, accept_encoding):
+    """
+    Finds the file to send for a hashed asset.
+
+    Args:
+        filename (str): Hashed file name from the manifest.
+        accept_encoding (str): The request's Accept-Encoding header.
+
+    Returns:
+        tuple: (path, content encoding or None), or None if the asset does not exist.
+    """
+    if "/" in filename or "\\" in filename or filename.startswith(".") or filename == "manifest.json":
+        return None
+    path = os.path.join(DIST_DIR, filename)
+    if not os.path.isfile(path):
+        return None
+    available = [encoding for encoding, suffix in ENCODING_SUFFIXES.items() if os.path.isfile(path + suffix)]
+    encoding = choose_encoding(accept_encoding, available)
+    if encoding is None:
+        return path, None
+    return path + ENCODING_SUFFIXES[encoding], encoding
+
+
+def compress(body, accept_encoding):
+    """
+    Compresses a response body for a client.
+
+    Returns:
+        tuple: (body, content encoding or None); the body is unchanged when not worth compressing.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    brotli = _brotli()
+    encoding = choose_encoding(accept_encoding, ("br", "gzip") if brotli else ("gzip",))
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return body, None
+    inc("compressed_responses_total", encoding=encoding)
+    return compressed, encoding
+
+
+def should_compress(status_code, mimetype, headers):
+    return (200 <= status_code < 300 and status_code != 204 and mimetype in COMPRESSIBLE_TYPES
+            and "Content-Encoding" not in headers)
+
+
+def add_vary(headers):
+    vary = headers.get("Vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+def template_globals(url_for):
+    """
+    Returns the Jinja globals the templates use: asset_url(name) and assets_built.
+
+    Args:
+        url_for: The framework's url_for (Flask or Quart).
+    """
+    def asset_url(name):
+        files = manifest()
+        if files and name in files:
+            return url_for("asset", filename=files[name])
+        return url_for("static", filename=f"src/{name}")
+
+    class _Built:
+        # Re-checked at render time so a build (or a deleted manifest) takes effect at once
+        def __bool__(self):
+            return manifest() is not None
+
+    return {"asset_url": asset_url, "assets_built": _Built()}
+
+
+def init_app(app):
+    """Adds /assets/<filename>, the template globals and on-the-fly compression to a Flask app."""
+    from flask import request, send_file, url_for, abort
+
+    app.jinja_env.globals.update(template_globals(url_for))
+
+    @app.route('/assets/<filename>')
+    def asset(filename):
+        found = asset_file(filename, request.headers.get("Accept-Encoding"))
+        if found is None:
+            abort(404)
+        path, encoding = found
+        # The mimetype comes from the original name, not the .gz/.br suffix
+        response = send_file(path, mimetype=_mimetype(filename), conditional=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = IMMUTABLE
+        add_vary(response.headers)
+        return response
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or not should_compress(response.status_code, response.mimetype,
+                                                              response.headers):
+            return response
+        body, encoding = compress(response.get_data(), request.headers.get("Accept-Encoding"))
+        add_vary(response.headers)
+        if encoding:
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def init_async_app(app):
+    """init_app() for the Quart app (async_web_app.py)."""
+    from quart import request, send_file, url_for, abort
+
+    app.jinja_env.globals.update(template_globals(url_for))
+
+    @app.route('/assets/<filename>')
+    async def asset(filename):
+        found = asset_file(filename, request.headers.get("Accept-Encoding"))
+        if found is None:
+            abort(404)
+        path, encoding = found
+        response = await send_file(path, mimetype=_mimetype(filename), conditional=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = IMMUTABLE
+        add_vary(response.headers)
+        return response
+
+    @app.after_request
+    async def compress_response(response):
+        if not should_compress(response.status_code, response.mimetype, response.headers):
+            return response
+        body, encoding = compress(await response.get_data(), request.headers.get("Accept-Encoding"))
+        add_vary(response.headers)
+        if encoding:
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def _mimetype(filename):
+    import mimetypes
+    mimetype, _ = mimetypes.guess_type(filename)
+    if filename.endswith(".woff2"):
+        return "font/woff2"
+    return mimetype or "application/octet-stream"
@@ -0,0 +1,551 @@
+"""
+Task Manager Web App (async)
+An ASGI variant of web_app.py built on Quart and the async Firestore client.
+It serves the same routes and templates for the same users; independent
+Firestore queries in a request run concurrently instead of pinning a
+worker thread each.
+
+Tenants, sign-in, writes, background jobs and reminders are shared with
+web_app.py through web_common.py. Reads use the async client; the shared
+write helpers use the sync client and run on a worker thread.
+
+Run with:  hypercorn async_web_app:app --bind 0.0.0.0:8081
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from quart import (Quart, render_template, request, redirect, url_for, flash, send_file, Response, jsonify, abort, g,
+                   session)
+from dotenv import load_dotenv
+from firestore_utils import get_db, get_async_db
+from task_utils import format_task, recurrence_from_form, DONE_STATUSES, ACTIVE_STATUSES, STORAGE_FORMAT
+import counters
+import page_cache
+import web_common
+from web_common import TenantRegistry
+from search_index import TaskIndex
+from calendar_feed import build_feed, not_modified, response_headers
+from analytics import analyze, PAST_WEEKS
+from interval_index import IntervalIndex, week_start, week_view, BUSY_THRESHOLD
+import jobs
+from task_import import is_supported
+from archive import archive_col, archive_page_query, ARCHIVE_PAGE_SIZE
+from page_cache import async_cached_page
+from metrics import render_prometheus
+import assets
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Quart app
+app = Quart(__name__)
+app.secret_key = web_common.SECRET_KEY
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # upload limit for /import
+# Hashed, precompressed static bundles (build_assets.py) and compressed HTML
+assets.init_async_app(app)
+
+# Initialize Firestore clients: async for reads, sync for the shared writes and listeners
+try:
+    db = get_db()
+    async_db = get_async_db()
+    print("[DEBUG] Async Firestore client ready.")
+except Exception as e:
+    print(f"[ERROR] Firestore connection failed: {e}")
+    db = None
+    async_db = None
+
+# --- Tenants ---
+# Same users as web_app.py (see web_common): each request acts as its session's,
+# trusted proxy's or the default user and only touches that user's collection.
+registry = TenantRegistry(db, async_db)
+
+def current_tenant():
+    """Returns the Tenant for this request (400 for an invalid user ID, sign-in page if required)."""
+    if "tenant" not in g:
+        uid = web_common.request_user(request, session)
+        if uid is None:
+            abort(redirect(url_for('login', next=request.full_path if request.query_string else request.path)))
+        g.tenant = registry.get(uid)
+    return g.tenant
+
+def feed_tenant():
+    """Returns the Tenant a calendar feed is for: ?user= with its token, else the request's user."""
+    uid = web_common.calendar_user(request.args)
+    if uid is None:
+        return current_tenant()
+    tenant = registry.get(uid)
+    tenant.cache.start_listener()
+    return tenant
+
+def request_cache():
+    # The page cache hook runs before every request, including public ones and unknown URLs (404)
+    if not web_common.acts_as_user(request.endpoint):
+        return None
+    return current_tenant().cache
+
+page_cache.init_async_app(app, request_cache)
+
+@app.context_processor
+async def inject_user():
+    return web_common.template_context(g.tenant.uid if "tenant" in g else "")
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    """Signs a browser session in as a user (password set with `python tenants.py set-password`)."""
+    if web_common.TENANT_HEADER:
+        abort(404)
+    form = await request.form
+    next_url = web_common.safe_next(form.get('next') or request.args.get('next', ''), url_for('index'))
+    if request.method == 'POST':
+        uid = form.get('user', '').strip()
+        error = await asyncio.to_thread(web_common.sign_in_error, uid, form.get('password', ''), db)
+        if error is None:
+            session.clear()
+            session['user'] = uid
+            return redirect(next_url)
+        await flash(error, 'error')
+    return await render_template('login.html', next_url=next_url)
+
+@app.route('/logout')
+async def logout():
+    session.pop('user', None)
+    return redirect(url_for('login') if web_common.REQUIRE_LOGIN else url_for('index'))
+
+# --- Helper Functions ---
+async def load_docs(query):
+    return [doc async for doc in query.stream()]
+
+async def load_tasks(tenant, query):
+    """Streams a query into formatted task dicts (pending status changes applied) sorted by due date."""
+    return web_common.display_tasks(tenant, await load_docs(query))
+
+async def search_tasks(tenant, query, limit=None):
+    """Searches task names and courses in memory; reads Firestore only while the listener is not running."""
+    if tenant.indexed():
+        return tenant.search_index.search(query, limit)
+    fallback = TaskIndex()
+    fallback.sync([(doc.id, doc.to_dict()) async for doc in tenant.async_col.stream()])
+    return fallback.search(query, limit)
+
+async def current_intervals(tenant, due_from=None):
+    """Returns the interval index, or one built from Firestore (tasks due from due_from) while the listener is not running."""
+    if tenant.cache.listener_active() and tenant.interval_index.loaded:
+        return tenant.interval_index
+    fallback = IntervalIndex()
+    query = tenant.async_col.where("due", ">=", due_from) if due_from else tenant.async_col
+    fallback.sync([(doc.id, doc.to_dict()) async for doc in query.stream()])
+    return fallback
+
+# --- Routes ---
+@app.route('/')
+@async_cached_page('index')
+async def index():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('index.html', tasks=[], total_count=0, active_count=0, completed_count=0,
+                                     overdue_count=0)
+
+    tasks = []
+    active_tasks = []
+    completed_tasks = []
+    summary = None
+
+    try:
+        # Both halves of the list and the counters are fetched concurrently (every task has a status)
+        active_docs, completed_docs, summary = await asyncio.gather(
+            load_docs(tenant.async_col.where("status", "not-in", DONE_STATUSES)),
+            load_docs(tenant.async_col.where("status", "in", DONE_STATUSES)),
+            counters.async_read_summary(async_db, tenant.async_col),
+        )
+        # Split again after applying pending status changes
+        tasks = web_common.display_tasks(tenant, active_docs + completed_docs)
+        active_tasks = [task for task in tasks if task.get("status") not in DONE_STATUSES]
+        completed_tasks = [task for task in tasks if task.get("status") in DONE_STATUSES]
+        tasks = active_tasks + completed_tasks
+    except Exception as e:
+        await flash(f"Error loading tasks: {e}", "error")
+        print(f"[ERROR] Exception in index(): {e}")
+
+    if not summary or not summary["total"]:
+        # Counters not built yet (run `python counters.py --reconcile`) or unavailable
+        return await render_template('index.html', tasks=tasks, total_count=len(tasks), active_count=len(active_tasks),
+                                     completed_count=len(completed_tasks), overdue_count=0)
+    return await render_template('index.html', tasks=tasks, total_count=summary["total"], active_count=summary["active"],
+                                 completed_count=summary["completed"], overdue_count=summary["overdue"])
+
+@app.route('/add_task', methods=['GET', 'POST'])
+async def add_task():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('add_task.html')
+
+    if request.method == 'POST':
+        form = await request.form
+        try:
+            task = web_common.task_from_form(form)
+            if task is None:
+                await flash('All fields are required!', 'error')
+                return await render_template('add_task.html')
+            task.update({"recurrence_days": recurrence_from_form(form), "is_recurring_instance": False,
+                         "reminder_hours": int(form.get('reminder_hours', 24)), "reminder_sent": 0})
+            warning = await asyncio.to_thread(web_common.add_task, tenant, task)
+
+            await flash('Task added successfully!', 'success')
+            if warning:
+                await flash(warning, 'warning')
+            return redirect(url_for('index'))
+
+        except ValueError as e:
+            await flash(f'Invalid date/time format: {e}', 'error')
+        except Exception as e:
+            await flash(f'Error adding task: {e}', 'error')
+
+    return await render_template('add_task.html')
+
+@app.route('/edit_task/<task_id>', methods=['GET', 'POST'])
+async def edit_task(task_id):
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    if request.method == 'POST':
+        form = await request.form
+        try:
+            fields = web_common.task_from_form(form)
+            if fields is None:
+                await flash('All fields are required!', 'error')
+                return redirect(url_for('edit_task', task_id=task_id))
+            await asyncio.to_thread(web_common.update_task, tenant, task_id, fields)
+
+            await flash('Task updated successfully!', 'success')
+            return redirect(url_for('index'))
+
+        except ValueError as e:
+            await flash(f'Invalid date/time format: {e}', 'error')
+        except Exception as e:
+            await flash(f'Error updating task: {e}', 'error')
+
+    try:
+        doc = await tenant.async_col.document(task_id).get()
+        if doc.exists:
+            task = tenant.write_queue.overlay(doc.id, doc.to_dict())
+            task['id'] = doc.id
+            return await render_template('edit_task.html', task=web_common.edit_form_task(task))
+        else:
+            await flash('Task not found!', 'error')
+            return redirect(url_for('index'))
+    except Exception as e:
+        await flash(f'Error loading task: {e}', 'error')
+        return redirect(url_for('index'))
+
+@app.route('/delete_task/<task_id>')
+async def delete_task(task_id):
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    try:
+        await asyncio.to_thread(web_common.delete_task, tenant, task_id)
+        await flash('Task deleted successfully!', 'success')
+    except Exception as e:
+        await flash(f'Error deleting task: {e}', 'error')
+
+    return redirect(url_for('index'))
+
+@app.route('/update_status/<task_id>/<status>')
+async def update_status(task_id, status):
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    try:
+        # Only queues the change (write-behind), so there is nothing to wait for
+        web_common.update_status(tenant, task_id, status)
+        await flash('Status updated successfully!', 'success')
+    except Exception as e:
+        await flash(f'Error updating status: {e}', 'error')
+
+    return redirect(url_for('index'))
+
+@app.route('/bulk', methods=['POST'])
+async def bulk_update():
+    """Applies a status change, reschedule or delete to every selected task in one batched commit."""
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    form = await request.form
+    task_ids = form.getlist('task_ids')
+    if not task_ids:
+        await flash('Select at least one task.', 'error')
+        return redirect(request.referrer or url_for('index'))
+
+    try:
+        message = await asyncio.to_thread(web_common.bulk_update, tenant, task_ids, form.get('action', ''),
+                                          form.get('days'))
+        await flash(message, 'success')
+    except ValueError as e:
+        await flash(str(e), 'error')
+    except Exception as e:
+        await flash(f'Error updating tasks: {e}', 'error')
+
+    return redirect(request.referrer or url_for('index'))
+
+@app.route('/search')
+async def search():
+    tenant = current_tenant()
+    query = request.args.get('q', '').strip()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('search.html', tasks=[], query=query)
+
+    tasks = []
+    try:
+        tasks = [format_task(dict(task, id=doc_id)) for doc_id, task in await search_tasks(tenant, query)]
+    except Exception as e:
+        await flash(f"Error searching tasks: {e}", "error")
+
+    return await render_template('search.html', tasks=tasks, query=query)
+
+@app.route('/search/suggest')
+async def search_suggest():
+    tenant = current_tenant()
+    if tenant.col is None:
+        return jsonify([])
+    suggestions = []
+    for doc_id, task in await search_tasks(tenant, request.args.get('q', ''), limit=10):
+        task = format_task(dict(task, id=doc_id))
+        suggestions.append({"id": doc_id, "name": task.get("name"), "course": task.get("course"),
+                            "due_formatted": task.get("due_formatted")})
+    return jsonify(suggestions)
+
+async def calendar_response(tenant, course=None):
+    if tenant.col is None:
+        return Response("Database connection error", status=503)
+    if tenant.indexed():
+        body, etag, last_modified = tenant.calendar_feeds.get(course)
+    else:
+        rows = [(doc.id, doc.to_dict()) async for doc in tenant.async_col.stream()]
+        body, etag, last_modified = build_feed(rows, course)
+    headers = response_headers(etag, last_modified)
+    if not_modified(request.headers, etag, last_modified):
+        return Response("", status=304, headers=headers)
+    return Response(body, mimetype='text/calendar', headers=headers)
+
+@app.route('/calendar.ics')
+async def calendar_ics():
+    return await calendar_response(feed_tenant())
+
+@app.route('/calendar/<course>.ics')
+async def course_calendar_ics(course):
+    return await calendar_response(feed_tenant(), course)
+
+@app.route('/analytics')
+async def analytics_view():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+    try:
+        if tenant.indexed():
+            # Rebuilding the arrays after a change is CPU work; keep it off the event loop
+            stats = await asyncio.to_thread(tenant.analytics_cache.compute)
+        else:
+            rows = [(doc.id, doc.to_dict()) async for doc in tenant.async_col.stream()]
+            stats = await asyncio.to_thread(analyze, rows)
+    except Exception as e:
+        await flash(f"Error computing analytics: {e}", "error")
+        return redirect(url_for('index'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(stats)
+    return await render_template('analytics.html', stats=stats, past_weeks=PAST_WEEKS)
+
+@app.route('/week')
+@async_cached_page('week')
+async def week():
+    tenant = current_tenant()
+    try:
+        day = datetime.strptime(request.args.get('start', ''), "%Y-%m-%d")
+    except ValueError:
+        day = datetime.now()
+    monday = week_start(day)
+    view = {"days": [monday + timedelta(days=i) for i in range(7)], "tasks": []}
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+    else:
+        try:
+            view = week_view(await current_intervals(tenant, monday.strftime(STORAGE_FORMAT)), monday)
+        except Exception as e:
+            await flash(f"Error loading tasks: {e}", "error")
+    tasks, active_per_day = web_common.week_tasks(tenant, view)
+
+    return await render_template('week.html', days=view["days"], tasks=tasks, active_per_day=active_per_day,
+                                 busy_threshold=BUSY_THRESHOLD, today=datetime.now().strftime("%Y-%m-%d"),
+                                 prev_week=(monday - timedelta(days=7)).strftime("%Y-%m-%d"),
+                                 next_week=(monday + timedelta(days=7)).strftime("%Y-%m-%d"))
+
+@app.route('/view_by_class/<class_name>')
+@async_cached_page('view_by_class')
+async def view_by_class(class_name):
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('view_by_class.html', tasks=[], class_name=class_name, class_count=0)
+
+    tasks = []
+    try:
+        tasks = await load_tasks(tenant, tenant.async_col.where("course", "==", class_name))
+    except Exception as e:
+        await flash(f"Error loading tasks: {e}", "error")
+
+    return await render_template('view_by_class.html', tasks=tasks, class_name=class_name, class_count=len(tasks))
+
+@app.route('/view_completed')
+@async_cached_page('view_completed')
+async def view_completed():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('view_completed.html', tasks=[], completed_count=0)
+
+    tasks = []
+    archived = []
+    archived_count = 0
+    next_archive_after = None
+    show_archive = request.args.get('archive') == '1'
+
+    async def load_archive_page():
+        after_id = request.args.get('archive_after')
+        after = await archive_col(tenant.async_col, async_db).document(after_id).get() if after_id else None
+        async for doc in archive_page_query(tenant.async_col, after, db=async_db).stream():
+            task = doc.to_dict()
+            task['id'] = doc.id
+            archived.append(format_task(task))
+
+    async def count_archive():
+        nonlocal archived_count
+        result = await archive_col(tenant.async_col, async_db).count().get()
+        archived_count = int(result[0][0].value)
+
+    try:
+        tasks, _ = await asyncio.gather(
+            load_tasks(tenant, tenant.async_col.where("status", "in", DONE_STATUSES)),
+            load_archive_page() if show_archive else count_archive(),
+        )
+        if len(archived) == ARCHIVE_PAGE_SIZE:
+            next_archive_after = archived[-1]['id']
+    except Exception as e:
+        await flash(f"Error loading completed tasks: {e}", "error")
+
+    return await render_template('view_completed.html', tasks=tasks, completed_count=len(tasks), show_archive=show_archive,
+                                 archived=archived, archived_count=archived_count,
+                                 next_archive_after=next_archive_after)
+
+@app.route('/view_active')
+@async_cached_page('view_active')
+async def view_active():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return await render_template('view_active.html', tasks=[], active_count=0)
+
+    tasks = []
+    try:
+        tasks = await load_tasks(tenant, tenant.async_col.where("status", "in", ACTIVE_STATUSES))
+    except Exception as e:
+        await flash(f"Error loading active tasks: {e}", "error")
+
+    return await render_template('view_active.html', tasks=tasks, active_count=len(tasks))
+
+# --- Background Jobs ---
+# Long operations run on the jobs.py pool (see web_common); the request only
+# starts them and the browser polls /jobs/<id> for progress.
+@app.route('/delete_all_tasks')
+async def delete_all_tasks():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    job = web_common.start_job("delete_all", tenant, web_common.delete_all_job)
+    return redirect(url_for('job_status', job_id=job.id))
+
+@app.route('/export')
+async def export_to_excel():
+    tenant = current_tenant()
+    if tenant.col is None:
+        await flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    job = web_common.start_job("export", tenant, web_common.export_job, request.args.get('include_archive') == '1')
+    return redirect(url_for('job_status', job_id=job.id))
+
+@app.route('/import', methods=['GET', 'POST'])
+async def import_tasks():
+    tenant = current_tenant()
+    if request.method == 'POST':
+        if tenant.col is None:
+            await flash("Database connection error", "error")
+            return redirect(url_for('index'))
+        upload = (await request.files).get('file')
+        if upload is None or not is_supported(upload.filename):
+            await flash('Choose an .xlsx or .csv file.', 'error')
+            return await render_template('import.html')
+        job = jobs.new_job("import", tenant.uid)
+        path = jobs.file_path(job.id, os.path.splitext(upload.filename)[1].lower())
+        await upload.save(path)
+        jobs.submit(job, web_common.import_file_job, tenant, path)
+        return redirect(url_for('job_status', job_id=job.id))
+    return await render_template('import.html')
+
+@app.route('/jobs/<job_id>')
+async def job_status(job_id):
+    # Jobs are only visible to the user who started them
+    record = web_common.user_job(job_id, current_tenant().uid)
+    if record is None:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({"error": "unknown job"}), 404
+        await flash('That job has expired or does not exist.', 'error')
+        return redirect(url_for('index'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(record)
+    return await render_template('job.html', job=record)
+
+@app.route('/jobs/<job_id>/download')
+async def job_download(job_id):
+    download = web_common.job_download(job_id, current_tenant().uid)
+    if download is None:
+        await flash('That download is not available.', 'error')
+        return redirect(url_for('index'))
+    path, name = download
+    return await send_file(path, attachment_filename=name, as_attachment=True)
+
+@app.route('/metrics')
+async def metrics():
+    # Values of this worker process only; signed-in users and scrapers with METRICS_TOKEN
+    if not web_common.metrics_allowed(request, session):
+        return Response("Unauthorized\n", status=401, headers={"WWW-Authenticate": "Bearer"})
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# --- Reminders ---
+# The shared APScheduler jobs (web_common.start_scheduler) run on their own thread with
+# the sync client. TASKMANAGER_DISABLE_SCHEDULER=1 when another process already sends reminders.
+@app.before_serving
+async def start_reminders():
+    if db is not None and os.getenv("TASKMANAGER_DISABLE_SCHEDULER") != "1":
+        web_common.start_scheduler(registry)
+
+@app.after_serving
+async def stop_reminders():
+    web_common.stop_scheduler()
+    registry.suspend_all()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=8081)
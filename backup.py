@@ -0,0 +1,194 @@
+"""
+Backup module for Task Manager
+Dumps collections to compressed NDJSON shards and restores them with their document IDs
+
+A backup is a directory with one gzip-compressed NDJSON file per shard
+and a manifest.json. Each line holds a document's full path and all of
+its fields, so nothing is lost (unlike the Excel export). Collections are
+read as collection groups split with get_partitions(), one thread per
+partition, and restored with batched writes from several threads.
+
+    python backup.py backup [DIR] [--collections tasks,tasks_archive] [--workers N]
+    python backup.py restore DIR [--workers N]
+
+Restored documents get a fresh `updated_at` so clients pick them up on
+their next incremental sync, and the dashboard counters of every restored
+tasks collection are rebuilt afterwards.
+"""
+import base64
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from firestore_utils import get_db
+from sync import stamp, BATCH_LIMIT
+import counters
+
+BACKUP_COLLECTIONS = ["tasks", "tasks_archive"]
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "8"))
+MANIFEST_NAME = "manifest.json"
+
+
+# --- Encoding ---
+def _encode(value):
+    # Firestore timestamps and bytes have no JSON form; tag them so restore can rebuild them
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Cannot back up a value of type {type(value).__name__}")
+
+
+def _decode(obj):
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__bytes__" in obj and len(obj) == 1:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def encode_doc(doc):
+    """Serializes a document snapshot as one NDJSON line: {"path": ..., "data": {...}}."""
+    return json.dumps({"path": doc.reference.path, "data": doc.to_dict()}, default=_encode) + "\n"
+
+
+def decode_line(line):
+    """
+    Parses one backup line.
+
+    Returns:
+        tuple: (document path, fields)
+    """
+    record = json.loads(line, object_hook=_decode)
+    return record["path"], record["data"]
+
+
+# --- Backup ---
+def _dump_partition(query, path):
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for doc in query.stream():
+            f.write(encode_doc(doc))
+            count += 1
+    return count
+
+
+def backup(directory, collections=None, workers=BACKUP_WORKERS):
+    """
+    Writes every document in the given collection groups to NDJSON shards.
+
+    Args:
+        directory (str): Backup directory (created if missing).
+        collections (list): Collection IDs to back up, as collection groups.
+        workers (int): Partitions per collection, and threads reading them.
+
+    Returns:
+        dict: The manifest written to the directory.
+    """
+    db = get_db()
+    collections = collections or BACKUP_COLLECTIONS
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    manifest = {"created_at": datetime.now().isoformat(timespec="seconds"), "shards": []}
+
+    shards = []
+    for collection in collections:
+        partitions = list(db.collection_group(collection).get_partitions(workers))
+        for i, partition in enumerate(partitions):
+            name = f"{collection}-{i:05d}.ndjson.gz"
+            shards.append((collection, name, partition.query()))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        counts = pool.map(lambda shard: _dump_partition(shard[2], os.path.join(directory, shard[1])), shards)
+        for (collection, name, _), count in zip(shards, counts):
+            manifest["shards"].append({"collection": collection, "file": name, "documents": count})
+
+    manifest["documents"] = sum(shard["documents"] for shard in manifest["shards"])
+    manifest["seconds"] = round(time.perf_counter() - started, 2)
+    with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# --- Restore ---
+def _restore_shard(path):
+    db = get_db()
+    restored = 0
+    parents = set()
+    batch = db.batch()
+    pending = 0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            doc_path, data = decode_line(line)
+            batch.set(db.document(doc_path), stamp(data))
+            parents.add(doc_path.rsplit("/", 1)[0])
+            pending += 1
+            if pending >= BATCH_LIMIT:
+                batch.commit()
+                restored += pending
+                batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        restored += pending
+    return restored, parents
+
+
+def restore(directory, workers=BACKUP_WORKERS):
+    """
+    Writes every document in a backup back to its original path, overwriting what is there.
+
+    Args:
+        directory (str): A directory written by backup().
+        workers (int): Shards restored in parallel.
+
+    Returns:
+        int: Number of documents restored.
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    paths = [os.path.join(directory, shard["file"]) for shard in manifest["shards"]]
+
+    restored = 0
+    parents = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for count, shard_parents in pool.map(_restore_shard, paths):
+            restored += count
+            parents |= shard_parents
+
+    # Counters are not in the backup; rebuild them for each tasks collection written to
+    db = get_db()
+    for parent in sorted(parents):
+        if parent.rsplit("/", 1)[-1] == "tasks":
+            counters.reconcile(db.collection(parent))
+    return restored
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args = sys.argv[1:]
+    workers = BACKUP_WORKERS
+    collections = None
+    if "--workers" in args:
+        workers = int(args[args.index("--workers") + 1])
+    if "--collections" in args:
+        collections = args[args.index("--collections") + 1].split(",")
+    positional = [arg for i, arg in enumerate(args)
+                  if not arg.startswith("--") and (i == 0 or args[i - 1] not in ("--workers", "--collections"))]
+
+    if positional[:1] == ["backup"]:
+        target = positional[1] if len(positional) > 1 else f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        result = backup(target, collections, workers)
+        print(f"✅ Backed up {result['documents']} documents to {target} "
+              f"({len(result['shards'])} shards, {result['seconds']}s).")
+    elif positional[:1] == ["restore"] and len(positional) > 1:
+        started = time.perf_counter()
+        count = restore(positional[1], workers)
+        print(f"✅ Restored {count} documents from {positional[1]} in {time.perf_counter() - started:.2f}s.")
+    else:
+        print("Usage: python backup.py backup [DIR] [--collections tasks,tasks_archive] [--workers N]\n"
+              "       python backup.py restore DIR [--workers N]")
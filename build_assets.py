@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Builds the web app's static bundles
+Downloads the pinned Bootstrap and Font Awesome files once into
+static/vendor (commit them to build offline), concatenates them with the
+app's own files in static/src and writes content-hashed copies with
+gzip and brotli variants plus manifest.json to static/dist, which
+assets.py serves with immutable cache headers:
+
+    python build_assets.py              # build, downloading missing vendor files
+    python build_assets.py --offline    # fail instead of downloading
+
+Brotli variants need the optional `brotli` package; without it only
+.gz files are written and browsers get gzip.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import urllib.parse
+import urllib.request
+from assets import STATIC_DIR, DIST_DIR, MANIFEST_PATH
+
+VENDOR_DIR = os.path.join(STATIC_DIR, "vendor")
+# Same versions the templates load from the CDNs when no build exists
+VENDOR_FILES = {
+    "bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css",
+    "bootstrap.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js",
+    "fontawesome.min.css": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css",
+}
+# Output name -> files concatenated into it (paths under static/)
+BUNDLES = {
+    "app.css": ["vendor/bootstrap.min.css", "vendor/fontawesome.min.css", "src/app.css"],
+    "app.js": ["vendor/bootstrap.bundle.min.js", "src/app.js"],
+    "alerts.js": ["src/alerts.js"],
+    "add_task.js": ["src/add_task.js"],
+    "bulk_actions.js": ["src/bulk_actions.js"],
+    "job.js": ["src/job.js"],
+}
+# Already compressed; a .gz/.br copy would not be smaller
+PRECOMPRESSED = (".woff2", ".woff", ".png", ".jpg", ".gif")
+HASH_LENGTH = 12
+_CSS_URL_RE = re.compile(r"url\((['\"]?)([^'\")]+)\1\)")
+
+
+def _download(url, path):
+    print(f"[INFO] Downloading {url}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=60) as response:
+        data = response.read()
+    with open(path, "wb") as f:
+        f.write(data)
+    return data
+
+
+def _font_urls(css):
+    # Relative font references in the Font Awesome CSS, e.g. ../webfonts/fa-solid-900.woff2
+    return sorted({url for _, url in _CSS_URL_RE.findall(css) if not url.startswith(("data:", "http", "#"))})
+
+
+def fetch_vendor(offline=False):
+    """
+    Makes sure every vendor file (and each font the CSS references) is in static/vendor.
+
+    Args:
+        offline (bool): Raise instead of downloading missing files.
+    """
+    for name, url in VENDOR_FILES.items():
+        path = os.path.join(VENDOR_DIR, name)
+        if not os.path.exists(path):
+            if offline:
+                raise FileNotFoundError(f"{path} is missing (run without --offline to download it)")
+            _download(url, path)
+        if name.endswith(".css"):
+            with open(path, encoding="utf-8") as f:
+                css = f.read()
+            for ref in _font_urls(css):
+                font_path = os.path.join(VENDOR_DIR, "webfonts", os.path.basename(ref.split("?")[0]))
+                if not os.path.exists(font_path):
+                    if offline:
+                        raise FileNotFoundError(f"{font_path} is missing (run without --offline to download it)")
+                    _download(urllib.parse.urljoin(url, ref.split("?")[0]), font_path)
+
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write(name, data):
+    """Writes a hashed file and its compressed variants; returns (hashed name, sizes)."""
+    hashed = _hashed_name(name, data)
+    path = os.path.join(DIST_DIR, hashed)
+    with open(path, "wb") as f:
+        f.write(data)
+    sizes = {"raw": len(data), "gzip": None, "br": None}
+    if name.endswith(PRECOMPRESSED):
+        return hashed, sizes
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + ".gz", "wb") as f:
+            f.write(compressed)
+        sizes["gzip"] = len(compressed)
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+            sizes["br"] = len(compressed)
+    return hashed, sizes
+
+
+def _rewrite_font_urls(css, fonts):
+    # The bundle sits next to the hashed fonts in static/dist
+    def replace(match):
+        quote, url = match.groups()
+        name = os.path.basename(url.split("?")[0])
+        return f"url({quote}{fonts[name]}{quote})" if name in fonts else match.group(0)
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def build():
+    """
+    Writes the hashed bundles, fonts and manifest to static/dist.
+
+    Files from the previous build are kept (pages rendered before a deploy
+    still reference them); older ones are removed.
+
+    Returns:
+        dict: {output name: {"file", "raw", "gzip", "br"}} (sizes in bytes, None when not written).
+    """
+    os.makedirs(DIST_DIR, exist_ok=True)
+    try:
+        with open(MANIFEST_PATH) as f:
+            previous = set(json.load(f)["files"].values())
+    except (OSError, ValueError, KeyError):
+        previous = set()
+    report = {}
+    files = {}
+
+    fonts_dir = os.path.join(VENDOR_DIR, "webfonts")
+    fonts = {}
+    for name in sorted(os.listdir(fonts_dir)) if os.path.isdir(fonts_dir) else []:
+        with open(os.path.join(fonts_dir, name), "rb") as f:
+            hashed, sizes = _write(name, f.read())
+        fonts[name] = files[name] = hashed
+        report[name] = {"file": hashed, **sizes}
+
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(STATIC_DIR, source), encoding="utf-8") as f:
+                text = f.read()
+            if source.endswith(".css"):
+                text = _rewrite_font_urls(text, fonts)
+            # A bundled file's trailing source map comment would point at a file we do not ship
+            text = re.sub(r"/[*/]# sourceMappingURL=\S+(?: \*/)?\s*$", "", text)
+            text = text.strip()
+            if source.endswith(".js") and not text.endswith(";"):
+                # Keep the next file's leading "(" from calling this file's last expression
+                text += ";"
+            parts.append(f"/* {os.path.basename(source)} */\n{text}\n")
+        hashed, sizes = _write(name, "\n".join(parts).encode("utf-8"))
+        files[name] = hashed
+        report[name] = {"file": hashed, **sizes}
+
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"files": files}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+    keep = set(files.values()) | previous
+    for name in os.listdir(DIST_DIR):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if name != os.path.basename(MANIFEST_PATH) and base not in keep:
+            os.remove(os.path.join(DIST_DIR, name))
+    return report
+
+
+def _kb(size):
+    return "-" if size is None else f"{size / 1024:.1f} KB"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the web app's hashed, precompressed static bundles")
+    parser.add_argument("--offline", action="store_true", help="Do not download missing vendor files")
+    args = parser.parse_args()
+
+    try:
+        fetch_vendor(args.offline)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not get the vendor files: {e}")
+        sys.exit(1)
+    report = build()
+    print(f"{'asset':<28} {'raw':>10} {'gzip':>10} {'brotli':>10}")
+    for name, entry in report.items():
+        print(f"{entry['file']:<28} {_kb(entry['raw']):>10} {_kb(entry['gzip']):>10} {_kb(entry['br']):>10}")
+    if all(entry["br"] is None for entry in report.values()):
+        print("[WARN] brotli is not installed; only gzip variants were written (pip install brotli)")
+    print(f"✅ Wrote {len(report)} assets and {os.path.relpath(MANIFEST_PATH)}")
@@ -0,0 +1,247 @@
+"""
+Calendar feed module for Task Manager
+Renders tasks as an iCalendar (.ics) feed for calendar apps to subscribe to
+
+Each task becomes a VEVENT spanning its start and due times. A recurring
+task is written once with an RRULE (weekly on its recurrence days, until
+its last generated instance) instead of one event per instance. Feeds are
+built from the in-memory search index and cached per index version, so
+calendar clients polling every few minutes cost a dictionary lookup, and
+an ETag / Last-Modified pair lets them skip the download entirely.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from task_utils import STORAGE_FORMAT, DONE_STATUSES
+
+# Seconds calendar clients may reuse a feed before asking again
+CALENDAR_MAX_AGE = int(os.getenv("CALENDAR_MAX_AGE", "300"))
+
+_WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+_DAY_BITS = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6}
+
+
+# --- iCalendar formatting ---
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    # RFC 5545: lines longer than 75 octets continue on the next line after a space
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a UTF-8 sequence
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _local(dt):
+    # Task times are stored without a time zone, so they are written as floating local times
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(value, STORAGE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def recurrence_rule(task, start, due, until):
+    """
+    Builds the RRULE value for a recurring task.
+
+    Args:
+        task (dict): The parent task (recurrence_days is the weekday bitmask, -1 = due weekday).
+        start (datetime): The parent's start.
+        due (datetime): The parent's due date.
+        until (datetime): Start of the last occurrence.
+
+    Returns:
+        str: e.g. "FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20240510T090000", or None if the task does not recur.
+    """
+    recurrence_days = task.get("recurrence_days") or 0
+    rule = "FREQ=WEEKLY"
+    if recurrence_days > 0:
+        # The bitmask names due weekdays; events start `offset` days earlier
+        offset = (due.date() - start.date()).days
+        days = sorted({(weekday - offset) % 7 for bit, weekday in _DAY_BITS.items() if recurrence_days & bit})
+        if not days:
+            return None
+        rule += ";BYDAY=" + ",".join(_WEEKDAYS[day] for day in days)
+    elif recurrence_days != -1:
+        return None
+    return f"{rule};UNTIL={_local(until)}"
+
+
+def _event(doc_id, task, start, due, stamp, rule=None):
+    status = task.get("status", "Not Started")
+    course = task.get("course") or ""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{doc_id}@taskmanager",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_local(start)}",
+        f"DTEND:{_local(max(due, start))}",
+        f"SUMMARY:{_escape(task.get('name', ''))}" + (f" ({_escape(course)})" if course else ""),
+        f"DESCRIPTION:{_escape('Status: ' + status)}",
+    ]
+    if course:
+        lines.append(f"CATEGORIES:{_escape(course)}")
+    if status in DONE_STATUSES:
+        # Finished tasks no longer block time
+        lines.append("TRANSP:TRANSPARENT")
+    if isinstance(task.get("updated_at"), datetime):
+        lines.append(f"LAST-MODIFIED:{_utc(task['updated_at'])}")
+    if rule:
+        lines.append(f"RRULE:{rule}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def _collapsible(instance, parent, parent_start):
+    # An instance is covered by its parent's RRULE while it still has the parent's name and start time
+    start = _parse(instance.get("start"))
+    return (start is not None and instance.get("name") == parent.get("name")
+            and start.time() == parent_start.time())
+
+
+def build_feed(rows, course=None, now=None):
+    """
+    Renders tasks as an iCalendar document.
+
+    Args:
+        rows (iterable): (doc_id, task) pairs.
+        course (str): Only include this course, or None for every task.
+        now (datetime): DTSTAMP time (defaults to now).
+
+    Returns:
+        tuple: (body str, ETag str, Last-Modified datetime or None)
+    """
+    tasks = {doc_id: task for doc_id, task in rows if course is None or task.get("course") == course}
+
+    # Group instances under parents that are in the feed and recur
+    instances = {}
+    for doc_id, task in tasks.items():
+        parent_id = task.get("parent_task_id")
+        if task.get("is_recurring_instance") and parent_id in tasks and tasks[parent_id].get("recurrence_days"):
+            instances.setdefault(parent_id, []).append(doc_id)
+
+    stamp = _utc(now or datetime.now(timezone.utc))
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Task Manager//Tasks//EN", "CALSCALE:GREGORIAN",
+             f"X-WR-CALNAME:{_escape(course or 'Tasks')}"]
+    covered = set()
+    last_modified = None
+    for doc_id in sorted(tasks, key=lambda doc_id: tasks[doc_id].get("due", "")):
+        task = tasks[doc_id]
+        updated_at = task.get("updated_at")
+        if isinstance(updated_at, datetime) and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+        if doc_id in covered:
+            continue
+        start, due = _parse(task.get("start")), _parse(task.get("due"))
+        if start is None or due is None:
+            continue
+        rule = None
+        children = [child for child in instances.get(doc_id, []) if _collapsible(tasks[child], task, start)]
+        if children:
+            until = max(_parse(tasks[child]["start"]) for child in children)
+            rule = recurrence_rule(task, start, due, until)
+            if rule:
+                covered.update(children)
+        lines.extend(_event(doc_id, task, start, due, stamp, rule))
+    lines.append("END:VCALENDAR")
+
+    body = "\r\n".join(_fold(line) for line in lines) + "\r\n"
+    # DTSTAMP changes on every build; leave it out of the ETag
+    etag = hashlib.sha1(body.replace(stamp, "").encode("utf-8")).hexdigest()
+    return body, etag, last_modified
+
+
+def not_modified(headers, etag, last_modified):
+    """
+    Checks a request's conditional headers against a feed.
+
+    Args:
+        headers: Request headers (Flask or Quart).
+        etag (str): The feed's ETag, without quotes.
+        last_modified (datetime): The feed's Last-Modified time, or None.
+
+    Returns:
+        bool: True if the client's copy is current (answer 304).
+    """
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        tags = [(tag[2:] if tag.startswith("W/") else tag).strip('"') for tag in tags]
+        return etag in tags or "*" in tags
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def response_headers(etag, last_modified):
+    """Returns the caching headers for a feed response."""
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={CALENDAR_MAX_AGE}"}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+class FeedCache:
+    """
+    Per-process cache of rendered feeds, keyed by course and the search index version.
+
+    Args:
+        index (TaskIndex): The index the feeds are built from.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, course=None):
+        """
+        Returns a feed, rendering it only if the index changed since it was last rendered.
+
+        Returns:
+            tuple: (body, etag, last_modified), as build_feed().
+        """
+        version = self.index.version
+        with self._lock:
+            entry = self._entries.get(course)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        feed = build_feed(self.index.rows(), course)
+        with self._lock:
+            # Drop feeds for older versions; a course nobody asks for again is not kept around
+            self._entries = {key: value for key, value in self._entries.items() if value[0] == version}
+            self._entries[course] = (version, feed)
+        return feed
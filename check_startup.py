@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget check for Task Manager
+Runs each front-end under `python -X importtime` and fails when the
+import time (or, for the desktop app, time to first paint) exceeds its budget
+
+Usage:
+    python check_startup.py            # check both front-ends
+    python check_startup.py web_app    # check only the web app
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Budgets in milliseconds, measured on a developer laptop with a warm disk cache
+BUDGETS_MS = {
+    "web_app": 1500,
+    "main": 600,
+}
+
+# Modules that must not be imported at startup (they are loaded on first use)
+DEFERRED_MODULES = {
+    "web_app": ["pandas", "numpy", "openpyxl", "apscheduler"],
+    "main": ["firebase_admin", "tkcalendar", "pystray", "PIL", "requests", "numpy"],
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output.
+
+    Args:
+        stderr (str): The stderr output of the interpreter.
+
+    Returns:
+        tuple: (top-level modules as [(cumulative_us, name)], set of all imported module names)
+    """
+    top_level = []
+    imported = set()
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        imported.add(name)
+        if len(indent) == 1:
+            top_level.append((cumulative, name))
+    return top_level, imported
+
+
+def run_check(target):
+    env = dict(os.environ, TASKMANAGER_DISABLE_SCHEDULER="1", TASKMANAGER_STARTUP_CHECK="1")
+    if target == "main":
+        cmd = [sys.executable, "-X", "importtime", "main.py"]
+    else:
+        cmd = [sys.executable, "-X", "importtime", "-c", f"import {target}"]
+
+    start = time.perf_counter()
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        print(f"❌ {target}: exited with {result.returncode}")
+        print(result.stderr[-2000:])
+        return False
+
+    top_level, imported = parse_importtime(result.stderr)
+    import_ms = sum(us for us, _ in top_level) / 1000
+    paint = re.search(r"\[STARTUP\] first paint after (\d+) ms", result.stderr)
+    measured_ms = int(paint.group(1)) if paint else import_ms
+    budget = BUDGETS_MS[target]
+
+    print(f"{target}: imports {import_ms:.0f} ms" + (f", first paint {measured_ms} ms" if paint else "")
+          + f", process wall time {wall_ms:.0f} ms (budget {budget} ms)")
+    for us, name in sorted(top_level, reverse=True)[:10]:
+        print(f"    {us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    leaked = [m for m in DEFERRED_MODULES.get(target, []) if m in imported]
+    if leaked:
+        print(f"❌ {target}: imported at startup but should be deferred: {', '.join(leaked)}")
+        ok = False
+    if measured_ms > budget:
+        print(f"❌ {target}: {measured_ms:.0f} ms exceeds the {budget} ms budget")
+        ok = False
+    if ok:
+        print(f"✅ {target}: within budget")
+    return ok
+
+
+if __name__ == '__main__':
+    targets = sys.argv[1:] or list(BUDGETS_MS)
+    results = [run_check(target) for target in targets]
+    sys.exit(0 if all(results) else 1)
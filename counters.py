@@ -0,0 +1,526 @@
+"""
+Counters module for Task Manager
+Keeps dashboard totals (per status, per course and overdue) in a single
+Firestore document so they are read in O(1) instead of by counting tasks
+
+Every write path applies its change to the counters in the same batch or
+transaction as the task write, using atomic increments, so concurrent
+writers from the desktop app, web workers and import.py never overwrite
+each other's counts. reconcile() periodically compares the counters with
+Firestore count() aggregation queries and corrects any drift, also with
+increments.
+
+Overdue tasks are counted from per-hour buckets of active tasks' due
+times: a task counts as overdue once the hour after the one it is due in
+has started (so never early, at most an hour late). Buckets of hours that
+have passed are folded into a single `overdue` count, so the document
+does not grow with every hour that tasks were ever due in.
+
+Status changes that go through this module also stamp `completed_at` when
+a task is finished and clear it when the task is reopened, since they
+already read the task's previous status (used by analytics.py).
+
+Run `python counters.py --reconcile` to build the counters for an
+existing collection.
+"""
+import sys
+from datetime import datetime
+from firestore_utils import get_db
+from task_utils import ACTIVE_STATUSES, DONE_STATUSES
+from metrics import transactional
+
+COUNTERS_COLLECTION = "task_counters"
+SUMMARY_DOC = "summary"
+
+# Task fields the counters depend on; writes that touch none of them need no counter update
+COUNTED_FIELDS = ["status", "course", "due"]
+
+# Firestore allows 500 writes per commit; one of them is the counters document
+BULK_CHUNK = 499
+
+# Times reconcile() recounts when tasks change while it is counting
+RECONCILE_ATTEMPTS = 3
+
+
+def counters_doc(col, db=None):
+    """Returns the counters document that sits next to a tasks collection."""
+    parent = col.parent
+    if parent is not None:
+        return parent.collection(COUNTERS_COLLECTION).document(SUMMARY_DOC)
+    return (db or get_db()).collection(COUNTERS_COLLECTION).document(SUMMARY_DOC)
+
+
+def _hour_key(dt):
+    return dt.strftime("%Y-%m-%d %H")
+
+
+def contributions(task):
+    """
+    Returns what one task adds to the counters.
+
+    Args:
+        task (dict): The task's fields (at least those in COUNTED_FIELDS).
+
+    Returns:
+        dict: {"total": 1, "status": {...}, "course": {...}, "active_due": {...}}
+    """
+    result = {"total": 1, "status": {}, "course": {}, "active_due": {}}
+    status = task.get("status")
+    course = task.get("course")
+    # Map keys must be strings (spreadsheet imports can leave NaN in empty cells)
+    if isinstance(status, str) and status:
+        result["status"][status] = 1
+    if isinstance(course, str) and course:
+        result["course"][course] = 1
+    if status in ACTIVE_STATUSES and isinstance(task.get("due"), str):
+        # "YYYY-MM-DD HH:MM:SS" -> "YYYY-MM-DD HH"
+        result["active_due"][task["due"][:13]] = 1
+    return result
+
+
+def diff(before, after, into=None):
+    """
+    Accumulates the counter change for one task write.
+
+    Args:
+        before (dict): The task before the write, or None when it is created.
+        after (dict): The task after the write, or None when it is deleted.
+        into (dict): Delta to add to, so a batch of writes can share one counter update.
+
+    Returns:
+        dict: The accumulated delta.
+    """
+    delta = into if into is not None else {"total": 0, "status": {}, "course": {}, "active_due": {}}
+    for task, sign in ((before, -1), (after, 1)):
+        if task is None:
+            continue
+        part = contributions(task)
+        delta["total"] += sign * part["total"]
+        for group in ("status", "course", "active_due"):
+            for key, n in part[group].items():
+                delta[group][key] = delta[group].get(key, 0) + sign * n
+    return delta
+
+
+def write_delta(writer, col, delta, db=None):
+    """
+    Adds a counter update to a batch or transaction. Does nothing if the delta is empty.
+
+    Args:
+        writer: A WriteBatch or Transaction (sync or async).
+        col: The tasks collection.
+        delta (dict): Delta built with diff() (or correction()).
+        db: Firestore client, needed for a top-level collection with the async client.
+    """
+    from firebase_admin import firestore
+    data = {}
+    for field in ("total", "overdue"):
+        if delta.get(field):
+            data[field] = firestore.Increment(delta[field])
+    for group in ("status", "course", "active_due"):
+        changes = {key: firestore.Increment(n) for key, n in delta[group].items() if n}
+        if changes:
+            data[group] = changes
+    if data:
+        writer.set(counters_doc(col, db), data, merge=True)
+
+
+def _touches_counters(fields):
+    return any(field in fields for field in COUNTED_FIELDS)
+
+
+def with_completion(before, fields):
+    """
+    Adds completed_at to an update that finishes a task, or removes it when the update reopens one.
+
+    Args:
+        before (dict): The task's stored fields (at least status).
+        fields (dict): The update.
+
+    Returns:
+        dict: The update, copied if completed_at was added.
+    """
+    status = fields.get("status")
+    if status is None or before is None:
+        return fields
+    was_done = before.get("status") in DONE_STATUSES
+    if (status in DONE_STATUSES) == was_done:
+        return fields
+    from firebase_admin import firestore
+    return {**fields, "completed_at": firestore.SERVER_TIMESTAMP if not was_done else firestore.DELETE_FIELD}
+
+
+def add_task(col, task):
+    """
+    Creates a task and counts it in one batch.
+
+    Args:
+        col: The tasks collection.
+        task (dict): The task fields (already stamped).
+
+    Returns:
+        DocumentReference: The new task's reference.
+    """
+    db = get_db()
+    ref = col.document()
+    batch = db.batch()
+    batch.set(ref, task)
+    write_delta(batch, col, diff(None, task))
+    batch.commit()
+    return ref
+
+
+def update_task(col, doc_id, fields):
+    """
+    Updates a task, adjusting the counters in the same transaction when a counted field changes.
+
+    Args:
+        col: The tasks collection.
+        doc_id (str): ID of the task.
+        fields (dict): Fields passed to update() (already stamped).
+    """
+    ref = col.document(doc_id)
+    if not _touches_counters(fields):
+        ref.update(fields)
+        return
+
+    @transactional
+    def run(transaction):
+        before = ref.get(field_paths=COUNTED_FIELDS, transaction=transaction).to_dict()
+        transaction.update(ref, with_completion(before, fields))
+        if before is not None:
+            write_delta(transaction, col, diff(before, {**before, **fields}))
+
+    run(get_db().transaction())
+
+
+def _fields_for(change):
+    if callable(change):
+        return lambda doc_id, task: change(task)
+    return lambda doc_id, task: change
+
+
+def _bulk_writes(transaction, col, snapshots, fields_for, db=None):
+    """Queues the updates for one chunk of a bulk change. Returns the number of tasks updated."""
+    delta = None
+    updated = 0
+    for snap in snapshots:
+        if not snap.exists:
+            continue
+        before = snap.to_dict()
+        fields = fields_for(snap.id, before)
+        transaction.update(snap.reference, with_completion(before, fields))
+        delta = diff(before, {**before, **fields}, delta)
+        updated += 1
+    if delta is not None:
+        write_delta(transaction, col, delta, db)
+    return updated
+
+
+def update_tasks(col, doc_ids, change):
+    """
+    Applies one change to many tasks, one transaction (a single commit) per BULK_CHUNK tasks.
+
+    Args:
+        col: The tasks collection.
+        doc_ids (iterable): IDs of the tasks to update; missing ones are skipped.
+        change: Fields to set on every task, or a function(task) -> fields
+            given each task's stored fields (e.g. to shift its dates).
+
+    Returns:
+        int: Number of tasks updated.
+    """
+    return _run_bulk(col, doc_ids, _fields_for(change))
+
+
+def update_each(col, updates):
+    """
+    Applies different fields to each of many tasks, batched like update_tasks().
+
+    Args:
+        col: The tasks collection.
+        updates (dict): {doc_id: fields}.
+
+    Returns:
+        int: Number of tasks updated.
+    """
+    return _run_bulk(col, list(updates), lambda doc_id, task: updates[doc_id])
+
+
+def _run_bulk(col, doc_ids, fields_for):
+    db = get_db()
+    doc_ids = list(doc_ids)
+    updated = 0
+
+    @transactional
+    def run(transaction, refs):
+        # All reads must happen before the first write
+        snapshots = list(transaction.get_all(refs))
+        return _bulk_writes(transaction, col, snapshots, fields_for)
+
+    for i in range(0, len(doc_ids), BULK_CHUNK):
+        refs = [col.document(doc_id) for doc_id in doc_ids[i:i + BULK_CHUNK]]
+        updated += run(db.transaction(), refs)
+    return updated
+
+
+def counted_fields(col, doc_ids, db=None):
+    """Reads COUNTED_FIELDS for existing tasks. Returns {doc_id: dict}."""
+    refs = [col.document(doc_id) for doc_id in doc_ids]
+    if not refs:
+        return {}
+    return {doc.id: doc.to_dict() for doc in (db or get_db()).get_all(refs, field_paths=COUNTED_FIELDS)
+            if doc.exists}
+
+
+async def async_add_task(db, col, task):
+    """add_task() for the async Firestore client."""
+    ref = col.document()
+    batch = db.batch()
+    batch.set(ref, task)
+    write_delta(batch, col, diff(None, task), db)
+    await batch.commit()
+    return ref
+
+
+async def async_update_task(db, col, doc_id, fields):
+    """update_task() for the async Firestore client."""
+    ref = col.document(doc_id)
+    if not _touches_counters(fields):
+        await ref.update(fields)
+        return
+
+    from google.cloud.firestore import async_transactional
+
+    @async_transactional
+    async def run(transaction):
+        before = (await ref.get(field_paths=COUNTED_FIELDS, transaction=transaction)).to_dict()
+        transaction.update(ref, with_completion(before, fields))
+        if before is not None:
+            write_delta(transaction, col, diff(before, {**before, **fields}), db)
+
+    await run(db.transaction())
+
+
+async def async_update_tasks(db, col, doc_ids, change):
+    """update_tasks() for the async Firestore client."""
+    from google.cloud.firestore import async_transactional
+    doc_ids = list(doc_ids)
+    updated = 0
+
+    @async_transactional
+    async def run(transaction, refs):
+        snapshots = [snap async for snap in await transaction.get_all(refs)]
+        return _bulk_writes(transaction, col, snapshots, _fields_for(change), db)
+
+    for i in range(0, len(doc_ids), BULK_CHUNK):
+        refs = [col.document(doc_id) for doc_id in doc_ids[i:i + BULK_CHUNK]]
+        updated += await run(db.transaction(), refs)
+    return updated
+
+
+async def async_counted_fields(db, col, doc_ids):
+    """counted_fields() for the async Firestore client."""
+    refs = [col.document(doc_id) for doc_id in doc_ids]
+    if not refs:
+        return {}
+    return {doc.id: doc.to_dict() async for doc in db.get_all(refs, field_paths=COUNTED_FIELDS)
+            if doc.exists}
+
+
+def summarize(data, now=None):
+    """
+    Turns the counters document into the numbers shown on the dashboard.
+
+    Args:
+        data (dict): The counters document.
+        now (datetime): Current local time (defaults to now).
+
+    Returns:
+        dict: total, active, completed and overdue counts plus by_status and by_course maps.
+    """
+    counts = canonical(data, _hour_key(now or datetime.now()))
+    by_status = counts["status"]
+    total = counts["total"]
+    completed = sum(by_status.get(status, 0) for status in DONE_STATUSES)
+    return {
+        "total": total,
+        "active": total - completed,
+        "completed": completed,
+        "overdue": counts["overdue"],
+        "by_status": by_status,
+        "by_course": counts["course"],
+    }
+
+
+def canonical(data, current_hour):
+    """
+    Normalizes a counters document: zero entries dropped and past hours folded into `overdue`.
+
+    Args:
+        data (dict): The counters document (or counts built by reconcile()).
+        current_hour (str): The current hour as "YYYY-MM-DD HH".
+
+    Returns:
+        dict: {"total", "overdue", "status", "course", "active_due" (current and future hours only)}
+    """
+    active_due = data.get("active_due", {})
+    return {
+        "total": data.get("total", 0),
+        # A later write to a folded hour leaves a (negative) entry until the next prune_past_hours()
+        "overdue": data.get("overdue", 0) + sum(n for hour, n in active_due.items() if hour < current_hour),
+        "status": {key: n for key, n in data.get("status", {}).items() if n},
+        "course": {key: n for key, n in data.get("course", {}).items() if n},
+        "active_due": {hour: n for hour, n in active_due.items() if n and hour >= current_hour},
+    }
+
+
+def correction(live, counted):
+    """
+    Computes the increments that turn one canonical() counters dict into another.
+
+    Returns:
+        dict: A delta for write_delta(), or None if they already match.
+    """
+    delta = {field: counted[field] - live[field] for field in ("total", "overdue")}
+    for group in ("status", "course", "active_due"):
+        keys = set(live[group]) | set(counted[group])
+        delta[group] = {key: counted[group].get(key, 0) - live[group].get(key, 0) for key in keys}
+        delta[group] = {key: n for key, n in delta[group].items() if n}
+    if not any(delta[field] for field in delta):
+        return None
+    return delta
+
+
+def read_summary(col):
+    """
+    Reads the dashboard counts with a single document read, building the counters on first use.
+
+    Args:
+        col: The tasks collection.
+
+    Returns:
+        dict: See summarize().
+    """
+    doc = counters_doc(col).get()
+    if not doc.exists:
+        return summarize(reconcile(col))
+    return summarize(doc.to_dict())
+
+
+async def async_read_summary(db, col):
+    """read_summary() for the async Firestore client (counters must already exist)."""
+    doc = await counters_doc(col, db).get()
+    return summarize(doc.to_dict() if doc.exists else {})
+
+
+def _count(query):
+    return int(query.count().get()[0][0].value)
+
+
+def _count_tasks(col, known_statuses, known_courses):
+    """Counts the tasks in the counters' shape with count() queries and projection scans."""
+    statuses = set(ACTIVE_STATUSES) | set(DONE_STATUSES) | set(known_statuses)
+    by_status = {status: _count(col.where("status", "==", status)) for status in statuses}
+    by_course = {course: _count(col.where("course", "==", course)) for course in known_courses}
+    total = _count(col)
+
+    if sum(by_course.values()) != total:
+        by_course = {}
+        for task in col.select(["course"]).stream():
+            course = task.to_dict().get("course")
+            if isinstance(course, str) and course:
+                by_course[course] = by_course.get(course, 0) + 1
+
+    active_due = {}
+    for task in col.where("status", "in", ACTIVE_STATUSES).select(["due"]).stream():
+        due = task.to_dict().get("due")
+        if isinstance(due, str):
+            active_due[due[:13]] = active_due.get(due[:13], 0) + 1
+    return {"total": total, "status": by_status, "course": by_course, "active_due": active_due}
+
+
+def reconcile(col, now=None):
+    """
+    Checks the counters against count() aggregation queries and corrects any drift.
+
+    Totals per status and per course are counted server-side; the course map is
+    rebuilt from a `course`-only projection scan if it no longer adds up to the
+    total, and the overdue buckets from a `due`-only projection of active tasks.
+
+    The correction is written as increments, and only if the counters document
+    did not change while counting (every counted task write also writes it), so
+    writes that land during or after the count are never lost. If tasks keep
+    changing, it gives up after RECONCILE_ATTEMPTS tries until the next run.
+    Past hours are then folded (prune_past_hours()).
+
+    Args:
+        col: The tasks collection.
+        now (datetime): Current local time (defaults to now).
+
+    Returns:
+        dict: The counted counters, in canonical() form.
+    """
+    ref = counters_doc(col)
+    current_hour = _hour_key(now or datetime.now())
+    for attempt in range(RECONCILE_ATTEMPTS):
+        before = ref.get()
+        live = canonical(before.to_dict() if before.exists else {}, current_hour)
+        counted = canonical(_count_tasks(col, live["status"], live["course"]), current_hour)
+        after = ref.get()
+        if (after.exists, after.update_time) == (before.exists, before.update_time):
+            break
+    else:
+        print("[WARN] Tasks kept changing while counting them; counters not checked this time.")
+        return counted
+
+    delta = correction(live, counted)
+    if delta is not None:
+        if before.exists:
+            print(f"[WARN] Task counters drifted (total {live['total']} -> {counted['total']}); correcting them.")
+        batch = get_db().batch()
+        write_delta(batch, col, delta)
+        batch.commit()
+    prune_past_hours(col, now)
+    return counted
+
+
+def prune_past_hours(col, now=None):
+    """
+    Folds the active_due buckets of hours that have passed into the `overdue` count.
+
+    Runs in a transaction, so an increment to one of the buckets cannot land
+    between reading and deleting it.
+
+    Returns:
+        int: Number of buckets removed.
+    """
+    from firebase_admin import firestore
+    ref = counters_doc(col)
+    current_hour = _hour_key(now or datetime.now())
+
+    @transactional
+    def run(transaction):
+        doc = ref.get(transaction=transaction)
+        past = {hour: n for hour, n in ((doc.to_dict() or {}).get("active_due") or {}).items()
+                if hour < current_hour} if doc.exists else {}
+        if not past:
+            return 0
+        transaction.set(ref, {"overdue": firestore.Increment(sum(past.values())),
+                              "active_due": {hour: firestore.DELETE_FIELD for hour in past}}, merge=True)
+        return len(past)
+
+    return run(get_db().transaction())
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from firestore_utils import get_tasks_col
+
+    load_dotenv()
+    if "--reconcile" in sys.argv:
+        summary = summarize(reconcile(get_tasks_col()))
+        print(f"✅ {summary['total']} tasks: {summary['active']} active, {summary['completed']} completed, "
+              f"{summary['overdue']} overdue.")
+    else:
+        print("Usage: python counters.py --reconcile")
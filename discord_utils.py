@@ -2,24 +2,27 @@
 Discord utility module for Task Manager
 Handles sending messages to a Discord channel via webhooks
 """
-import requests
 import os
+import time
 from dotenv import load_dotenv
+from metrics import inc, observe
 
 # Load environment variables
 load_dotenv()
 
-def send_discord_message(message):
+def send_discord_message(message, webhook_url=None):
     """
     Sends a message to the Discord channel configured via a webhook URL.
 
     Args:
         message (str): The message content to send.
+        webhook_url (str): Webhook to post to (e.g. a user's, from tenants.webhook_url);
+            defaults to DISCORD_WEBHOOK_URL.
 
     Returns:
         bool: True if the message was sent successfully, False otherwise.
     """
-    webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+    webhook_url = webhook_url or os.getenv("DISCORD_WEBHOOK_URL")
     if not webhook_url:
         print("Error: DISCORD_WEBHOOK_URL not found in .env file")
         return False
@@ -28,12 +31,22 @@ def send_discord_message(message):
         "content": message
     }
 
-    response = requests.post(webhook_url, json=data)
+    import requests
+
+    start = time.perf_counter()
+    try:
+        response = requests.post(webhook_url, json=data)
+    except Exception:
+        inc("discord_send_failures_total")
+        raise
+    finally:
+        observe("discord_send_seconds", time.perf_counter() - start)
 
     if response.status_code == 204:
         print("Discord message sent successfully!")
         return True
     else:
+        inc("discord_send_failures_total")
         print(f"Error sending Discord message: {response.status_code} - {response.text}")
         return False
 
@@ -0,0 +1,659 @@
+"""
+Firestore fake module for Task Manager
+In-process, in-memory stand-in for the parts of the Firestore API the apps use
+
+Used by loadtest.py --local and the tests to run without a Firebase project.
+install() puts a fake `firebase_admin` package (with `firestore`) into
+sys.modules and points firestore_utils at a FakeClient, so it must run
+before anything imports firebase_admin. Supported: collections and
+documents (get/set/update/delete/add, merge, SERVER_TIMESTAMP, Increment,
+DELETE_FIELD), queries (where with == != < <= > >= in not-in, order_by,
+limit, start_after, select, count), batches, transactions, get_all and
+collection listeners, which deliver DocumentChanges from a background
+thread as the real watch stream does. Writes are serialized by one lock.
+AsyncClient serves the same data to async_web_app.py's reads.
+"""
+import copy
+import queue
+import random
+import string
+import sys
+import threading
+import types
+from datetime import datetime, timedelta, timezone
+
+_ID_CHARS = string.ascii_letters + string.digits
+# Firestore allows at most 500 writes per commit
+MAX_WRITES = 500
+
+
+# --- Sentinels ---
+class _Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+SERVER_TIMESTAMP = _Sentinel("SERVER_TIMESTAMP")
+DELETE_FIELD = _Sentinel("DELETE_FIELD")
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class NotFound(Exception):
+    """Raised by update() on a missing document, like google.api_core.exceptions.NotFound."""
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, path, filters=(), orders=(), limit=None, after=None, fields=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._after = after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = {"filters": self._filters, "orders": self._orders, "limit": self._limit,
+                 "after": self._after, "fields": self._fields}
+        state.update(changes)
+        return Query(self._client, self._path, **state)
+
+    # --- Builders ---
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator {op!r}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        return self._copy(after=document)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def count(self):
+        return _CountQuery(self)
+
+    # --- Reads ---
+    def _matches(self):
+        rows = []
+        for doc_id, data in self._client._collection_items(self._path):
+            if all(_filter(data, field, op, value) for field, op, value in self._filters):
+                rows.append((doc_id, data))
+        if self._orders:
+            rows = [row for row in rows if all(_has(row[1], field) for field, _ in self._orders)]
+        rows.sort(key=lambda row: row[0])
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: _SortKey(_get(row[1], field)), reverse=direction == Query.DESCENDING)
+        if self._after is not None:
+            after_id = self._after.id
+            for i, (doc_id, _) in enumerate(rows):
+                if doc_id == after_id:
+                    rows = rows[i + 1:]
+                    break
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def stream(self, transaction=None):
+        with self._client._lock:
+            rows = self._matches()
+            snapshots = [DocumentSnapshot(self._client.document(f"{self._path}/{doc_id}"), data, self._fields)
+                         for doc_id, data in rows]
+        return iter(snapshots)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+
+class _CountQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self, transaction=None):
+        with self._query._client._lock:
+            count = len(self._query._matches())
+        return [[types.SimpleNamespace(alias="field_1", value=count)]]
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._path.rsplit("/", 1)[-1]
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def parent(self):
+        if "/" not in self._path:
+            return None
+        return self._client.document(self._path.rsplit("/", 1)[0])
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = "".join(random.choice(_ID_CHARS) for _ in range(20))
+        return self._client.document(f"{self._path}/{document_id}")
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self._path, callback)
+
+    def list_documents(self):
+        # Like Firestore, includes documents that only exist as parents of subcollections
+        prefix = self._path + "/"
+        with self._client._lock:
+            ids = {doc_id for doc_id, _ in self._client._collection_items(self._path)}
+            ids.update(path[len(prefix):].split("/", 1)[0] for path in self._client._collections
+                       if path.startswith(prefix))
+        return [self.document(doc_id) for doc_id in sorted(ids)]
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id):
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None):
+        with self._client._lock:
+            data = self._client._read(self.path)
+            return DocumentSnapshot(self, data, field_paths)
+
+    def set(self, document_data, merge=False):
+        self._client._commit([("set", self, document_data, merge)])
+
+    def update(self, field_updates):
+        self._client._commit([("update", self, field_updates, False)])
+
+    def delete(self):
+        self._client._commit([("delete", self, None, False)])
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        self._data = copy.deepcopy(data)
+        # Commit time of the document's last write, like Firestore's update_time
+        self.update_time = reference._client._update_times.get(reference.path) if data is not None else None
+        self.create_time = self.update_time
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        return _get(self._data or {}, field)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def _add(self, write):
+        if len(self._writes) >= MAX_WRITES:
+            raise ValueError(f"A batch can contain at most {MAX_WRITES} writes")
+        self._writes.append(write)
+
+    def set(self, reference, document_data, merge=False):
+        self._add(("set", reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._add(("update", reference, field_updates, False))
+
+    def delete(self, reference):
+        self._add(("delete", reference, None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return [types.SimpleNamespace(update_time=datetime.now(timezone.utc)) for _ in writes]
+
+
+class Transaction(WriteBatch):
+    def get_all(self, references):
+        return self._client.get_all(references)
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, Query):
+            return ref_or_query.stream()
+        return iter([ref_or_query.get()])
+
+
+def transactional(fn):
+    """Runs fn(transaction, ...) and commits its writes at once (no retries: the fake never conflicts)."""
+    def wrapper(transaction, *args, **kwargs):
+        result = fn(transaction, *args, **kwargs)
+        transaction.commit()
+        return result
+    return wrapper
+
+
+# --- Values ---
+class _SortKey:
+    # Orders mixed types the way Firestore does: null < bool < number < timestamp < string < others
+    __slots__ = ("rank", "value")
+
+    def __init__(self, value):
+        if value is None:
+            self.rank = 0
+        elif isinstance(value, bool):
+            self.rank = 1
+        elif isinstance(value, (int, float)):
+            self.rank = 2
+        elif isinstance(value, datetime):
+            self.rank = 3
+        elif isinstance(value, str):
+            self.rank = 4
+        else:
+            self.rank, value = 5, repr(value)
+        self.value = value
+
+    def __lt__(self, other):
+        if self.rank != other.rank:
+            return self.rank < other.rank
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.rank == other.rank and self.value == other.value
+
+
+def _get(data, field):
+    for part in field.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _has(data, field):
+    for part in field.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return False
+        data = data[part]
+    return True
+
+
+def _comparable(a, b):
+    return _SortKey(a).rank == _SortKey(b).rank
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: _comparable(a, b) and a < b,
+    "<=": lambda a, b: _comparable(a, b) and a <= b,
+    ">": lambda a, b: _comparable(a, b) and a > b,
+    ">=": lambda a, b: _comparable(a, b) and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _filter(data, field, op, value):
+    if not _has(data, field):
+        return False
+    return _OPERATORS[op](_get(data, field), value)
+
+
+def _resolve(value, current, now):
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    if isinstance(value, dict):
+        return {key: _resolve(item, None, now) for key, item in value.items() if item is not DELETE_FIELD}
+    return copy.deepcopy(value)
+
+
+def _merge_into(target, updates, now):
+    for key, value in updates.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_into(target[key], value, now)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _merge_into(target[key], value, now)
+        else:
+            target[key] = _resolve(value, target.get(key), now)
+
+
+def _update_paths(target, updates, now):
+    # update() keys are field paths: "a.b" sets b inside map a
+    for path, value in updates.items():
+        parts = path.split(".")
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        if value is DELETE_FIELD:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = _resolve(value, node.get(parts[-1]), now)
+
+
+# --- Client ---
+class FakeClient:
+    """In-memory Firestore client. All data lives in this object."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # collection path -> {doc_id: data}
+        self._collections = {}
+        # document path -> time of its last write
+        self._update_times = {}
+        self._last_commit = datetime.min.replace(tzinfo=timezone.utc)
+        self._listeners = {}
+        self._events = queue.Queue()
+        self._dispatcher = None
+
+    def collection(self, path):
+        return CollectionReference(self, path)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        with self._lock:
+            snapshots = [DocumentSnapshot(self.document(ref.path), self._read(ref.path), field_paths)
+                         for ref in references]
+        return iter(snapshots)
+
+    def collections(self):
+        return [self.collection(path) for path in self._collections if "/" not in path]
+
+    def _collection_items(self, path):
+        return list(self._collections.get(path, {}).items())
+
+    def _read(self, path):
+        collection, doc_id = path.rsplit("/", 1)
+        return self._collections.get(collection, {}).get(doc_id)
+
+    def _commit(self, writes):
+        changes = []
+        with self._lock:
+            # Strictly increasing, so every commit gets its own update_time
+            now = max(datetime.now(timezone.utc), self._last_commit + timedelta(microseconds=1))
+            self._last_commit = now
+            # Check every update first so a failing batch writes nothing
+            for kind, ref, _, _ in writes:
+                if kind == "update" and self._read(ref.path) is None:
+                    raise NotFound(f"No document to update: {ref.path}")
+            for kind, ref, data, merge in writes:
+                collection, doc_id = ref.path.rsplit("/", 1)
+                docs = self._collections.setdefault(collection, {})
+                existed = doc_id in docs
+                if kind == "delete":
+                    self._update_times.pop(ref.path, None)
+                    if docs.pop(doc_id, None) is not None:
+                        changes.append((collection, "REMOVED", ref, None))
+                    continue
+                self._update_times[ref.path] = now
+                if kind == "set" and not merge:
+                    docs[doc_id] = {}
+                current = docs.setdefault(doc_id, {})
+                if kind == "update":
+                    _update_paths(current, data, now)
+                else:
+                    _merge_into(current, data, now)
+                changes.append((collection, "MODIFIED" if existed else "ADDED", ref, copy.deepcopy(current)))
+        if changes and self._listeners:
+            self._events.put(changes)
+
+    # --- Listeners ---
+    def _watch(self, path, callback):
+        watch = _Watch(self, path, callback)
+        with self._lock:
+            self._listeners.setdefault(path, []).append(watch)
+            initial = [_Change("ADDED", DocumentSnapshot(self.document(f"{path}/{doc_id}"), data))
+                       for doc_id, data in self._collection_items(path)]
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, daemon=True, name="firestore-fake-watch")
+                self._dispatcher.start()
+        self._events.put([(path, watch, initial)])
+        return watch
+
+    def _dispatch(self):
+        while True:
+            events = self._events.get()
+            if len(events) == 1 and isinstance(events[0][1], _Watch):
+                # The initial snapshot for a new listener
+                path, watch, initial = events[0]
+                watch._deliver(initial)
+                continue
+            by_path = {}
+            for collection, kind, ref, data in events:
+                by_path.setdefault(collection, []).append(
+                    _Change(kind, DocumentSnapshot(DocumentReference(self, ref.path), data)))
+            for collection, changes in by_path.items():
+                for watch in list(self._listeners.get(collection, [])):
+                    watch._deliver(changes)
+
+
+class _Change:
+    def __init__(self, kind, document):
+        self.type = types.SimpleNamespace(name=kind)
+        self.document = document
+
+
+class _Watch:
+    def __init__(self, client, path, callback):
+        self._client = client
+        self._path = path
+        self._callback = callback
+
+    def _deliver(self, changes):
+        try:
+            self._callback(None, changes, datetime.now(timezone.utc))
+        except Exception as e:
+            print(f"[ERROR] Fake Firestore listener failed: {e}")
+
+    def unsubscribe(self):
+        with self._client._lock:
+            listeners = self._client._listeners.get(self._path, [])
+            if self in listeners:
+                listeners.remove(self)
+
+
+# --- Async Client ---
+# The AsyncClient API over the same data, for async_web_app.py's reads. Each
+# call runs the sync fake's code in place; nothing here actually waits.
+class AsyncQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, field, op, value):
+        return AsyncQuery(self._query.where(field, op, value))
+
+    def order_by(self, field, direction=Query.ASCENDING):
+        return AsyncQuery(self._query.order_by(field, direction))
+
+    def limit(self, count):
+        return AsyncQuery(self._query.limit(count))
+
+    def start_after(self, document):
+        return AsyncQuery(self._query.start_after(document))
+
+    def select(self, field_paths):
+        return AsyncQuery(self._query.select(field_paths))
+
+    def count(self):
+        return _AsyncCountQuery(self._query.count())
+
+    async def stream(self, transaction=None):
+        for snapshot in self._query.stream():
+            yield snapshot
+
+    async def get(self, transaction=None):
+        return self._query.get()
+
+
+class _AsyncCountQuery:
+    def __init__(self, count_query):
+        self._count_query = count_query
+
+    async def get(self, transaction=None):
+        return self._count_query.get()
+
+
+class AsyncCollectionReference(AsyncQuery):
+    @property
+    def id(self):
+        return self._query.id
+
+    @property
+    def path(self):
+        return self._query.path
+
+    @property
+    def parent(self):
+        parent = self._query.parent
+        return AsyncDocumentReference(parent) if parent is not None else None
+
+    def document(self, document_id=None):
+        return AsyncDocumentReference(self._query.document(document_id))
+
+    async def add(self, document_data, document_id=None):
+        update_time, ref = self._query.add(document_data, document_id)
+        return update_time, AsyncDocumentReference(ref)
+
+
+class AsyncDocumentReference:
+    def __init__(self, reference):
+        self._reference = reference
+
+    @property
+    def id(self):
+        return self._reference.id
+
+    @property
+    def path(self):
+        return self._reference.path
+
+    @property
+    def parent(self):
+        return AsyncCollectionReference(self._reference.parent)
+
+    def collection(self, collection_id):
+        return AsyncCollectionReference(self._reference.collection(collection_id))
+
+    async def get(self, field_paths=None, transaction=None):
+        return self._reference.get(field_paths)
+
+    async def set(self, document_data, merge=False):
+        self._reference.set(document_data, merge)
+
+    async def update(self, field_updates):
+        self._reference.update(field_updates)
+
+    async def delete(self):
+        self._reference.delete()
+
+
+class AsyncWriteBatch(WriteBatch):
+    async def commit(self):
+        return WriteBatch.commit(self)
+
+
+class AsyncClient:
+    """FakeClient's data behind the firestore_async client API (reads, documents and batches)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, path):
+        return AsyncCollectionReference(self._client.collection(path))
+
+    def document(self, path):
+        return AsyncDocumentReference(self._client.document(path))
+
+    def batch(self):
+        return AsyncWriteBatch(self._client)
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        for snapshot in self._client.get_all(references, field_paths):
+            yield snapshot
+
+
+def install(client=None):
+    """
+    Makes `firebase_admin.firestore` and firestore_utils.get_db() use the fake.
+
+    Call before importing web_app (or anything else that imports firebase_admin).
+    firestore_utils.get_async_db() returns an AsyncClient over the same data.
+
+    Returns:
+        FakeClient: The client all code will share.
+    """
+    import firestore_utils
+    from metrics import instrument_client
+    client = client or FakeClient()
+    this = sys.modules[__name__]
+    package = types.ModuleType("firebase_admin")
+    package.firestore = this
+    package._apps = {"[DEFAULT]": "fake"}
+    package.initialize_app = lambda *args, **kwargs: None
+    sys.modules["firebase_admin"] = package
+    sys.modules["firebase_admin.firestore"] = this
+    # Wrapped like the real client, so batch commits show up in metrics
+    firestore_utils._db = instrument_client(client)
+    firestore_utils._async_db = AsyncClient(client)
+    return client
+
+
+def client():
+    """firebase_admin.firestore.client() equivalent; returns the installed fake client."""
+    import firestore_utils
+    return firestore_utils.get_db()
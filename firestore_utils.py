@@ -0,0 +1,54 @@
+"""
+Firestore utility module for Task Manager
+Initializes the Firebase app on first use so importing a front-end
+does not pay for firebase_admin and the Firestore client
+"""
+import os
+import threading
+from metrics import instrument_client
+
+_lock = threading.Lock()
+_db = None
+_async_db = None
+
+
+def get_db():
+    """
+    Returns the shared Firestore client, initializing Firebase on the first call.
+
+    Returns:
+        google.cloud.firestore.Client: The Firestore client (wrapped by metrics.InstrumentedClient).
+    """
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                if not firebase_admin._apps:
+                    cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json"))
+                    firebase_admin.initialize_app(cred)
+                # Batch commits are counted in metrics (collections are instrumented per use)
+                _db = instrument_client(firestore.client())
+    return _db
+
+
+def get_async_db():
+    """
+    Returns the shared async Firestore client (used by async_web_app.py).
+
+    Returns:
+        google.cloud.firestore.AsyncClient: The async Firestore client.
+    """
+    global _async_db
+    if _async_db is None:
+        get_db()
+        from firebase_admin import firestore_async
+        _async_db = firestore_async.client()
+    return _async_db
+
+
+def get_tasks_col(uid=None):
+    """Returns a user's tasks collection reference (TASKMANAGER_USER by default; see tenants.py)."""
+    from tenants import tasks_col
+    return tasks_col(uid)
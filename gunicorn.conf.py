@@ -0,0 +1,87 @@
+"""
+Gunicorn configuration for the Task Manager web app
+
+    gunicorn -c gunicorn.conf.py web_app:app
+
+The app is preloaded in the master so workers share imported modules and
+templates copy-on-write. The Firestore client is created at import but
+opens no connection until its first RPC, which happens in the workers
+after fork, so no gRPC channel is shared across processes.
+
+Exactly one worker runs the reminder scheduler: workers race for an
+exclusive lock file and the winner starts it. If that worker exits (crash,
+max_requests recycling or an upgrade), another worker takes the lock over
+within SCHEDULER_LOCK_RETRY seconds.
+
+Because the app is preloaded, `kill -HUP` only restarts the workers on the
+code the master already imported. To deploy new code without dropping
+requests, start a new master next to the old one and retire the old one:
+
+    kill -USR2 $(cat /tmp/taskmanager-gunicorn.pid)         # new master + workers on the new code
+    kill -WINCH $(cat /tmp/taskmanager-gunicorn.pid.oldbin) # old workers finish their requests and exit
+    kill -TERM $(cat /tmp/taskmanager-gunicorn.pid.oldbin)  # old master exits
+
+The scheduler lock passes to a new worker once the old one has exited.
+"""
+import fcntl
+import multiprocessing
+import os
+import threading
+import time
+
+# web_app must not start the scheduler at import: the master would own it
+os.environ["TASKMANAGER_DISABLE_SCHEDULER"] = "1"
+
+bind = os.getenv("TASKMANAGER_BIND", "0.0.0.0:8081")
+# During a USR2 upgrade the old master's pidfile is renamed to <pidfile>.oldbin
+pidfile = os.getenv("GUNICORN_PIDFILE", "/tmp/taskmanager-gunicorn.pid")
+
+# gthread: requests are I/O bound (Firestore), so a few processes with many
+# threads each beat many single-threaded sync workers. Set
+# GUNICORN_WORKER_CLASS=gevent to use greenlets instead (requires gevent).
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth; jitter avoids all restarting at once
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+SCHEDULER_LOCK = os.getenv("TASKMANAGER_SCHEDULER_LOCK", "/tmp/taskmanager-scheduler.lock")
+SCHEDULER_LOCK_RETRY = 30
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        # Let gRPC (Firestore) cooperate with gevent's event loop
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+
+
+def post_worker_init(worker):
+    def elect():
+        import web_app
+
+        lock_file = open(SCHEDULER_LOCK, "w")
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(SCHEDULER_LOCK_RETRY)
+        # Keep the file open for the worker's lifetime; the lock is released when it exits
+        worker.scheduler_lock = lock_file
+        worker.log.info("Worker %s runs the reminder scheduler", worker.pid)
+        web_app.start_scheduler()
+
+    threading.Thread(target=elect, daemon=True).start()
@@ -1,46 +1,33 @@
-import os
-import pandas as pd
-import firebase_admin
-from firebase_admin import credentials, firestore
+"""
+Imports tasks from tasks.xlsx (or a file given on the command line) into Firestore
+
+    python import.py [path/to/tasks.xlsx|tasks.csv] [--user UID]
+
+Tasks go to the --user's collection (default TASKMANAGER_USER; see tenants.py).
+
+The web app offers the same import as an upload at /import.
+"""
+import sys
 from dotenv import load_dotenv
+from firestore_utils import get_tasks_col
+from task_import import import_file
 
 load_dotenv()
 
-def import_from_excel(file_path):
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json"))
-        firebase_admin.initialize_app(cred)
-
-    db = firestore.client()
-    tasks_col = db.collection("tasks")
+def import_from_excel(file_path, uid=None):
+    tasks_col = get_tasks_col(uid)
     print("✅ Successfully connected to Firestore.")
 
     try:
-        df = pd.read_excel(file_path)
-        print(f"📄 Found {len(df)} rows in the Excel file.")
-
-        df['start'] = pd.to_datetime(df['start'])
-        df['due'] = pd.to_datetime(df['due'])
-
-        tasks_to_insert = df.to_dict('records')
-
-        for task in tasks_to_insert:
-            task['start'] = task['start'].strftime("%Y-%m-%d %H:%M:%S")
-            task['due'] = task['due'].strftime("%Y-%m-%d %H:%M:%S")
-            task.setdefault('status', 'Not Started')
-            task.setdefault('reminder_hours', 24)
-            task.setdefault('reminder_sent', 0)
-            task.setdefault('recurrence_days', 0)
-            task.setdefault('is_recurring_instance', False)
-
-        if not tasks_to_insert:
-            print("⚠️ No tasks to insert.")
+        result = import_file(tasks_col, file_path, on_progress=lambda rows: print(f"📄 {rows} rows read..."))
+        for error in result["errors"]:
+            print(f"⚠️ Skipped {error}")
+        if not result["imported"] and not result["updated"]:
+            print(f"✅ Nothing to write: {result['unchanged']} tasks already up to date.")
             return
 
-        for task in tasks_to_insert:
-            tasks_col.add(task)
-
-        print(f"✅ Successfully inserted {len(tasks_to_insert)} tasks into Firestore!")
+        print(f"✅ Added {result['imported']} and updated {result['updated']} tasks in Firestore "
+              f"({result['unchanged']} unchanged).")
 
     except FileNotFoundError:
         print(f"❌ Error: The file was not found at {file_path}")
@@ -48,5 +35,11 @@ def import_from_excel(file_path):
         print(f"❌ An error occurred: {e}")
 
 if __name__ == '__main__':
-    excel_file = 'tasks.xlsx'
-    import_from_excel(excel_file)
+    args = sys.argv[1:]
+    uid = None
+    if "--user" in args:
+        i = args.index("--user")
+        uid = args[i + 1]
+        del args[i:i + 2]
+    excel_file = args[0] if args else 'tasks.xlsx'
+    import_from_excel(excel_file, uid)
@@ -0,0 +1,281 @@
+"""
+Interval index module for Task Manager
+In-memory interval tree over task start-due windows
+
+Answers "which tasks are open during this period" in O(log n + k) without
+scanning every task: windows are kept in a treap (a randomized balanced
+binary search tree) ordered by start, and each node records the latest
+due date in its subtree so whole branches that end before the period are
+skipped. Dates are compared as stored ("YYYY-MM-DD HH:MM:SS" sorts
+chronologically), so nothing is parsed. Like the search index it is
+updated one task at a time: the web app feeds it from its Firestore
+listener and the desktop app from its synced snapshot.
+"""
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from task_utils import ACTIVE_STATUSES, STORAGE_FORMAT, DISPLAY_FORMAT
+
+# Warn when a new task would overlap this many active tasks at once
+BUSY_THRESHOLD = int(os.getenv("BUSY_THRESHOLD", "3"))
+
+
+class _Node:
+    __slots__ = ("key", "end", "max_end", "priority", "left", "right")
+
+    def __init__(self, key, end):
+        self.key = key  # (start, doc_id)
+        self.end = end
+        self.max_end = end
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+    def update(self):
+        self.max_end = self.end
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+def _split(node, key):
+    # Returns (nodes with key < key, nodes with key >= key)
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left, right):
+    # Every key in left is smaller than every key in right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def window(task):
+    """
+    Returns a task's (start, end) window as stored strings, or None if it has no usable dates.
+
+    A due date before the start is treated as a window from the due date to the start.
+    """
+    start, due = task.get("start"), task.get("due")
+    if not isinstance(start, str) or not isinstance(due, str) or not start or not due:
+        return None
+    return (start, due) if start <= due else (due, start)
+
+
+class IntervalIndex:
+    """
+    Interval tree over task windows, with overlap queries and peak-load detection.
+
+    All methods are thread-safe; the web app updates the index from the
+    Firestore listener thread while request threads query it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None
+        self._windows = {}
+        self._tasks = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._tasks)
+
+    # --- Updates ---
+    def upsert(self, doc_id, task):
+        """Adds or replaces one task."""
+        span = window(task)
+        with self._lock:
+            old = self._windows.pop(doc_id, None)
+            if old is not None:
+                self._delete((old[0], doc_id))
+            self._tasks[doc_id] = task
+            if span is not None:
+                self._windows[doc_id] = span
+                self._insert(_Node((span[0], doc_id), span[1]))
+
+    def remove(self, doc_id):
+        """Removes one task (no-op if it is not indexed)."""
+        with self._lock:
+            old = self._windows.pop(doc_id, None)
+            if old is not None:
+                self._delete((old[0], doc_id))
+            self._tasks.pop(doc_id, None)
+
+    def sync(self, rows):
+        """
+        Brings the index in line with a full task list, touching only tasks that changed.
+
+        Args:
+            rows (iterable): (doc_id, task dict) pairs.
+
+        Returns:
+            int: Number of tasks added, changed or removed.
+        """
+        seen = set()
+        changes = 0
+        for doc_id, task in rows:
+            seen.add(doc_id)
+            if self._tasks.get(doc_id) != task:
+                self.upsert(doc_id, task)
+                changes += 1
+        for doc_id in [doc_id for doc_id in self._tasks if doc_id not in seen]:
+            self.remove(doc_id)
+            changes += 1
+        self.loaded = True
+        return changes
+
+    def apply_changes(self, changes):
+        """Applies Firestore on_snapshot DocumentChanges (ADDED, MODIFIED, REMOVED)."""
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict())
+        self.loaded = True
+
+    def _insert(self, node):
+        left, right = _split(self._root, node.key)
+        self._root = _merge(_merge(left, node), right)
+
+    def _delete(self, key):
+        left, right = _split(self._root, key)
+        # right starts with the node for key (keys are unique); drop it
+        _, right = _split(right, (key[0], key[1] + "\0"))
+        self._root = _merge(left, right)
+
+    # --- Queries ---
+    def overlapping(self, start, end, active_only=False):
+        """
+        Finds tasks whose window overlaps [start, end].
+
+        Args:
+            start (str): Period start (STORAGE_FORMAT).
+            end (str): Period end (STORAGE_FORMAT).
+            active_only (bool): Only Not Started / In Progress tasks.
+
+        Returns:
+            list: (doc_id, task) pairs ordered by start.
+        """
+        with self._lock:
+            results = self._collect(start, end)
+        if active_only:
+            results = [(doc_id, task) for doc_id, task in results if task.get("status") in ACTIVE_STATUSES]
+        return results
+
+    def _collect(self, start, end):
+        # In-order walk that prunes subtrees ending before `start` and right branches starting after `end`
+        results = []
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None and node.max_end >= start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.key[0] > end:
+                break
+            if node.end >= start:
+                doc_id = node.key[1]
+                results.append((doc_id, self._tasks[doc_id]))
+            node = node.right
+        return results
+
+    def peak_load(self, start, end, exclude=None):
+        """
+        Finds the most active tasks open at the same moment within [start, end].
+
+        Args:
+            start (str): Period start (STORAGE_FORMAT).
+            end (str): Period end (STORAGE_FORMAT).
+            exclude (str): Doc ID to leave out (e.g. the task being edited).
+
+        Returns:
+            tuple: (peak count, moment the peak starts or None, overlapping active (doc_id, task) pairs)
+        """
+        tasks = [(doc_id, task) for doc_id, task in self.overlapping(start, end, active_only=True)
+                 if doc_id != exclude]
+        # Sweep the window edges clipped to the period; a window opening at the moment another closes overlaps it
+        events = []
+        for doc_id, task in tasks:
+            opens, closes = window(task)
+            events.append((max(opens, start), 0))
+            events.append((min(closes, end), 1))
+        events.sort()
+        peak, at, open_now = 0, None, 0
+        for moment, kind in events:
+            open_now += 1 if kind == 0 else -1
+            if open_now > peak:
+                peak, at = open_now, moment
+        return peak, at, tasks
+
+
+
+def busy_warning(index, task, exclude=None, threshold=BUSY_THRESHOLD):
+    """
+    Checks whether a task being saved falls in an already crowded period.
+
+    Args:
+        index (IntervalIndex): The current tasks.
+        task (dict): The new or edited task's fields (start and due).
+        exclude (str): Doc ID of the task itself, when editing.
+        threshold (int): Number of other active tasks open at once that counts as busy.
+
+    Returns:
+        str: A warning to show, or None.
+    """
+    span = window(task)
+    if span is None:
+        return None
+    peak, at, tasks = index.peak_load(span[0], span[1], exclude)
+    if peak < threshold:
+        return None
+    names = ", ".join(str(other.get("name", "?")) for _, other in tasks[:5]) + (", ..." if len(tasks) > 5 else "")
+    when = datetime.strptime(at, STORAGE_FORMAT).strftime(DISPLAY_FORMAT)
+    return f"Busy period: {peak} other active tasks are open at the same time around {when} ({names})."
+
+
+def week_start(day):
+    """Returns the Monday (midnight) of the week containing a date or datetime."""
+    day = datetime(day.year, day.month, day.day)
+    return day - timedelta(days=day.weekday())
+
+
+def week_view(index, monday):
+    """
+    Lists the tasks open during a week and which of its days each one covers.
+
+    Args:
+        index (IntervalIndex): The current tasks.
+        monday (datetime): Start of the week, from week_start().
+
+    Returns:
+        dict: {"days": [7 datetimes], "tasks": [(doc_id, task, [7 bools])]} ordered by start.
+    """
+    days = [monday + timedelta(days=i) for i in range(7)]
+    day_keys = [day.strftime("%Y-%m-%d") for day in days]
+    rows = []
+    end = (monday + timedelta(days=7) - timedelta(seconds=1)).strftime(STORAGE_FORMAT)
+    for doc_id, task in index.overlapping(monday.strftime(STORAGE_FORMAT), end):
+        opens, closes = window(task)
+        rows.append((doc_id, task, [opens[:10] <= key <= closes[:10] for key in day_keys]))
+    return {"days": days, "tasks": rows}
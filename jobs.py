@@ -0,0 +1,155 @@
+"""
+Jobs module for Task Manager
+Runs long web operations (imports, exports, delete all) on a background
+thread pool and records their progress
+
+Job records are small JSON files in JOB_DIR, so any gunicorn worker on
+the host can answer a progress poll for a job started by another worker.
+Result files (e.g. an export) are written next to them. Records and
+files older than JOB_RETENTION_SECONDS are removed as new jobs start.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+JOB_DIR = os.getenv("TASKMANAGER_JOB_DIR", os.path.join(tempfile.gettempdir(), "taskmanager-jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = 24 * 3600
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+class Job:
+    """Progress handle passed to a job function."""
+
+    def __init__(self, job_id, kind, user=""):
+        self.record = {
+            "id": job_id,
+            "kind": kind,
+            "user": user,
+            "status": "queued",
+            "done": 0,
+            "total": None,
+            "message": "",
+            "error": None,
+            "result": None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    @property
+    def id(self):
+        return self.record["id"]
+
+    def progress(self, done, total=None, message=None):
+        """Records how far the job has got (total may be None when unknown)."""
+        self.record["done"] = done
+        if total is not None:
+            self.record["total"] = total
+        if message is not None:
+            self.record["message"] = message
+        self.save()
+
+    def save(self):
+        self.record["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        path = _record_path(self.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.record, f)
+        os.replace(tmp_path, path)
+
+
+def _record_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+
+def _valid_id(job_id):
+    try:
+        return uuid.UUID(job_id).hex == job_id
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def file_path(job_id, suffix):
+    """Path of a file belonging to a job, e.g. its upload or its result."""
+    return os.path.join(JOB_DIR, f"{job_id}{suffix}")
+
+
+def _get_executor():
+    # A pool created before a gunicorn fork has no threads in the worker
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def new_job(kind, user=""):
+    """Creates a queued job record owned by a user (see tenants.py). Use its id to name upload files before calling submit()."""
+    os.makedirs(JOB_DIR, exist_ok=True)
+    cleanup()
+    job = Job(uuid.uuid4().hex, kind, user)
+    job.save()
+    return job
+
+
+def submit(job, fn, *args):
+    """
+    Runs fn(job, *args) on the pool. Its return value becomes the job's result.
+
+    Args:
+        job (Job): From new_job().
+        fn (callable): The work; call job.progress() as it goes.
+
+    Returns:
+        str: The job ID.
+    """
+    _get_executor().submit(_run, job, fn, args)
+    return job.id
+
+
+def _run(job, fn, args):
+    job.record["status"] = "running"
+    job.save()
+    try:
+        job.record["result"] = fn(job, *args)
+        job.record["status"] = "done"
+    except Exception as e:
+        print(f"[ERROR] Job {job.id} ({job.record['kind']}) failed: {e}")
+        job.record["status"] = "failed"
+        job.record["error"] = str(e)
+    job.save()
+
+
+def get(job_id):
+    """Returns a job record, or None if the ID is unknown or expired."""
+    if not _valid_id(job_id):
+        return None
+    try:
+        with open(_record_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cleanup():
+    """Removes job records and files older than JOB_RETENTION_SECONDS."""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    try:
+        names = os.listdir(JOB_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(JOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
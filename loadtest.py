@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the Task Manager web app
+Drives mixed read/write traffic from concurrent threads and reports
+throughput, error rates and p50/p95/p99 latency per operation, e.g. to
+compare the development server with gunicorn:
+
+    python start_web_app.py --dev &      # or: python start_web_app.py &
+    python loadtest.py --url http://localhost:8081 --concurrency 32 --duration 30
+
+With --local it needs no Firebase project or Discord server: it boots
+web_app.py in this process against firestore_fake.py seeded with
+--seed-tasks tasks, points DISCORD_WEBHOOK_URL at a stub server that
+counts the reminders it receives, and serves the app with Werkzeug's
+threaded server on a free port:
+
+    python loadtest.py --local --concurrency 16 --duration 20 --runs 3
+    python loadtest.py --local --duration 600 --report-every 30    # soak
+
+The traffic mix is weighted with --mix (default views=70,status=15,add=10,export=5):
+views are the page and feed GETs, status flips /update_status, add posts
+/add_task with weekly recurrence and export starts /export and polls the
+job until it finishes. HTTP errors (>= 400), failed jobs and exceptions
+count as errors.
+"""
+import argparse
+import http.server
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+VIEW_PATHS = ["/", "/view_active", "/view_completed", "/week", "/search?q=lab", "/calendar.ics", "/analytics",
+              "/view_by_class/CS%20101"]
+DEFAULT_MIX = "views=70,status=15,add=10,export=5"
+COURSES = ["CS 101", "MATH 221", "PHYS 150", "ENGL 110", "HIST 240"]
+KINDS = ["Lab", "Homework", "Essay", "Quiz", "Reading", "Project"]
+STATUSES = ["Not Started", "In Progress", "Completed"]
+EXPORT_POLL_SECONDS = 0.2
+EXPORT_TIMEOUT = 120
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_mix(text):
+    """Parses "views=70,status=15" into {"views": 70.0, "status": 15.0}, dropping zero weights."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r} (choose from {', '.join(OPERATIONS)})")
+        if float(weight) > 0:
+            mix[name] = float(weight)
+    if not mix:
+        raise ValueError("The mix has no operations")
+    return mix
+
+
+# --- HTTP ---
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time each request on its own; following the redirect would add the next page's latency
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _request(url, data=None, headers=None):
+    """Returns (status code, response headers, body); 3xx responses are returned, not followed."""
+    body = urllib.parse.urlencode(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers=headers or {})
+    try:
+        with _opener.open(req, timeout=30) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+# --- Operations ---
+# Each takes (base_url, rng, state) and returns True on success
+def op_view(base_url, rng, state):
+    status, _, _ = _request(base_url + rng.choice(state["paths"]))
+    return status < 400
+
+
+def op_status(base_url, rng, state):
+    if not state["task_ids"]:
+        return False
+    task_id = rng.choice(state["task_ids"])
+    status, _, _ = _request(f"{base_url}/update_status/{task_id}/{urllib.parse.quote(rng.choice(STATUSES))}")
+    return status < 400
+
+
+def op_add(base_url, rng, state):
+    start = datetime.now() + timedelta(days=rng.randint(-7, 28), hours=rng.randint(0, 23))
+    due = start + timedelta(days=rng.randint(1, 6))
+    form = {
+        "name": f"{rng.choice(KINDS)} {rng.randint(1, 999)}",
+        "course": rng.choice(COURSES),
+        "start_date": start.strftime("%Y-%m-%d"), "start_time": start.strftime("%H:%M"),
+        "due_date": due.strftime("%Y-%m-%d"), "due_time": due.strftime("%H:%M"),
+        "status": "Not Started",
+        "reminder_hours": "24",
+        "recurrence_type": "weekly",
+        f"recurrence_{rng.choice(['mon', 'tue', 'wed', 'thu', 'fri'])}": "on",
+    }
+    status, _, _ = _request(base_url + "/add_task", data=form)
+    # A failed add re-renders the form with 200; success redirects
+    return 300 <= status < 400
+
+
+def op_export(base_url, rng, state):
+    status, headers, _ = _request(base_url + "/export")
+    location = headers.get("Location") if headers else None
+    if not (300 <= status < 400) or not location or "/jobs/" not in location:
+        return False
+    job_url = base_url + "/jobs/" + location.rsplit("/jobs/", 1)[1]
+    deadline = time.perf_counter() + EXPORT_TIMEOUT
+    while time.perf_counter() < deadline:
+        status, _, body = _request(job_url, headers={"Accept": "application/json"})
+        if status >= 400:
+            return False
+        record = json.loads(body)
+        if record.get("status") == "done":
+            return True
+        if record.get("status") == "failed":
+            return False
+        time.sleep(EXPORT_POLL_SECONDS)
+    return False
+
+
+OPERATIONS = {"views": op_view, "status": op_status, "add": op_add, "export": op_export}
+
+
+def discover_task_ids(base_url):
+    """Finds task IDs for status flips on a remote server through /search/suggest."""
+    ids = set()
+    for word in [kind.lower() for kind in KINDS] + ["a", "e"]:
+        try:
+            status, _, body = _request(f"{base_url}/search/suggest?q={word}")
+            if status == 200:
+                ids.update(item["id"] for item in json.loads(body))
+        except (OSError, ValueError):
+            pass
+    return sorted(ids)
+
+
+# --- Recording ---
+class Recorder:
+    """Collects latencies and errors per operation; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self._window = []
+
+    def record(self, op, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(seconds)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+            self._window.append((seconds, ok))
+
+    def drain_window(self):
+        with self._lock:
+            window, self._window = self._window, []
+        return window
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_load(base_url, mix, concurrency, duration, state, report_every=0, seed=None):
+    """
+    Sends weighted mixed traffic for `duration` seconds.
+
+    Args:
+        base_url (str): Server root, e.g. "http://localhost:8081".
+        mix (dict): Operation name -> weight (see OPERATIONS).
+        concurrency (int): Number of client threads.
+        duration (float): Test length in seconds.
+        state (dict): {"paths": view paths, "task_ids": IDs for status flips}.
+        report_every (float): Print windowed stats this often (soak tests); 0 disables.
+        seed (int): Random seed for reproducible operation sequences.
+
+    Returns:
+        dict: {"elapsed", "overall": summary, "operations": {name: summary}}; summaries hold
+              requests, errors, error_rate, throughput and p50/p95/p99 in milliseconds.
+    """
+    base_url = base_url.rstrip("/")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    stop = threading.Event()
+
+    def client(n):
+        rng = random.Random(None if seed is None else seed + n)
+        while time.perf_counter() < deadline:
+            op = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = OPERATIONS[op](base_url, rng, state)
+            except (OSError, ValueError) as e:
+                ok = False
+                print(f"[WARN] {op} failed: {e}")
+            recorder.record(op, time.perf_counter() - start, ok)
+
+    def reporter():
+        last = time.perf_counter()
+        while not stop.wait(report_every):
+            now = time.perf_counter()
+            window = recorder.drain_window()
+            stats = summarize([s for s, _ in window], sum(1 for _, ok in window if not ok), now - last)
+            last = now
+            print(f"[INFO] {time.strftime('%H:%M:%S')} {stats['throughput']:.1f} req/s, "
+                  f"p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, p99 {stats['p99_ms']:.0f} ms, "
+                  f"{stats['errors']} errors, max RSS {max_rss_mb():.0f} MB")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    if report_every:
+        threading.Thread(target=reporter, daemon=True).start()
+    for t in threads:
+        t.join()
+    stop.set()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [s for values in recorder.latencies.values() for s in values]
+    return {
+        "elapsed": elapsed,
+        "overall": summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "operations": {op: summarize(values, recorder.errors.get(op, 0), elapsed)
+                       for op, values in sorted(recorder.latencies.items())},
+    }
+
+
+def _format_line(label, stats):
+    return (f"{label:<10} {stats['requests']:>8} {stats['throughput']:>9.1f} {stats['error_rate'] * 100:>7.2f}% "
+            f"{stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} {stats['p99_ms']:>8.0f}")
+
+
+def print_report(result):
+    print(f"Elapsed: {result['elapsed']:.1f}s, max RSS {max_rss_mb():.0f} MB")
+    print(f"{'operation':<10} {'requests':>8} {'req/s':>9} {'errors':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for op, stats in result["operations"].items():
+        print(_format_line(op, stats))
+    print(_format_line("overall", result["overall"]))
+
+
+def print_runs_summary(results):
+    """Compares the overall numbers of several runs (mean and spread)."""
+    print(f"\nAcross {len(results)} runs:")
+    for key, label in [("throughput", "req/s"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"),
+                       ("p99_ms", "p99 ms"), ("error_rate", "error rate")]:
+        values = [result["overall"][key] for result in results]
+        print(f"  {label:<10} mean {sum(values) / len(values):.2f}, min {min(values):.2f}, max {max(values):.2f}")
+
+
+# --- Local stand-ins ---
+class _WebhookHandler(http.server.BaseHTTPRequestHandler):
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with _WebhookHandler.lock:
+            _WebhookHandler.received += 1
+        # Discord answers webhook posts with 204 No Content
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_webhook_stub():
+    """Starts a stub Discord webhook on a free port; returns its URL."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _WebhookHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+
+def seed_tasks(client, count, seed=0):
+    """
+    Writes `count` tasks straight into the fake (spread over the past and next weeks).
+
+    Returns:
+        list: The new doc IDs.
+    """
+    from sync import stamp
+    rng = random.Random(seed)
+    col = client.collection("tasks")
+    now = datetime.now()
+    ids = []
+    batch = client.batch()
+    for i in range(count):
+        start = now + timedelta(days=rng.randint(-60, 60), hours=rng.randint(0, 23))
+        due = start + timedelta(days=rng.randint(0, 10), hours=rng.randint(1, 12))
+        ref = col.document()
+        batch.set(ref, stamp({
+            "name": f"{rng.choice(KINDS)} {i}",
+            "course": rng.choice(COURSES),
+            "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "due": due.strftime("%Y-%m-%d %H:%M:%S"),
+            "status": rng.choice(STATUSES),
+            "recurrence_days": 0,
+            "is_recurring_instance": False,
+            "reminder_hours": 24,
+            "reminder_sent": 0,
+        }))
+        ids.append(ref.id)
+        if (i + 1) % 500 == 0:
+            batch.commit()
+            batch = client.batch()
+    batch.commit()
+    return ids
+
+
+def start_local_app(seed_count, reminder_every):
+    """
+    Boots web_app.py in this process against the Firestore fake and a stub webhook.
+
+    Args:
+        seed_count (int): Tasks to seed before the app starts.
+        reminder_every (float): Run check_reminders this often (0 disables).
+
+    Returns:
+        tuple: (base URL, seeded task IDs)
+    """
+    import firestore_fake
+    os.environ["TASKMANAGER_DISABLE_SCHEDULER"] = "1"
+    os.environ["DISCORD_WEBHOOK_URL"] = start_webhook_stub()
+    client = firestore_fake.install()
+    ids = seed_tasks(client, seed_count)
+    counters_reconciled = False
+    import counters
+    try:
+        counters.reconcile(client.collection("tasks"))
+        counters_reconciled = True
+    except Exception as e:
+        print(f"[WARN] Could not build the task counters: {e}")
+
+    import web_app
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = make_server("127.0.0.1", port, web_app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    if reminder_every:
+        def remind():
+            while True:
+                time.sleep(reminder_every)
+                web_app.check_reminders()
+        threading.Thread(target=remind, daemon=True).start()
+
+    print(f"[INFO] Local app on port {port} with {len(ids)} seeded tasks"
+          f"{'' if counters_reconciled else ' (no counters)'}")
+    return f"http://127.0.0.1:{port}", ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the Task Manager web app")
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("--local", action="store_true",
+                        help="Boot web_app.py here against the Firestore fake and a stub webhook")
+    parser.add_argument("--seed-tasks", type=int, default=2000, help="Tasks to seed with --local")
+    parser.add_argument("--reminder-every", type=float, default=10,
+                        help="Seconds between reminder scans with --local (0 disables)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=1, help="Repeat the test and compare the runs")
+    parser.add_argument("--mix", default=None, help=f"Weighted operations (default {DEFAULT_MIX})")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Path for the views operation (repeatable); alone it means a views-only test")
+    parser.add_argument("--report-every", type=float, default=0, help="Print windowed stats every N seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the operation sequence")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix or ("views=1" if args.paths else DEFAULT_MIX))
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.local:
+        base_url, task_ids = start_local_app(args.seed_tasks, args.reminder_every)
+    else:
+        base_url = args.url
+        task_ids = discover_task_ids(base_url) if "status" in mix else []
+    if "status" in mix and not task_ids:
+        print("[WARN] No task IDs found; dropping status flips from the mix")
+        mix.pop("status")
+    state = {"paths": args.paths or VIEW_PATHS, "task_ids": task_ids}
+
+    results = []
+    for run in range(args.runs):
+        result = run_load(base_url, mix, args.concurrency, args.duration, state, args.report_every,
+                          None if args.seed is None else args.seed + run * args.concurrency)
+        results.append(result)
+        if not args.json:
+            if args.runs > 1:
+                print(f"\nRun {run + 1}/{args.runs}")
+            print_report(result)
+    if args.local and not args.json:
+        print(f"Webhook stub received {_WebhookHandler.received} reminders")
+    if args.json:
+        print(json.dumps({"runs": results, "webhook_posts": _WebhookHandler.received if args.local else None},
+                         indent=2))
+    elif args.runs > 1:
+        print_runs_summary(results)
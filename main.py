@@ -1,54 +1,51 @@
 """
 Main application module for Task Manager
+
+Heavy modules (firebase_admin, tkcalendar, pystray, PIL) are imported on
+first use. The window is shown immediately from the snapshot saved by the
+last session while Firestore connects in the background and only changed
+documents are downloaded (see snapshot.py).
 """
 import os
 import sys
 import time
+_startup_begin = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 import threading
 from discord_utils import send_discord_message
-from tkcalendar import DateEntry
+from metrics import (record_reminder_scan, record_reminder_sent, record_reminder_failed, start_summary_logger,
+                     start_metrics_server)
+import snapshot
+from sync import stamp, delete_tasks
+import counters
+from archive import is_archived
+from search_index import TaskIndex
+from interval_index import IntervalIndex, busy_warning, week_start, week_view, BUSY_THRESHOLD
+from write_behind import WriteBehindQueue
+from task_utils import calculate_next_occurrence, shift_task, ACTIVE_STATUSES
+from tenants import default_user, webhook_url
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Firebase/Firestore
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json"))
-    firebase_admin.initialize_app(cred)
-
-db_client = firestore.client()
-tasks_col = db_client.collection("tasks")
-
-print("✅ TaskManager started successfully!", file=sys.stderr)
-
-# --- Decode recurrence days (bitmask) ---
-def decode_recurrence_days(bitmask):
-    day_map = {1: "Mon", 2: "Tue", 4: "Wed", 8: "Thu", 16: "Fri", 32: "Sat", 64: "Sun"}
-    weekdays = [name for bit, name in day_map.items() if bitmask and (bitmask & bit)]
-    return ", ".join(weekdays)
-
-# --- Calculate next occurrence based on recurrence pattern ---
-def calculate_next_occurrence(current_due, recurrence_days):
-    day_map = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6}
-    selected_days = [day_map[bit] for bit in day_map.keys() if recurrence_days & bit]
-
-    if not selected_days:
-        return None
-
-    next_date = current_due + timedelta(days=1)
+# Set by TASKMANAGER_STARTUP_CHECK=1 (see check_startup.py): show the window, report, exit
+STARTUP_CHECK = os.getenv("TASKMANAGER_STARTUP_CHECK") == "1"
 
-    for i in range(7):
-        check_date = next_date + timedelta(days=i)
-        if check_date.weekday() in selected_days:
-            return check_date.replace(hour=current_due.hour, minute=current_due.minute, second=current_due.second)
+# Firestore is connected in the background by connect_firestore()
+db_client = None
+tasks_col = None
+db_ready = threading.Event()
+# Why the last connection or first load failed (shown with a Retry button); None otherwise
+db_error = None
+# Status changes are shown at once and written to Firestore a moment later, coalesced
+write_queue = None
 
-    return next_date + timedelta(days=7)
+# Task list and sync watermark, persisted between sessions
+task_snapshot = snapshot.load_snapshot()
+snapshot_lock = threading.Lock()
 
 # --- Create future recurring instances ---
 def create_future_recurring_instances(name, course, start_dt, due_dt, recurrence_days, reminder_hours, parent_task_id):
@@ -64,7 +61,7 @@ def create_future_recurring_instances(name, course, start_dt, due_dt, recurrence
             results = list(tasks_col.where("name", "==", name).where("due", "==", due_str).limit(1).stream())
             if not results:
                 try:
-                    tasks_col.add({
+                    counters.add_task(tasks_col, stamp({
                         "name": name,
                         "course": course,
                         "start": new_start.strftime("%Y-%m-%d %H:%M:%S"),
@@ -75,7 +72,7 @@ def create_future_recurring_instances(name, course, start_dt, due_dt, recurrence
                         "reminder_sent": 0,
                         "parent_task_id": str(parent_task_id) if parent_task_id else None,
                         "is_recurring_instance": True
-                    })
+                    }))
                 except Exception as e:
                     print(f"Failed to create future recurring instance: {e}")
 
@@ -84,10 +81,8 @@ def create_future_recurring_instances(name, course, start_dt, due_dt, recurrence
             break
 
 # --- System Tray (pystray) ---
-import pystray
-from PIL import Image, ImageDraw
-
 def create_image(width, height, color1, color2):
+    from PIL import Image, ImageDraw
     image = Image.new('RGB', (width, height), color1)
     dc = ImageDraw.Draw(image)
     dc.rectangle([(width // 3, height // 3), (width * 2 // 3, height * 2 // 3)], fill=color2)
@@ -95,7 +90,7 @@ def create_image(width, height, color1, color2):
 
 def on_quit(icon, item):
     icon.stop()
-    root.destroy()
+    on_close()
 
 def show_window(icon, item):
     root.deiconify()
@@ -105,6 +100,7 @@ def show_window(icon, item):
 
 def setup_tray():
     global tray_icon
+    import pystray
     image = create_image(64, 64, "black", "white")
     menu = pystray.Menu(
         pystray.MenuItem("Show Task Manager", show_window),
@@ -115,14 +111,34 @@ def setup_tray():
 
 # --- Main Window ---
 root = tk.Tk()
-root.title("Task Manager")
+# TASKMANAGER_USER picks whose tasks this window shows (see tenants.py)
+root.title(f"Task Manager - {default_user()}" if default_user() else "Task Manager")
 root.geometry("900x700")
 
 def on_close():
+    if write_queue is not None:
+        write_queue.flush()
+    with snapshot_lock:
+        snapshot.save_snapshot(task_snapshot)
     root.destroy()
 
+root.protocol("WM_DELETE_WINDOW", on_close)
+
+# --- Search ---
+# Filters the list as you type; answered from an in-memory index of the synced tasks
+search_index = TaskIndex()
+interval_index = IntervalIndex()
+current_rows = []
+search_var = tk.StringVar()
+search_frame = tk.Frame(root)
+search_frame.pack(fill="x", padx=10, pady=5)
+tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+tk.Entry(search_frame, textvariable=search_var, width=40).pack(side=tk.LEFT, padx=5)
+tk.Button(search_frame, text="Clear", command=lambda: search_var.set("")).pack(side=tk.LEFT)
+
 # --- Treeview Setup ---
-tree = ttk.Treeview(root, columns=("Name", "Class", "Start", "Due", "Status"), show="headings")
+# Ctrl/Shift-click selects several tasks for the bulk actions below
+tree = ttk.Treeview(root, columns=("Name", "Class", "Start", "Due", "Status"), show="headings", selectmode="extended")
 tree.heading("Name", text="Assignment Name")
 tree.heading("Class", text="Class")
 tree.heading("Start", text="Start Date/Time")
@@ -135,17 +151,92 @@ tree.tag_configure("In Progress", background="#fffacd")
 tree.tag_configure("Completed", background="#d0f0c0")
 tree.tag_configure("Graded", background="#add8e6")
 
+# --- Firestore connection ---
+# The connection is made on a background thread; the window polls its state with root.after
+# (Tk must only be touched from the main thread) and offers a retry if it fails
+CONNECTION_POLL_MS = 250
+
+connection_frame = tk.Frame(root)
+connection_frame.pack(side="bottom", fill="x", padx=10, pady=2)
+connection_var = tk.StringVar(value="Connecting to Firestore...")
+tk.Label(connection_frame, textvariable=connection_var, anchor="w").pack(side=tk.LEFT)
+retry_button = tk.Button(connection_frame, text="Retry", command=lambda: start_connection())
+
+def connect_firestore():
+    global tasks_col, db_client, write_queue
+    if db_ready.is_set():
+        return
+    from firestore_utils import get_db, get_tasks_col
+    db_client = get_db()
+    tasks_col = get_tasks_col()
+    write_queue = WriteBehindQueue(tasks_col, on_flush=lambda: root.after(0, load_tasks),
+                                   on_drop=lambda doc_ids: root.after(0, load_tasks))
+    db_ready.set()
+    print("✅ TaskManager connected to Firestore!", file=sys.stderr)
+
+def poll_connection():
+    if db_error is not None:
+        connection_var.set(f"Could not reach Firestore: {db_error}")
+        retry_button.pack(side=tk.LEFT, padx=5)
+    elif db_ready.is_set():
+        connection_var.set("Connected to Firestore")
+        retry_button.pack_forget()
+    else:
+        root.after(CONNECTION_POLL_MS, poll_connection)
+
+def start_connection():
+    """Connects (again) in the background and shows the outcome in the status bar."""
+    global db_error
+    db_error = None
+    connection_var.set("Connecting to Firestore...")
+    retry_button.pack_forget()
+    threading.Thread(target=background_startup, daemon=True).start()
+    root.after(CONNECTION_POLL_MS, poll_connection)
+
+def require_db(title="Task Manager"):
+    """Returns True if Firestore is connected; otherwise tells the user (without blocking the window)."""
+    if db_ready.is_set():
+        return True
+    if db_error is not None:
+        if messagebox.askretrycancel(title, f"Could not connect to Firestore:\n{db_error}"):
+            start_connection()
+        return False
+    messagebox.showinfo(title, "Still connecting to Firestore, please try again in a moment.")
+    return False
+
 # --- Load tasks from Firestore ---
-def load_tasks():
+def sync_snapshot():
+    global task_snapshot
+    with snapshot_lock:
+        task_snapshot, changed, removed = snapshot.reconcile(tasks_col, db_client, task_snapshot)
+        rows = snapshot.sorted_rows(task_snapshot)
+    if changed or removed:
+        print(f"Synced tasks: {changed} changed, {removed} removed", file=sys.stderr)
+    return rows, changed + removed
+
+def render_tasks(rows):
+    global current_rows
+    if write_queue is not None:
+        rows = [(doc_id, write_queue.overlay(doc_id, task)) for doc_id, task in rows]
+    current_rows = rows
+    search_index.sync(rows)
+    interval_index.sync(rows)
+    apply_search()
+
+def apply_search(*args):
+    query = search_var.get()
+    show_rows(search_index.search(query) if query.strip() else current_rows)
+
+search_var.trace_add("write", apply_search)
+
+def show_rows(rows):
     tree.delete(*tree.get_children())
-    docs = tasks_col.order_by("due").stream()
-    for doc in docs:
-        task = doc.to_dict()
+    for doc_id, task in rows:
         status_tag = task.get("status", "Not Started")
         tree.insert(
             "",
             tk.END,
-            iid=doc.id,
+            iid=doc_id,
             values=(
                 task.get("name"),
                 task.get("course"),
@@ -156,10 +247,28 @@ def load_tasks():
             tags=(status_tag,)
         )
 
-load_tasks()
+def load_tasks():
+    rows, _ = sync_snapshot()
+    render_tasks(rows)
+
+def background_startup():
+    global db_error
+    try:
+        connect_firestore()
+        rows, _ = sync_snapshot()
+    except Exception as e:
+        print(f"Failed to load tasks from Firestore: {e}", file=sys.stderr)
+        db_error = str(e) or type(e).__name__
+        return
+    root.after(0, render_tasks, rows)
+    with snapshot_lock:
+        snapshot.save_snapshot(task_snapshot)
+
+render_tasks(snapshot.sorted_rows(task_snapshot))
 
 # --- Add Assignment Window ---
 def open_new_window():
+    from tkcalendar import DateEntry
     new_window = tk.Toplevel(root)
     new_window.title("Add New Assignment")
     new_window.geometry("900x700")
@@ -224,6 +333,8 @@ def open_new_window():
         recurrence_vars[bit] = var
 
     def save_assignment():
+        if not require_db("Add Assignment"):
+            return
         name = name_entry.get().strip()
         course = selected_class.get()
         status = current_status.get()
@@ -250,7 +361,7 @@ def open_new_window():
             if var.get():
                 recurrence_days |= bit
 
-        _, doc_ref = tasks_col.add({
+        task = {
             "name": name,
             "course": course,
             "start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -260,7 +371,12 @@ def open_new_window():
             "reminder_hours": reminder_hours,
             "reminder_sent": 0,
             "is_recurring_instance": False
-        })
+        }
+        warning = busy_warning(interval_index, task)
+        if warning and not messagebox.askyesno("Busy Period", f"{warning}\n\nSave anyway?", parent=new_window):
+            return
+
+        doc_ref = counters.add_task(tasks_col, stamp(task))
 
         if recurrence_days > 0:
             create_future_recurring_instances(name, course, start_dt, due_dt, recurrence_days, reminder_hours, doc_ref.id)
@@ -276,6 +392,9 @@ def edit_selected_task():
     if not selected_item:
         messagebox.showwarning("Edit Task", "Select a task to edit.")
         return
+    if not require_db("Edit Task"):
+        return
+    from tkcalendar import DateEntry
     task_id = selected_item[0]
     doc = tasks_col.document(task_id).get()
     if not doc.exists:
@@ -363,7 +482,8 @@ def edit_selected_task():
             return
 
         try:
-            tasks_col.document(task_id).update({
+            write_queue.discard([task_id])
+            counters.update_task(tasks_col, task_id, stamp({
                 "name": name,
                 "course": course,
                 "start": start_dt_new.strftime("%Y-%m-%d %H:%M:%S"),
@@ -371,7 +491,7 @@ def edit_selected_task():
                 "status": status,
                 "reminder_hours": reminder_hours,
                 "reminder_sent": 0
-            })
+            }))
             load_tasks()
             edit_window.destroy()
         except Exception as e:
@@ -419,6 +539,8 @@ def open_class_view():
     filtered_tree.tag_configure("Graded", background="#add8e6")
 
     def load_filtered_tasks():
+        if not require_db("View by Class"):
+            return
         filtered_tree.delete(*filtered_tree.get_children())
         selected_class_name = selected_class.get()
         docs = tasks_col.where("course", "==", selected_class_name).stream()
@@ -456,6 +578,136 @@ def open_class_view():
 
 tk.Button(root, text="View by Class", command=open_class_view).pack(pady=5)
 
+# --- Week View ---
+def open_week_view():
+    week_window = tk.Toplevel(root)
+    week_window.title("Week View")
+    week_window.geometry("900x500")
+    shown_week = [week_start(datetime.now())]
+
+    title_label = tk.Label(week_window, font=("Arial", 12, "bold"))
+    title_label.pack(pady=10)
+
+    day_columns = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+    week_tree = ttk.Treeview(week_window, columns=("Name", "Class") + day_columns + ("Status",), show="headings")
+    week_tree.heading("Name", text="Assignment Name")
+    week_tree.heading("Class", text="Class")
+    week_tree.heading("Status", text="Status")
+    week_tree.column("Name", width=200)
+    week_tree.column("Class", width=200)
+    week_tree.column("Status", width=90)
+    for column in day_columns:
+        week_tree.column(column, width=50, anchor=tk.CENTER)
+    week_tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+    week_tree.tag_configure("Not Started", background="#ff7171")
+    week_tree.tag_configure("In Progress", background="#fffacd")
+    week_tree.tag_configure("Completed", background="#d0f0c0")
+    week_tree.tag_configure("Graded", background="#add8e6")
+
+    load_label = tk.Label(week_window, font=("Arial", 10))
+    load_label.pack()
+
+    def show_week():
+        monday = shown_week[0]
+        view = week_view(interval_index, monday)
+        title_label.config(text=f"Week of {monday.strftime('%B %d, %Y')}")
+        for i, day in enumerate(view["days"]):
+            week_tree.heading(day_columns[i], text=day.strftime("%a %m/%d"))
+        week_tree.delete(*week_tree.get_children())
+        active_per_day = [0] * 7
+        for doc_id, task, open_days in view["tasks"]:
+            due_day = task["due"][:10]
+            marks = ["⚑" if is_open and day.strftime("%Y-%m-%d") == due_day else ("■" if is_open else "")
+                     for day, is_open in zip(view["days"], open_days)]
+            status = task.get("status", "Not Started")
+            week_tree.insert("", tk.END, iid=doc_id, values=(task.get("name"), task.get("course"), *marks, status),
+                             tags=(status,))
+            if status in ACTIVE_STATUSES:
+                active_per_day = [count + is_open for count, is_open in zip(active_per_day, open_days)]
+        busy = [day.strftime("%a") for day, count in zip(view["days"], active_per_day) if count >= BUSY_THRESHOLD]
+        load_label.config(text="Active tasks open per day: " + "  ".join(str(count) for count in active_per_day)
+                          + (f"   (busy: {', '.join(busy)})" if busy else ""))
+
+    def move_week(weeks):
+        shown_week[0] += timedelta(weeks=weeks)
+        show_week()
+
+    def this_week():
+        shown_week[0] = week_start(datetime.now())
+        show_week()
+
+    button_frame = tk.Frame(week_window)
+    button_frame.pack(pady=10)
+    tk.Button(button_frame, text="< Previous", command=lambda: move_week(-1)).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="This Week", command=this_week).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Next >", command=lambda: move_week(1)).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Close", command=week_window.destroy).pack(side=tk.LEFT, padx=5)
+
+    show_week()
+
+tk.Button(root, text="Week View", command=open_week_view).pack(pady=5)
+
+# --- Analytics ---
+def open_analytics():
+    analytics_window = tk.Toplevel(root)
+    analytics_window.title("Analytics")
+    analytics_window.geometry("800x600")
+
+    summary_label = tk.Label(analytics_window, font=("Arial", 12), justify=tk.LEFT)
+    summary_label.pack(pady=10)
+
+    tk.Label(analytics_window, text="Tasks due per week", font=("Arial", 11, "bold")).pack()
+    week_tree = ttk.Treeview(analytics_window, columns=("Week", "Due", "Active", "Done", "Load"), show="headings",
+                             height=10)
+    for column, width in (("Week", 100), ("Due", 60), ("Active", 60), ("Done", 60), ("Load", 400)):
+        week_tree.heading(column, text=column)
+        week_tree.column(column, width=width, anchor=tk.W if column == "Load" else tk.CENTER)
+    week_tree.tag_configure("current", background="#fffacd")
+    week_tree.pack(fill="x", padx=10, pady=5)
+
+    tk.Label(analytics_window, text="By course", font=("Arial", 11, "bold")).pack()
+    course_tree = ttk.Treeview(analytics_window, columns=("Course", "Tasks", "Active", "Overdue", "Next 7 days",
+                                                          "On time"), show="headings", height=6)
+    for column in ("Course", "Tasks", "Active", "Overdue", "Next 7 days", "On time"):
+        course_tree.heading(column, text=column)
+        course_tree.column(column, width=300 if column == "Course" else 80, anchor=tk.W if column == "Course" else tk.CENTER)
+    course_tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+    def percent(rate):
+        return "-" if rate is None else f"{rate:.0%}"
+
+    def load_analytics():
+        # numpy is imported here, on first use
+        from analytics import analyze, PAST_WEEKS
+        stats = analyze(current_rows)
+        lead = stats["lead_time"]
+        lead_text = "no completion times recorded yet" if not lead["count"] else (
+            f"{percent(lead['on_time_rate'])} finished on time, median {lead['median_hours']} h before the due date")
+        summary_label.config(text=f"{stats['total']} tasks: {stats['active']} active, {stats['completed']} completed, "
+                                  f"{stats['overdue']} overdue\n{lead_text}")
+
+        week_tree.delete(*week_tree.get_children())
+        busiest = max([week["due"] for week in stats["weeks"]] + [1])
+        for i, week in enumerate(stats["weeks"]):
+            bar = "█" * round(40 * week["active"] / busiest) + "░" * round(40 * week["done"] / busiest)
+            week_tree.insert("", tk.END, values=(week["start"], week["due"], week["active"], week["done"], bar),
+                             tags=("current",) if i == PAST_WEEKS else ())
+        course_tree.delete(*course_tree.get_children())
+        for course in stats["courses"]:
+            course_tree.insert("", tk.END, values=(course["course"], course["total"], course["active"],
+                                                   course["overdue"], course["due_next_7_days"],
+                                                   percent(course["lead_time"]["on_time_rate"])))
+
+    button_frame = tk.Frame(analytics_window)
+    button_frame.pack(pady=10)
+    tk.Button(button_frame, text="Refresh", command=load_analytics).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Close", command=analytics_window.destroy).pack(side=tk.LEFT, padx=5)
+
+    load_analytics()
+
+tk.Button(root, text="Analytics", command=open_analytics).pack(pady=5)
+
 # --- Status Update ---
 status_frame = tk.Frame(root)
 status_frame.pack(pady=5)
@@ -465,29 +717,64 @@ status_combobox = ttk.Combobox(status_frame, values=["Not Started", "In Progress
 status_combobox.set("Not Started")
 status_combobox.pack(side=tk.LEFT, padx=5)
 
+# Status, reschedule and delete act on every selected task in one batched commit
 def update_task_status():
-    selected_item = tree.selection()
-    if not selected_item:
+    selected_items = tree.selection()
+    if not selected_items:
         messagebox.showwarning("Update Status", "Select a task.")
         return
-    task_id = selected_item[0]
+    if not require_db("Update Status"):
+        return
     new_status = status_combobox.get()
-    tasks_col.document(task_id).update({"status": new_status})
-    load_tasks()
+    for task_id in selected_items:
+        write_queue.update(task_id, stamp({"status": new_status}))
+    # Repaint from memory; the queue reloads the list once the write lands
+    render_tasks(current_rows)
 
 tk.Button(status_frame, text="Update Status", command=update_task_status).pack(side=tk.LEFT, padx=5)
 
+# --- Reschedule ---
+tk.Label(status_frame, text="Move by days:").pack(side=tk.LEFT, padx=(15, 0))
+shift_days_spinbox = tk.Spinbox(status_frame, from_=-365, to=365, width=5)
+shift_days_spinbox.delete(0, tk.END)
+shift_days_spinbox.insert(0, "7")
+shift_days_spinbox.pack(side=tk.LEFT, padx=5)
+
+def reschedule_selected_tasks():
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Reschedule", "Select a task.")
+        return
+    try:
+        days = int(shift_days_spinbox.get())
+    except ValueError:
+        messagebox.showerror("Error", "Enter a whole number of days.")
+        return
+    if not require_db("Reschedule"):
+        return
+    try:
+        counters.update_tasks(tasks_col, selected_items, lambda task: stamp(shift_task(task, days)))
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to reschedule tasks: {e}")
+    load_tasks()
+
+tk.Button(status_frame, text="Move Selected", command=reschedule_selected_tasks).pack(side=tk.LEFT, padx=5)
+
 # --- Delete Task ---
 def delete_selected_task():
-    selected_item = tree.selection()
-    if not selected_item:
+    selected_items = tree.selection()
+    if not selected_items:
         messagebox.showwarning("Delete Task", "Select a task.")
         return
-    task_id = selected_item[0]
-    tasks_col.document(task_id).delete()
+    if len(selected_items) > 1 and not messagebox.askyesno(
+            "Delete Tasks", f"Delete {len(selected_items)} selected tasks?", icon="warning"):
+        return
+    if not require_db("Delete Task"):
+        return
+    delete_tasks(tasks_col, selected_items)
     load_tasks()
 
-tk.Button(root, text="Delete Selected Task", command=delete_selected_task).pack(pady=5)
+tk.Button(root, text="Delete Selected Tasks", command=delete_selected_task).pack(pady=5)
 
 # --- Edit Task Button ---
 tk.Button(root, text="Edit Selected Task", command=edit_selected_task).pack(pady=5)
@@ -500,13 +787,10 @@ def delete_all_tasks():
         icon="warning"
     )
 
-    if result:
+    if result and require_db("Delete All Tasks"):
         try:
-            docs = list(tasks_col.stream())
-            deleted_count = 0
-            for doc in docs:
-                doc.reference.delete()
-                deleted_count += 1
+            before = {doc.id: doc.to_dict() for doc in tasks_col.select(counters.COUNTED_FIELDS).stream()}
+            deleted_count = delete_tasks(tasks_col, list(before), before)
 
             load_tasks()
             messagebox.showinfo("Delete All Tasks", f"Successfully deleted {deleted_count} tasks.")
@@ -516,13 +800,27 @@ def delete_all_tasks():
 tk.Button(root, text="Delete All Tasks", command=delete_all_tasks).pack(pady=5)
 
 # --- Reminder Loop ---
+# Each pass syncs only the tasks changed since the last pass and scans the local snapshot
+REMINDER_INTERVAL_SECONDS = 60
+
 def reminder_loop():
+    # Waits (off the main thread) for a connection, which may take a retry from the user
+    db_ready.wait()
+    # (name, due) of occurrences found in tasks_archive; archived tasks never come back
+    archived = set()
     while True:
         now = datetime.now()
-        docs = list(tasks_col.stream())
-        for doc in docs:
-            task = doc.to_dict()
-            task_id = doc.id
+        scan_start = time.perf_counter()
+        try:
+            rows, changes = sync_snapshot()
+        except Exception as e:
+            print(f"Failed to sync tasks: {e}")
+            time.sleep(REMINDER_INTERVAL_SECONDS)
+            continue
+        if changes:
+            root.after(0, render_tasks, rows)
+        existing = {(task.get("name"), task.get("due")) for _, task in rows}
+        for task_id, task in rows:
             due = datetime.strptime(task["due"], "%Y-%m-%d %H:%M:%S")
             start = datetime.strptime(task["start"], "%Y-%m-%d %H:%M:%S")
             reminder_hours = task.get("reminder_hours", 24)
@@ -533,9 +831,14 @@ def reminder_loop():
             if due - timedelta(hours=reminder_hours) <= now < due and status != "Completed" and reminder_sent == 0:
                 try:
                     reminder_message = f"Task Due Soon: {task['name']}\nDue at: {due.strftime('%m/%d/%y %I:%M %p')}"
-                    send_discord_message(reminder_message)
-                    tasks_col.document(task_id).update({"reminder_sent": 1})
+                    if send_discord_message(reminder_message, webhook_url()):
+                        record_reminder_sent("desktop", due, reminder_hours)
+                        tasks_col.document(task_id).update(stamp({"reminder_sent": 1}))
+                    else:
+                        # reminder_sent stays 0, so the next pass tries again
+                        record_reminder_failed("desktop")
                 except Exception as e:
+                    record_reminder_failed("desktop")
                     print(f"Failed to send reminder: {e}")
 
             if recurrence_days and recurrence_days > 0 and now >= due:
@@ -545,30 +848,50 @@ def reminder_loop():
                     new_start = next_occurrence - duration
                     due_str = next_occurrence.strftime("%Y-%m-%d %H:%M:%S")
 
-                    results = list(tasks_col.where("name", "==", task["name"]).where("due", "==", due_str).limit(1).stream())
-                    if not results:
-                        try:
-                            tasks_col.add({
-                                "name": task["name"],
-                                "course": task["course"],
-                                "start": new_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                "due": due_str,
-                                "status": "Not Started",
-                                "recurrence_days": recurrence_days,
-                                "reminder_hours": task.get("reminder_hours", 24),
-                                "reminder_sent": 0,
-                                "parent_task_id": task_id,
-                                "is_recurring_instance": True
-                            })
-                            print(f"Created new recurring task instance: {task['name']} for {next_occurrence.strftime('%m/%d/%y %I:%M %p')}")
-                            root.after(0, load_tasks, ())
-                        except Exception as e:
-                            print(f"Failed to create recurring task instance: {e}")
-        time.sleep(60)
-
-threading.Thread(target=reminder_loop, daemon=True).start()
+                    key = (task["name"], due_str)
+                    if key in existing or key in archived:
+                        continue
+                    try:
+                        if is_archived(tasks_col, *key):
+                            archived.add(key)
+                            continue
+                    except Exception as e:
+                        print(f"Failed to check the archive: {e}")
+                        continue
+                    try:
+                        counters.add_task(tasks_col, stamp({
+                            "name": task["name"],
+                            "course": task["course"],
+                            "start": new_start.strftime("%Y-%m-%d %H:%M:%S"),
+                            "due": due_str,
+                            "status": "Not Started",
+                            "recurrence_days": recurrence_days,
+                            "reminder_hours": task.get("reminder_hours", 24),
+                            "reminder_sent": 0,
+                            "parent_task_id": task_id,
+                            "is_recurring_instance": True
+                        }))
+                        existing.add(key)
+                        print(f"Created new recurring task instance: {task['name']} for {next_occurrence.strftime('%m/%d/%y %I:%M %p')}")
+                    except Exception as e:
+                        print(f"Failed to create recurring task instance: {e}")
+        record_reminder_scan("desktop", time.perf_counter() - scan_start, changes, REMINDER_INTERVAL_SECONDS)
+        time.sleep(REMINDER_INTERVAL_SECONDS)
 
 # --- System Tray ---
 # setup_tray()
 
+if STARTUP_CHECK:
+    def report_first_paint():
+        print(f"[STARTUP] first paint after {(time.perf_counter() - _startup_begin) * 1000:.0f} ms", file=sys.stderr)
+        root.destroy()
+    root.after_idle(report_first_paint)
+else:
+    start_connection()
+    threading.Thread(target=reminder_loop, daemon=True).start()
+    start_summary_logger("desktop")
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(int(os.getenv("METRICS_PORT")))
+    print("✅ TaskManager started successfully!", file=sys.stderr)
+
 root.mainloop()
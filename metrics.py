@@ -0,0 +1,566 @@
+"""
+Metrics module for Task Manager
+Collects request timings and Firestore call counts and exposes them
+in the Prometheus text format
+
+All values live in this process: under gunicorn every worker counts only
+the requests and Firestore calls it handled itself, and each scrape of
+/metrics is answered by whichever worker gets it.
+"""
+import os
+import time
+import threading
+import cProfile
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+# Per-request Firestore stats, set by the Flask hooks in instrument_app()
+_request_stats = ContextVar("request_stats", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name, text):
+    """Register the HELP text shown for a metric on /metrics."""
+    _help[name] = text
+
+
+def inc(name, amount=1, **labels):
+    """
+    Increments a counter.
+
+    Args:
+        name (str): Metric name, e.g. "firestore_writes_total".
+        amount (int|float): Value to add.
+        **labels: Prometheus labels for this series.
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """
+    Records one observation in a histogram.
+
+    Args:
+        name (str): Metric name, e.g. "http_request_seconds".
+        value (float): Observed value.
+        buckets (tuple): Upper bounds of the histogram buckets.
+        **labels: Prometheus labels for this series.
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"buckets": tuple(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def snapshot():
+    """Returns a copy of all counters and histograms (used for log summaries)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"sum": h["sum"], "count": h["count"]} for key, h in _histograms.items()}
+    return counters, histograms
+
+
+def _format_labels(label_key, extra=None):
+    pairs = list(label_key) + (extra or [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus():
+    """Renders every metric in the Prometheus text exposition format (this process's values only)."""
+    lines = [f"# Metrics of process {os.getpid()} only; each gunicorn worker keeps its own"]
+    with _lock:
+        counter_names = sorted({name for name, _ in _counters})
+        for name in counter_names:
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(_counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        histogram_names = sorted({name for name, _ in _histograms})
+        for name in histogram_names:
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), hist in sorted(_histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+describe("firestore_calls_total", "Firestore RPCs issued, by operation")
+describe("firestore_documents_read_total", "Documents returned by Firestore reads")
+describe("firestore_documents_written_total", "Documents written by Firestore writes and batch/transaction commits")
+describe("firestore_call_seconds", "Wall time of Firestore RPCs, by operation")
+describe("http_requests_total", "HTTP requests served, by endpoint and status")
+describe("http_request_seconds", "Total request latency, by endpoint")
+describe("http_request_firestore_seconds", "Time spent in Firestore calls per request, by endpoint")
+describe("http_request_render_seconds", "Time spent rendering Jinja templates per request, by endpoint")
+describe("http_request_firestore_reads", "Firestore documents read per request, by endpoint")
+describe("http_request_firestore_writes", "Firestore documents written per request, by endpoint")
+
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+# --- Firestore instrumentation ---
+def _record_call(op, elapsed, docs=0, writes=0):
+    inc("firestore_calls_total", op=op)
+    observe("firestore_call_seconds", elapsed, op=op)
+    if docs:
+        inc("firestore_documents_read_total", docs, op=op)
+    if writes:
+        inc("firestore_documents_written_total", writes, op=op)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["firestore_seconds"] += elapsed
+        if writes:
+            stats["writes"] += writes
+        else:
+            stats["reads"] += 1
+            stats["docs"] += docs
+
+
+class InstrumentedDocument:
+    """Wraps a Firestore DocumentReference and records get/update/set/delete calls."""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+    def get(self, *args, **kwargs):
+        start = time.perf_counter()
+        doc = self._ref.get(*args, **kwargs)
+        _record_call("document_get", time.perf_counter() - start, docs=1 if doc.exists else 0)
+        return doc
+
+    def _write(self, op, *args, **kwargs):
+        start = time.perf_counter()
+        result = getattr(self._ref, op)(*args, **kwargs)
+        _record_call(f"document_{op}", time.perf_counter() - start, writes=1)
+        return result
+
+    def update(self, *args, **kwargs):
+        return self._write("update", *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._write("set", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write("delete", *args, **kwargs)
+
+
+class InstrumentedQuery:
+    """
+    Wraps a Firestore CollectionReference or Query.
+
+    Query builders return wrapped queries so that chained calls like
+    col.where(...).limit(1).stream() are still counted.
+    """
+
+    _BUILDERS = {"where", "order_by", "limit", "limit_to_last", "offset", "select",
+                 "start_at", "start_after", "end_at", "end_before"}
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name in self._BUILDERS:
+            def builder(*args, **kwargs):
+                return InstrumentedQuery(attr(*args, **kwargs))
+            return builder
+        return attr
+
+    def stream(self, *args, **kwargs):
+        start = time.perf_counter()
+        docs = 0
+        try:
+            for doc in self._query.stream(*args, **kwargs):
+                docs += 1
+                yield doc
+        finally:
+            _record_call("stream", time.perf_counter() - start, docs=docs)
+
+    def get(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._query.get(*args, **kwargs)
+        _record_call("query_get", time.perf_counter() - start, docs=len(result))
+        return result
+
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._query.document(*args, **kwargs))
+
+    def add(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._query.add(*args, **kwargs)
+        _record_call("add", time.perf_counter() - start, writes=1)
+        return result
+
+
+def instrument_collection(col):
+    """Returns a wrapped collection that records every Firestore call made through it."""
+    if col is None:
+        return None
+    return InstrumentedQuery(col)
+
+
+class InstrumentedWriter:
+    """
+    Wraps a WriteBatch or Transaction and counts the writes queued on it.
+
+    commit() of a batch is recorded with that count; transactions are
+    committed by firestore.transactional, see transactional().
+    """
+
+    def __init__(self, writer, op="batch_commit"):
+        self._writer = writer
+        self._op = op
+        self.writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    def _queue(self, method, *args, **kwargs):
+        self.writes += 1
+        return getattr(self._writer, method)(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._queue("set", *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._queue("create", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._queue("update", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._queue("delete", *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        writes, self.writes = self.writes, 0
+        start = time.perf_counter()
+        result = self._writer.commit(*args, **kwargs)
+        _record_call(self._op, time.perf_counter() - start, writes=writes)
+        return result
+
+
+class InstrumentedClient:
+    """Wraps a sync Firestore client so batch commits are recorded (collections are wrapped per use)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def batch(self):
+        return InstrumentedWriter(self._client.batch())
+
+
+def instrument_client(client):
+    """Returns the client wrapped by InstrumentedClient (once)."""
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client)
+
+
+def transactional(fn):
+    """
+    firestore.transactional() that records each commit with the number of writes it made.
+
+    fn receives the transaction wrapped in an InstrumentedWriter; reads and
+    the commit itself go to the real transaction.
+    """
+    from firebase_admin import firestore
+
+    def run(transaction, *args, **kwargs):
+        writer = None
+
+        @firestore.transactional
+        def attempt(transaction):
+            nonlocal writer
+            # A retried attempt starts counting again
+            writer = InstrumentedWriter(transaction, "transaction_commit")
+            return fn(writer, *args, **kwargs)
+
+        start = time.perf_counter()
+        result = attempt(transaction)
+        _record_call("transaction_commit", time.perf_counter() - start, writes=writer.writes if writer else 0)
+        return result
+
+    return run
+
+
+# --- Flask instrumentation ---
+def _start_profiler():
+    """Starts pyinstrument if it is installed, otherwise cProfile."""
+    try:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return None
+        return profiler
+
+
+def _stop_profiler(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _dump_profile(profiler, endpoint, elapsed, profile_dir):
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(profile_dir, f"{endpoint}-{stamp}-{int(elapsed * 1000)}ms")
+    if isinstance(profiler, cProfile.Profile):
+        path = base + ".prof"
+        profiler.dump_stats(path)
+    else:
+        path = base + ".html"
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    print(f"[PROFILE] Slow request {endpoint} took {elapsed * 1000:.0f} ms, profile saved to {path}")
+
+
+def instrument_app(app, allow=None):
+    """
+    Adds request timing, Firestore per-request stats and a /metrics endpoint to a Flask app.
+
+    /metrics shows this worker process's values only (see the module docstring).
+    Set PROFILE_SLOW_REQUEST_MS to profile every request and keep the profile
+    (pyinstrument HTML if available, cProfile .prof otherwise) for requests
+    slower than that threshold. Profiles are written to PROFILE_DIR
+    (default "profiles").
+
+    Args:
+        app (Flask): The application to instrument.
+        allow (callable): Returns whether the current request may read /metrics
+            (401 otherwise); None serves it to everyone.
+    """
+    from flask import g, request, Response, before_render_template, template_rendered
+
+    slow_ms = os.getenv("PROFILE_SLOW_REQUEST_MS")
+    slow_seconds = float(slow_ms) / 1000 if slow_ms else None
+    profile_dir = os.getenv("PROFILE_DIR", "profiles")
+
+    @app.before_request
+    def _metrics_before_request():
+        g._metrics_start = time.perf_counter()
+        g._metrics_render = 0.0
+        g._metrics_stats = {"reads": 0, "writes": 0, "docs": 0, "firestore_seconds": 0.0}
+        g._metrics_token = _request_stats.set(g._metrics_stats)
+        g._metrics_profiler = _start_profiler() if slow_seconds is not None else None
+
+    @app.after_request
+    def _metrics_after_request(response):
+        start = g.get("_metrics_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        stats = g._metrics_stats
+        endpoint = request.endpoint or "unknown"
+
+        inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+        observe("http_request_seconds", elapsed, endpoint=endpoint)
+        observe("http_request_firestore_seconds", stats["firestore_seconds"], endpoint=endpoint)
+        observe("http_request_render_seconds", g._metrics_render, endpoint=endpoint)
+        observe("http_request_firestore_reads", stats["docs"], buckets=COUNT_BUCKETS, endpoint=endpoint)
+        observe("http_request_firestore_writes", stats["writes"], buckets=COUNT_BUCKETS, endpoint=endpoint)
+
+        response.headers["Server-Timing"] = (
+            f"db;dur={stats['firestore_seconds'] * 1000:.1f}, "
+            f"render;dur={g._metrics_render * 1000:.1f}, "
+            f"total;dur={elapsed * 1000:.1f}"
+        )
+
+        profiler = g.pop("_metrics_profiler", None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+            if elapsed >= slow_seconds:
+                try:
+                    _dump_profile(profiler, endpoint, elapsed, profile_dir)
+                except Exception as e:
+                    print(f"[ERROR] Failed to save profile: {e}")
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        profiler = g.pop("_metrics_profiler", None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+        token = g.pop("_metrics_token", None)
+        if token is not None:
+            _request_stats.reset(token)
+
+    def _render_started(sender, template, context, **extra):
+        g._metrics_render_start = time.perf_counter()
+
+    def _render_finished(sender, template, context, **extra):
+        started = g.pop("_metrics_render_start", None)
+        if started is not None and "_metrics_render" in g:
+            g._metrics_render += time.perf_counter() - started
+
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+    @app.route('/metrics')
+    def metrics():
+        if allow is not None and not allow():
+            return Response("Unauthorized\n", status=401, headers={"WWW-Authenticate": "Bearer"})
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    return app
+
+
+# --- Reminder pipeline metrics ---
+describe("reminder_scan_seconds", "Duration of one reminder scan, by source")
+describe("reminder_scan_documents", "Documents read by one reminder scan, by source")
+describe("reminder_scan_overruns_total", "Reminder scans that took longer than the polling interval")
+describe("reminders_sent_total", "Reminders delivered, by source")
+describe("reminder_delivery_failures_total", "Reminders that could not be delivered (retried on the next scan), by source")
+describe("reminder_lateness_seconds", "Delay between due - reminder_hours and the reminder being sent")
+describe("discord_send_seconds", "Latency of Discord webhook calls")
+describe("discord_send_failures_total", "Discord webhook calls that failed or returned a non-204 status")
+
+LATENESS_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 6 * 3600, 24 * 3600)
+SCAN_DOC_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def record_reminder_scan(source, elapsed, documents, interval):
+    """
+    Records one reminder scan and warns when it no longer fits in its polling interval.
+
+    Args:
+        source (str): "web" or "desktop".
+        elapsed (float): Scan duration in seconds.
+        documents (int): Number of documents the scan read.
+        interval (float): Polling interval in seconds.
+    """
+    observe("reminder_scan_seconds", elapsed, source=source)
+    observe("reminder_scan_documents", documents, buckets=SCAN_DOC_BUCKETS, source=source)
+    if elapsed > interval:
+        inc("reminder_scan_overruns_total", source=source)
+        print(f"[WARN] Reminder scan ({source}) took {elapsed:.1f}s for {documents} documents, "
+              f"longer than its {interval}s interval")
+
+
+def record_reminder_sent(source, due, reminder_hours, sent_at=None):
+    """Records a delivered reminder and how late it fired relative to due - reminder_hours."""
+    sent_at = sent_at or datetime.now()
+    target = due - timedelta(hours=reminder_hours)
+    inc("reminders_sent_total", source=source)
+    observe("reminder_lateness_seconds", max((sent_at - target).total_seconds(), 0),
+            buckets=LATENESS_BUCKETS, source=source)
+
+
+def record_reminder_failed(source):
+    """Records a reminder that was not delivered; it stays unsent and is retried on the next scan."""
+    inc("reminder_delivery_failures_total", source=source)
+
+
+def _mean(histograms, name, source):
+    hist = histograms.get((name, (("source", source),)))
+    if not hist or not hist["count"]:
+        return None, 0
+    return hist["sum"] / hist["count"], hist["count"]
+
+
+def log_reminder_summary(source):
+    """Prints a one-line summary of the reminder pipeline metrics."""
+    counters, histograms = snapshot()
+    scan_mean, scans = _mean(histograms, "reminder_scan_seconds", source)
+    docs_mean, _ = _mean(histograms, "reminder_scan_documents", source)
+    late_mean, _ = _mean(histograms, "reminder_lateness_seconds", source)
+    send = histograms.get(("discord_send_seconds", ()), {"sum": 0.0, "count": 0})
+    sent = counters.get(("reminders_sent_total", (("source", source),)), 0)
+    overruns = counters.get(("reminder_scan_overruns_total", (("source", source),)), 0)
+    failures = counters.get(("discord_send_failures_total", ()), 0)
+    undelivered = counters.get(("reminder_delivery_failures_total", (("source", source),)), 0)
+
+    if not scans:
+        print(f"[METRICS] Reminders ({source}): no scans yet")
+        return
+    send_mean = send["sum"] / send["count"] if send["count"] else 0.0
+    print(f"[METRICS] Reminders ({source}): {scans} scans, avg {scan_mean:.2f}s / {docs_mean:.0f} docs, "
+          f"{overruns} overruns, {sent} sent, {undelivered} undelivered, avg lateness {late_mean or 0:.0f}s, "
+          f"Discord avg {send_mean * 1000:.0f} ms, {failures} failures")
+
+
+def start_summary_logger(source, interval=None):
+    """Starts a daemon thread that logs the reminder summary every METRICS_LOG_INTERVAL seconds."""
+    interval = interval or int(os.getenv("METRICS_LOG_INTERVAL", "900"))
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            log_reminder_summary(source)
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def start_metrics_server(port):
+    """
+    Serves /metrics on a background HTTP server (for processes without Flask, like main.py).
+
+    Args:
+        port (int): Port to listen on (localhost only).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[METRICS] Serving metrics at http://127.0.0.1:{port}/metrics")
+    return server
@@ -0,0 +1,241 @@
+"""
+Page cache module for Task Manager
+Caches rendered task list pages keyed by view, filter and collection version
+
+The version is bumped by the web app's own write routes and by a Firestore
+listener on the tasks collection, so writes from other gunicorn workers,
+the desktop app or import.py invalidate cached pages too. Pages are only
+served from the cache while that listener is running in this process.
+Each tasks collection (one per user) has its own PageCache. cached_page()
+wraps Flask views and async_cached_page() Quart views.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from metrics import inc, describe
+
+MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "256"))
+# Safety net in case the listener silently stops delivering events
+MAX_AGE_SECONDS = int(os.getenv("PAGE_CACHE_MAX_AGE", "300"))
+
+describe("page_cache_requests_total", "Cacheable page requests, by view and hit/miss")
+describe("page_cache_invalidations_total", "Page cache invalidations, by reason (write or remote)")
+
+
+class PageCache:
+    """
+    Rendered pages, collection version and listener for one tasks collection.
+
+    The web app keeps one per user (see web_common.Tenant), so a write by one
+    user never evicts another user's pages.
+
+    Args:
+        col: The tasks CollectionReference.
+    """
+
+    def __init__(self, col):
+        self.col = col
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = 0
+        self._listener = None
+        self._listener_pid = None
+        self._change_handlers = []
+
+    def version(self):
+        """Returns the current collection version."""
+        return self._version
+
+    def invalidate(self, reason="write"):
+        """Bumps the collection version and drops every cached page."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+        inc("page_cache_invalidations_total", reason=reason)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            html, stored_at = entry
+            if time.monotonic() - stored_at > MAX_AGE_SECONDS:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            if key[-1] != self._version:
+                # The collection changed while this page was rendering
+                return
+            self._entries[key] = (html, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def on_change(self, handler):
+        """
+        Registers a function called with the DocumentChanges of every listener event.
+
+        Lets other in-memory views of the tasks (e.g. the search index) share this
+        cache's listener instead of opening a second one.
+        """
+        self._change_handlers.append(handler)
+
+    def listener_active(self):
+        return self._listener is not None and self._listener_pid == os.getpid()
+
+    def start_listener(self):
+        """
+        Starts (once per process) a Firestore listener that invalidates the cache on any task change.
+
+        Call this after fork: gunicorn workers each need their own listener thread.
+        """
+        if self.col is None or self.listener_active():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+
+        def handle_snapshot(col_snapshot, changes, read_time):
+            for handler in self._change_handlers:
+                try:
+                    handler(changes)
+                except Exception as e:
+                    print(f"[ERROR] Task change handler failed: {e}")
+            if changes:
+                self.invalidate("remote")
+
+        try:
+            self._listener = self.col.on_snapshot(handle_snapshot)
+        except Exception as e:
+            print(f"[ERROR] Page cache listener failed to start, caching disabled: {e}")
+            self._listener = None
+
+    def stop_listener(self):
+        """Stops the listener and drops the cached pages (e.g. for a user who went idle)."""
+        with self._lock:
+            listener, self._listener, self._listener_pid = self._listener, None, None
+            self._entries.clear()
+            self._version += 1
+        if listener is not None:
+            try:
+                listener.unsubscribe()
+            except Exception as e:
+                print(f"[WARN] Could not stop the page cache listener: {e}")
+
+
+def _key(view_name, kwargs, args, version):
+    return (view_name, tuple(sorted(kwargs.items())), tuple(sorted(args.items(multi=True))), version)
+
+
+def cached_page(view_name):
+    """
+    Decorator for Flask views that return a rendered template.
+
+    The page is served from the cache unless flash messages are pending (they
+    are rendered into the page) and is only stored when the view did not
+    flash anything itself.
+
+    Args:
+        view_name (str): Cache key prefix for the view.
+    """
+    from flask import current_app, session, g, request
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            current = current_app.extensions.get("page_cache")
+            cache = current() if current is not None else None
+            if cache is None or not cache.listener_active() or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            key = _key(view_name, kwargs, request.args, cache.version())
+            html = cache.get(key)
+            if html is not None:
+                inc("page_cache_requests_total", view=view_name, result="hit")
+                return html
+
+            inc("page_cache_requests_total", view=view_name, result="miss")
+            g._page_cache_flashed = False
+            html = view(*args, **kwargs)
+            if isinstance(html, str) and not g.get('_page_cache_flashed'):
+                cache.put(key, html)
+            return html
+        return wrapper
+    return decorator
+
+
+def async_cached_page(view_name):
+    """cached_page() for Quart views."""
+    from quart import current_app, session, g, request
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            current = current_app.extensions.get("page_cache")
+            cache = current() if current is not None else None
+            if cache is None or not cache.listener_active() or session.get('_flashes'):
+                return await view(*args, **kwargs)
+
+            key = _key(view_name, kwargs, request.args, cache.version())
+            html = cache.get(key)
+            if html is not None:
+                inc("page_cache_requests_total", view=view_name, result="hit")
+                return html
+
+            inc("page_cache_requests_total", view=view_name, result="miss")
+            g._page_cache_flashed = False
+            html = await view(*args, **kwargs)
+            if isinstance(html, str) and not g.get('_page_cache_flashed'):
+                cache.put(key, html)
+            return html
+        return wrapper
+    return decorator
+
+
+def init_app(app, current):
+    """
+    Hooks the cache into a Flask app: starts the request's cache listener on first use in each process.
+
+    Args:
+        app: The Flask app.
+        current: Function returning the PageCache for the current request (or None).
+    """
+    from flask import g, message_flashed
+    app.extensions["page_cache"] = current
+
+    @app.before_request
+    def _ensure_page_cache_listener():
+        cache = current()
+        if cache is not None and not cache.listener_active():
+            cache.start_listener()
+
+    def _flashed(sender, message, category, **extra):
+        g._page_cache_flashed = True
+
+    # A weak reference (the default) would drop this local function as soon as init returns
+    message_flashed.connect(_flashed, app, weak=False)
+
+
+def init_async_app(app, current):
+    """init_app() for a Quart app."""
+    from quart import g, message_flashed
+    app.extensions["page_cache"] = current
+
+    @app.before_request
+    async def _ensure_page_cache_listener():
+        cache = current()
+        if cache is not None and not cache.listener_active():
+            cache.start_listener()
+
+    async def _flashed(sender, message, category, **extra):
+        g._page_cache_flashed = True
+
+    # A weak reference (the default) would drop this local function as soon as init returns
+    message_flashed.connect(_flashed, app, weak=False)
@@ -0,0 +1,187 @@
+"""
+Search index module for Task Manager
+In-memory inverted index over task names and courses
+
+Names and courses are split into lowercase word tokens. Each token maps to
+the IDs of the tasks containing it, and a prefix trie over the tokens lets
+partially typed words match as the user types. The index is updated one
+task at a time, so queries never touch Firestore: the web app feeds it
+from its Firestore listener and the desktop app from its synced snapshot.
+"""
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Splits text into lowercase alphanumeric tokens."""
+    if not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def task_tokens(task):
+    """Returns the set of tokens a task is searchable by (name and course)."""
+    return frozenset(tokenize(task.get("name")) + tokenize(task.get("course")))
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+
+class TaskIndex:
+    """
+    Inverted index with prefix search over task names and courses.
+
+    All methods are thread-safe; the web app updates the index from the
+    Firestore listener thread while request threads query it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._doc_tokens = {}
+        self._tasks = {}
+        self._trie = _TrieNode()
+        self.loaded = False
+        # Bumped on every change, so derived views (e.g. the calendar feed) can be cached per version
+        self.version = 0
+
+    def __len__(self):
+        return len(self._tasks)
+
+    # --- Updates ---
+    def upsert(self, doc_id, task):
+        """Adds or replaces one task."""
+        tokens = task_tokens(task)
+        with self._lock:
+            old_tokens = self._doc_tokens.get(doc_id, frozenset())
+            for token in old_tokens - tokens:
+                self._unpost(token, doc_id)
+            for token in tokens - old_tokens:
+                self._post(token, doc_id)
+            self._doc_tokens[doc_id] = tokens
+            self._tasks[doc_id] = task
+            self.version += 1
+
+    def remove(self, doc_id):
+        """Removes one task (no-op if it is not indexed)."""
+        with self._lock:
+            for token in self._doc_tokens.pop(doc_id, ()):
+                self._unpost(token, doc_id)
+            if self._tasks.pop(doc_id, None) is not None:
+                self.version += 1
+
+    def sync(self, rows):
+        """
+        Brings the index in line with a full task list, touching only tasks that changed.
+
+        Args:
+            rows (iterable): (doc_id, task dict) pairs, e.g. snapshot.sorted_rows().
+
+        Returns:
+            int: Number of tasks added, changed or removed.
+        """
+        seen = set()
+        changes = 0
+        for doc_id, task in rows:
+            seen.add(doc_id)
+            if self._tasks.get(doc_id) != task:
+                self.upsert(doc_id, task)
+                changes += 1
+        for doc_id in [doc_id for doc_id in self._tasks if doc_id not in seen]:
+            self.remove(doc_id)
+            changes += 1
+        self.loaded = True
+        return changes
+
+    def apply_changes(self, changes):
+        """Applies Firestore on_snapshot DocumentChanges (ADDED, MODIFIED, REMOVED)."""
+        for change in changes:
+            if change.type.name == "REMOVED":
+                self.remove(change.document.id)
+            else:
+                self.upsert(change.document.id, change.document.to_dict())
+        self.loaded = True
+
+    def _post(self, token, doc_id):
+        ids = self._postings.get(token)
+        if ids is None:
+            ids = self._postings[token] = set()
+            node = self._trie
+            for char in token:
+                node = node.children.setdefault(char, _TrieNode())
+            node.terminal = True
+        ids.add(doc_id)
+
+    def _unpost(self, token, doc_id):
+        ids = self._postings.get(token)
+        if ids is None:
+            return
+        ids.discard(doc_id)
+        if ids:
+            return
+        del self._postings[token]
+        # Unmark the token and prune trie branches that no longer lead to one
+        path = [self._trie]
+        for char in token:
+            path.append(path[-1].children[char])
+        path[-1].terminal = False
+        for depth in range(len(token), 0, -1):
+            node = path[depth]
+            if node.terminal or node.children:
+                break
+            del path[depth - 1].children[token[depth - 1]]
+
+    # --- Queries ---
+    def rows(self):
+        """Returns a (doc_id, task) list of every indexed task."""
+        with self._lock:
+            return list(self._tasks.items())
+
+    def _prefix_ids(self, prefix):
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        ids = set()
+        stack = [(node, prefix)]
+        while stack:
+            node, token = stack.pop()
+            if node.terminal:
+                ids |= self._postings[token]
+            for char, child in node.children.items():
+                stack.append((child, token + char))
+        return ids
+
+    def search(self, query, limit=None):
+        """
+        Finds tasks whose name or course has a word starting with each word of the query.
+
+        Args:
+            query (str): Search text, e.g. "lab web" or a partially typed "datab".
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: (doc_id, task) pairs sorted by due date.
+        """
+        words = set(tokenize(query))
+        if not words:
+            return []
+        with self._lock:
+            candidates = [self._prefix_ids(word) for word in words]
+            candidates.sort(key=len)
+            ids = set(candidates[0])
+            for other in candidates[1:]:
+                ids &= other
+                if not ids:
+                    break
+            results = [(doc_id, self._tasks[doc_id]) for doc_id in ids]
+        results.sort(key=lambda row: row[1].get("due", ""))
+        return results[:limit] if limit else results
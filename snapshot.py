@@ -0,0 +1,141 @@
+"""
+Snapshot module for Task Manager
+Persists the task list and a sync watermark between desktop sessions
+(pickle protocol 5) and reconciles it with Firestore on the next launch
+"""
+import os
+import pickle
+import sync
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_DIR = os.getenv("TASKMANAGER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".taskmanager"))
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, "tasks_snapshot.pickle")
+
+
+def snapshot_path(uid=None):
+    """Returns the snapshot file for a user (TASKMANAGER_USER by default); each user keeps their own."""
+    from tenants import default_user
+    uid = default_user() if uid is None else uid
+    return os.path.join(SNAPSHOT_DIR, f"tasks_snapshot-{uid}.pickle") if uid else SNAPSHOT_PATH
+
+
+def empty_snapshot():
+    return {"version": SNAPSHOT_VERSION, "docs": {}, "watermark": None}
+
+
+def load_snapshot(path=None):
+    """
+    Loads the snapshot saved by the last session.
+
+    Args:
+        path (str): Snapshot file path (defaults to snapshot_path()).
+
+    Returns:
+        dict: {"docs": {doc_id: {"update_time": str, "task": dict}}, "watermark": datetime or None}.
+        An empty snapshot is returned if the file is missing, unreadable or from another version.
+    """
+    try:
+        with open(path or snapshot_path(), "rb") as f:
+            snap = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return empty_snapshot()
+    if not isinstance(snap, dict) or snap.get("version") != SNAPSHOT_VERSION:
+        return empty_snapshot()
+    return snap
+
+
+def save_snapshot(snap, path=None):
+    """Writes the snapshot (to snapshot_path() by default) atomically so a crash mid-write never leaves a corrupt file."""
+    path = path or snapshot_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snap, f, protocol=5)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Failed to save task snapshot: {e}")
+
+
+def _stamp(update_time):
+    return update_time.isoformat() if update_time else None
+
+
+def _advance_watermark(snap, updated_at):
+    if updated_at is None:
+        return
+    if snap["watermark"] is None or updated_at > snap["watermark"]:
+        snap["watermark"] = updated_at
+
+
+def apply_doc(snap, doc):
+    """Adds or replaces one Firestore DocumentSnapshot in the snapshot."""
+    task = doc.to_dict()
+    snap["docs"][doc.id] = {"update_time": _stamp(doc.update_time), "task": task}
+    _advance_watermark(snap, task.get("updated_at"))
+
+
+def full_load(col):
+    """Reads the whole collection into a fresh snapshot."""
+    snap = empty_snapshot()
+    for doc in col.stream():
+        apply_doc(snap, doc)
+    return snap
+
+
+def reconcile(col, db, snap):
+    """
+    Brings a snapshot up to date, downloading only documents that changed.
+
+    With a recent watermark this is a pair of `updated_at > watermark`
+    queries (see sync.fetch_changes), so the cost is proportional to the
+    number of changes. Otherwise the collection is listed with an empty
+    projection (document names and update times only) and the full body
+    of new or modified documents is fetched with a single get_all() call.
+
+    Args:
+        col: The tasks CollectionReference.
+        db: The Firestore client (used for get_all).
+        snap (dict): The snapshot from load_snapshot().
+
+    Returns:
+        tuple: (snapshot, number of changed documents, number of removed documents)
+    """
+    if not snap["docs"]:
+        snap = full_load(col)
+        return snap, len(snap["docs"]), 0
+
+    if sync.is_watermark_usable(snap["watermark"]):
+        changed, deleted, watermark = sync.fetch_changes(col, snap["watermark"])
+        for doc in changed:
+            apply_doc(snap, doc)
+        removed = [doc_id for doc_id in deleted if snap["docs"].pop(doc_id, None) is not None]
+        snap["watermark"] = watermark
+        return snap, len(changed), len(removed)
+
+    seen = set()
+    changed_refs = []
+    for doc in col.select([]).stream():
+        seen.add(doc.id)
+        cached = snap["docs"].get(doc.id)
+        if cached is None or cached["update_time"] != _stamp(doc.update_time):
+            changed_refs.append(doc.reference)
+
+    removed = [doc_id for doc_id in snap["docs"] if doc_id not in seen]
+    for doc_id in removed:
+        del snap["docs"][doc_id]
+
+    if changed_refs:
+        for doc in db.get_all(changed_refs):
+            if doc.exists:
+                apply_doc(snap, doc)
+    for entry in snap["docs"].values():
+        _advance_watermark(snap, entry["task"].get("updated_at"))
+    return snap, len(changed_refs), len(removed)
+
+
+def sorted_rows(snap):
+    """Returns [(doc_id, task)] ordered by due date, as the main task list shows them."""
+    rows = [(doc_id, entry["task"]) for doc_id, entry in snap["docs"].items()]
+    rows.sort(key=lambda row: row[1].get("due", ""))
+    return rows
@@ -1,23 +1,34 @@
 #!/usr/bin/env python3
 """
 Startup script for Task Manager Web App
+Runs the app under gunicorn (see gunicorn.conf.py); pass --dev for the
+Flask debug server with auto-reload
 """
 
 import os
 import sys
-from web_app import app
 
 if __name__ == '__main__':
     # Check if required files exist
     # Firebase credential no longer required with MongoDB backend
-    
+
     if not os.path.exists('.env'):
         print("Warning: .env file not found!")
         print("Email functionality may not work without EMAIL_USER and EMAIL_PASSWORD.")
-    
-    print("Starting Task Manager Web App...")
-    print("Open your browser and go to: http://localhost:8081")
-    print("Press Ctrl+C to stop the server")
-    
-    # Run the Flask app
-    app.run(debug=True, host='0.0.0.0', port=8081)
+
+    if "--dev" in sys.argv:
+        # The reloader imports the app in a parent and a child process; only the child sends reminders
+        os.environ["TASKMANAGER_DISABLE_SCHEDULER"] = "1"
+        from web_app import app, start_scheduler
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_scheduler()
+
+        print("Starting Task Manager Web App (development server)...")
+        print("Open your browser and go to: http://localhost:8081")
+        print("Press Ctrl+C to stop the server")
+        app.run(debug=True, host='0.0.0.0', port=8081)
+    else:
+        print("Starting Task Manager Web App with gunicorn...")
+        print("Open your browser and go to: http://localhost:8081")
+        print("Press Ctrl+C to stop the server")
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "web_app:app"])
@@ -0,0 +1,23 @@
+// Set default dates
+document.addEventListener('DOMContentLoaded', function() {
+    const today = new Date();
+    const tomorrow = new Date(today);
+    tomorrow.setDate(tomorrow.getDate() + 1);
+
+    document.getElementById('start_date').value = today.toISOString().split('T')[0];
+    document.getElementById('due_date').value = tomorrow.toISOString().split('T')[0];
+
+    // Handle recurrence type changes
+    const recurrenceRadios = document.querySelectorAll('input[name="recurrence_type"]');
+    const weeklyDays = document.getElementById('weekly_days');
+
+    recurrenceRadios.forEach(radio => {
+        radio.addEventListener('change', function() {
+            if (this.value === 'weekly') {
+                weeklyDays.style.display = 'block';
+            } else {
+                weeklyDays.style.display = 'none';
+            }
+        });
+    });
+});
@@ -0,0 +1,89 @@
+// As-you-type search suggestions
+(function() {
+    const input = document.getElementById('navSearch');
+    const list = document.getElementById('navSearchSuggestions');
+    let pending = null;
+    input.addEventListener('input', function() {
+        clearTimeout(pending);
+        pending = setTimeout(function() {
+            if (!input.value.trim()) { list.innerHTML = ''; return; }
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(input.value))
+                .then(response => response.json())
+                .then(suggestions => {
+                    list.innerHTML = '';
+                    suggestions.forEach(s => {
+                        const option = document.createElement('option');
+                        option.value = s.name;
+                        option.label = s.course + ' \u2013 ' + s.due_formatted;
+                        list.appendChild(option);
+                    });
+                });
+        }, 100);
+    });
+})();
+
+// Table sorting functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const sortableHeaders = document.querySelectorAll('.sortable');
+    let currentSort = { column: null, direction: 'asc' };
+
+    sortableHeaders.forEach(header => {
+        header.style.cursor = 'pointer';
+        header.addEventListener('click', function() {
+            const sortColumn = this.dataset.sort;
+            const tbody = this.closest('table').querySelector('tbody');
+            const rows = Array.from(tbody.querySelectorAll('tr'));
+
+            // Determine sort direction
+            if (currentSort.column === sortColumn) {
+                currentSort.direction = currentSort.direction === 'asc' ? 'desc' : 'asc';
+            } else {
+                currentSort.direction = 'asc';
+            }
+            currentSort.column = sortColumn;
+
+            // Update sort icons
+            sortableHeaders.forEach(h => {
+                const icon = h.querySelector('i');
+                icon.className = 'fas fa-sort';
+            });
+            const currentIcon = this.querySelector('i');
+            currentIcon.className = currentSort.direction === 'asc' ? 'fas fa-sort-up' : 'fas fa-sort-down';
+
+            // Sort rows
+            rows.sort((a, b) => {
+                let aVal, bVal;
+
+                switch(sortColumn) {
+                    case 'name':
+                        aVal = a.cells[0].textContent.trim();
+                        bVal = b.cells[0].textContent.trim();
+                        break;
+                    case 'course':
+                        aVal = a.cells[1].textContent.trim();
+                        bVal = b.cells[1].textContent.trim();
+                        break;
+                    case 'start':
+                        aVal = new Date(a.cells[2].textContent.trim());
+                        bVal = new Date(b.cells[2].textContent.trim());
+                        break;
+                    case 'due':
+                        aVal = new Date(a.cells[3].textContent.trim());
+                        bVal = new Date(b.cells[3].textContent.trim());
+                        break;
+                    case 'status':
+                        aVal = a.cells[4].textContent.trim();
+                        bVal = b.cells[4].textContent.trim();
+                        break;
+                }
+
+                if (aVal < bVal) return currentSort.direction === 'asc' ? -1 : 1;
+                if (aVal > bVal) return currentSort.direction === 'asc' ? 1 : -1;
+                return 0;
+            });
+
+            // Re-append sorted rows
+            rows.forEach(row => tbody.appendChild(row));
+        });
+    });
+});
@@ -0,0 +1,13 @@
+document.getElementById('bulkSelectAll').addEventListener('change', function() {
+    document.querySelectorAll('input[name="task_ids"][form="bulkForm"]').forEach(box => box.checked = this.checked);
+});
+document.getElementById('bulkForm').addEventListener('submit', function(event) {
+    const selected = document.querySelectorAll('input[name="task_ids"][form="bulkForm"]:checked').length;
+    if (!selected) {
+        alert('Select at least one task.');
+        event.preventDefault();
+    } else if (document.getElementById('bulkAction').value === 'delete' &&
+               !confirm('Delete ' + selected + ' selected tasks? This cannot be undone!')) {
+        event.preventDefault();
+    }
+});
@@ -0,0 +1,27 @@
+(function poll() {
+    fetch(document.getElementById('jobProgress').dataset.statusUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(job => {
+            const bar = document.getElementById('jobProgress');
+            const finished = job.status === 'done' || job.status === 'failed';
+            // Unknown size (CSV upload): a full striped bar until the job finishes
+            const percent = job.total ? Math.round(100 * job.done / job.total) : 100;
+            bar.style.width = Math.min(percent, 100) + '%';
+            bar.textContent = job.total ? job.done + ' / ' + job.total : (job.done ? job.done + ' rows' : '');
+            document.getElementById('jobMessage').textContent =
+                job.status === 'failed' ? 'Failed: ' + job.error : (job.message || 'Working...');
+            if (!finished) {
+                setTimeout(poll, 1000);
+                return;
+            }
+            bar.classList.remove('progress-bar-animated', 'progress-bar-striped');
+            bar.classList.add(job.status === 'done' ? 'bg-success' : 'bg-danger');
+            const errors = (job.result && job.result.errors) || [];
+            document.getElementById('jobErrors').innerHTML = errors.map(e => '<li></li>').join('');
+            document.querySelectorAll('#jobErrors li').forEach((li, i) => li.textContent = errors[i]);
+            if (job.result && job.result.download) {
+                document.getElementById('jobDownload').classList.remove('d-none');
+            }
+            document.getElementById('jobActions').classList.remove('d-none');
+        });
+})();
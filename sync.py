@@ -0,0 +1,254 @@
+"""
+Sync module for Task Manager
+Stamps every task write with a server `updated_at` time and fetches only
+the tasks changed since a watermark
+
+Deletes cannot be seen by an `updated_at` query, so every delete also
+writes a tombstone to the `task_deletions` collection next to `tasks`.
+Tombstones older than DELETION_LOG_RETENTION_DAYS are pruned; clients
+whose watermark is older than that must do a full reload instead.
+
+Run `python sync.py --backfill` once to stamp tasks written before this
+field existed.
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+from firestore_utils import get_db
+import counters
+
+DELETIONS_COLLECTION = "task_deletions"
+DELETION_LOG_RETENTION_DAYS = 30
+
+# Firestore allows at most 500 writes per batch
+BATCH_LIMIT = 500
+# Margin between our clock and the server's commit times for watermarks taken from a full scan
+WATERMARK_SKEW = timedelta(minutes=2)
+
+
+def stamp(data):
+    """
+    Adds a server-side `updated_at` timestamp to a task write.
+
+    Args:
+        data (dict): Fields passed to add(), set() or update().
+
+    Returns:
+        dict: The same dict, for inline use: tasks_col.add(stamp({...})).
+    """
+    from firebase_admin import firestore
+    data["updated_at"] = firestore.SERVER_TIMESTAMP
+    return data
+
+
+def deletions_col(col, db=None):
+    """Returns the tombstone collection that sits next to a tasks collection."""
+    parent = col.parent
+    if parent is not None:
+        return parent.collection(DELETIONS_COLLECTION)
+    return (db or get_db()).collection(DELETIONS_COLLECTION)
+
+
+def delete_tasks(col, doc_ids, before=None):
+    """
+    Deletes tasks and records a tombstone for each, in batches.
+
+    Each batch also decrements the dashboard counters for the tasks it deletes.
+
+    Args:
+        col: The tasks collection.
+        doc_ids (iterable): IDs of the tasks to delete.
+        before (dict): {doc_id: task fields} if the caller already has them
+            (e.g. from a counters.COUNTED_FIELDS projection); read here otherwise.
+
+    Returns:
+        int: Number of tasks deleted.
+    """
+    db = get_db()
+    doc_ids = list(doc_ids)
+    if before is None:
+        before = counters.counted_fields(col, doc_ids, db)
+    tombstones = deletions_col(col)
+    batch = db.batch()
+    delta = None
+    pending = 0
+    deleted = 0
+    for doc_id in doc_ids:
+        batch.delete(col.document(doc_id))
+        batch.set(tombstones.document(doc_id), stamp({"task_id": doc_id}))
+        delta = counters.diff(before.get(doc_id), None, delta)
+        pending += 2
+        deleted += 1
+        # Leave room for the counters write
+        if pending >= BATCH_LIMIT - 2:
+            counters.write_delta(batch, col, delta)
+            batch.commit()
+            batch = db.batch()
+            delta = None
+            pending = 0
+    if pending:
+        counters.write_delta(batch, col, delta)
+        batch.commit()
+    return deleted
+
+
+async def async_delete_tasks(db, col, doc_ids, before=None):
+    """delete_tasks() for the async Firestore client."""
+    doc_ids = list(doc_ids)
+    if before is None:
+        before = await counters.async_counted_fields(db, col, doc_ids)
+    tombstones = deletions_col(col, db)
+    batch = db.batch()
+    delta = None
+    pending = 0
+    deleted = 0
+    for doc_id in doc_ids:
+        batch.delete(col.document(doc_id))
+        batch.set(tombstones.document(doc_id), stamp({"task_id": doc_id}))
+        delta = counters.diff(before.get(doc_id), None, delta)
+        pending += 2
+        deleted += 1
+        if pending >= BATCH_LIMIT - 2:
+            counters.write_delta(batch, col, delta, db)
+            await batch.commit()
+            batch = db.batch()
+            delta = None
+            pending = 0
+    if pending:
+        counters.write_delta(batch, col, delta, db)
+        await batch.commit()
+    return deleted
+
+
+def is_watermark_usable(watermark):
+    """A watermark older than the tombstone retention window may have missed deletes."""
+    if watermark is None:
+        return False
+    return watermark > datetime.now(timezone.utc) - timedelta(days=DELETION_LOG_RETENTION_DAYS)
+
+
+def fetch_changes(col, watermark):
+    """
+    Fetches the tasks written and deleted since a watermark.
+
+    Args:
+        col: The tasks collection (or a query on it).
+        watermark (datetime): The newest `updated_at` the caller has already seen.
+
+    Returns:
+        tuple: (list of changed DocumentSnapshots, list of deleted task IDs, new watermark)
+    """
+    changed = list(col.where("updated_at", ">", watermark).order_by("updated_at").stream())
+    deleted = []
+    new_watermark = watermark
+    for doc in changed:
+        updated_at = doc.to_dict().get("updated_at")
+        if updated_at and updated_at > new_watermark:
+            new_watermark = updated_at
+
+    for doc in deletions_col(col).where("updated_at", ">", watermark).stream():
+        deleted.append(doc.id)
+        updated_at = doc.to_dict().get("updated_at")
+        if updated_at and updated_at > new_watermark:
+            new_watermark = updated_at
+    return changed, deleted, new_watermark
+
+
+async def async_fetch_changes(db, col, watermark):
+    """fetch_changes() for the async Firestore client."""
+    changed = [doc async for doc in col.where("updated_at", ">", watermark).order_by("updated_at").stream()]
+    deleted = []
+    new_watermark = watermark
+    for doc in changed:
+        updated_at = doc.to_dict().get("updated_at")
+        if updated_at and updated_at > new_watermark:
+            new_watermark = updated_at
+
+    async for doc in deletions_col(col, db).where("updated_at", ">", watermark).stream():
+        deleted.append(doc.id)
+        updated_at = doc.to_dict().get("updated_at")
+        if updated_at and updated_at > new_watermark:
+            new_watermark = updated_at
+    return changed, deleted, new_watermark
+
+
+def latest_updated_at(docs):
+    """Returns the newest `updated_at` among task snapshots, or None."""
+    stamps = [doc.to_dict().get("updated_at") for doc in docs]
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+
+def full_scan_watermark(docs, started):
+    """
+    Returns the watermark to continue from after a full scan.
+
+    Everything written before the scan started is in it, so the next delta
+    query only needs the changes since then, even when no scanned task (or
+    only an old one) carries `updated_at`. Writes committed while the scan
+    ran can carry a slightly earlier server time than our clock, hence the
+    WATERMARK_SKEW margin.
+
+    Args:
+        docs (list): The scanned task snapshots.
+        started (datetime): When the scan started (UTC).
+
+    Returns:
+        datetime: Never None, so an empty scan does not force another full scan.
+    """
+    newest = latest_updated_at(docs)
+    floor = started - WATERMARK_SKEW
+    return max(newest, floor) if newest is not None else floor
+
+
+def backfill_updated_at(col):
+    """Stamps every task that has no `updated_at` yet. Returns the number of tasks stamped."""
+    db = get_db()
+    batch = db.batch()
+    pending = 0
+    stamped = 0
+    for doc in col.stream():
+        if "updated_at" in doc.to_dict():
+            continue
+        batch.update(doc.reference, stamp({}))
+        pending += 1
+        stamped += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return stamped
+
+
+def prune_deletion_log(col, days=DELETION_LOG_RETENTION_DAYS):
+    """Removes tombstones older than the retention window. Returns the number removed."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    db = get_db()
+    batch = db.batch()
+    pending = 0
+    removed = 0
+    for doc in deletions_col(col).where("updated_at", "<", cutoff).stream():
+        batch.delete(doc.reference)
+        pending += 1
+        removed += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return removed
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from firestore_utils import get_tasks_col
+
+    load_dotenv()
+    if "--backfill" in sys.argv:
+        print(f"✅ Stamped updated_at on {backfill_updated_at(get_tasks_col())} tasks.")
+    elif "--prune" in sys.argv:
+        print(f"✅ Removed {prune_deletion_log(get_tasks_col())} old deletion tombstones.")
+    else:
+        print("Usage: python sync.py --backfill | --prune")
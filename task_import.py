@@ -0,0 +1,304 @@
+"""
+Task import module for Task Manager
+Streams tasks from an .xlsx or .csv file into Firestore in batches
+
+Used by import.py and by the web app's upload import job. Rows are read
+one at a time (openpyxl read-only mode / csv.reader) and written in
+batches, so large files never sit in memory at once.
+
+Imports are upserts: a row matches the existing task with the same course,
+name (ignoring case and spacing) and due time, so repeated tasks such as a
+weekly "Update Tasks" stay separate, and a hash of the row's cells is
+stored on the task as `import_hash`. Re-importing a sheet only writes rows
+that are new or whose cells changed, and updates only the columns the
+sheet has, so statuses set in the apps are kept until the sheet's own
+status cell changes. A row repeating an earlier row's task is skipped.
+"""
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+from task_utils import STORAGE_FORMAT, DISPLAY_FORMAT
+from sync import stamp, BATCH_LIMIT
+from firestore_utils import get_db
+import counters
+
+REQUIRED_COLUMNS = ["name", "course", "start", "due"]
+# Date formats accepted in text cells, besides real spreadsheet dates
+DATE_FORMATS = [STORAGE_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d", DISPLAY_FORMAT, "%m/%d/%Y %I:%M %p",
+                "%m/%d/%Y %H:%M", "%m/%d/%Y"]
+# Columns compared against tasks imported before import_hash existed
+STORED_COLUMNS = REQUIRED_COLUMNS + ["status", "reminder_hours", "reminder_sent", "recurrence_days"]
+# One write is left for the counters document
+IMPORT_BATCH_SIZE = BATCH_LIMIT - 1
+
+
+def open_rows(path):
+    """
+    Opens a task file for streaming.
+
+    Args:
+        path (str): Path to an .xlsx or .csv file with a header row.
+
+    Returns:
+        tuple: (iterator of dicts keyed by lowercase header, total row count or None if unknown)
+    """
+    if path.lower().endswith(".csv"):
+        return _csv_rows(path), None
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    sheet = workbook.active
+    total = sheet.max_row - 1 if sheet.max_row else None
+    return _sheet_rows(workbook, sheet), total
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [str(h).strip().lower() for h in next(reader, [])]
+        for values in reader:
+            yield dict(zip(header, values))
+
+
+def _sheet_rows(workbook, sheet):
+    try:
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h).strip().lower() if h is not None else "" for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date '{text}'")
+
+
+def sheet_fields(row):
+    """
+    Reads the task fields a spreadsheet row provides, without filling in defaults.
+
+    Extra columns are kept as they are; empty cells are dropped.
+
+    Args:
+        row (dict): Cell values keyed by lowercase header.
+
+    Returns:
+        dict: The fields, or None for an empty row.
+
+    Raises:
+        ValueError: If a required column is missing or a date cannot be parsed.
+    """
+    fields = {key: value for key, value in row.items() if key and value not in (None, "")}
+    if not fields:
+        return None
+    missing = [column for column in REQUIRED_COLUMNS if column not in fields]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    fields["name"] = str(fields["name"]).strip()
+    fields["course"] = str(fields["course"]).strip()
+    fields["start"] = _parse_date(fields["start"]).strftime(STORAGE_FORMAT)
+    fields["due"] = _parse_date(fields["due"]).strftime(STORAGE_FORMAT)
+    for key in ("reminder_hours", "reminder_sent", "recurrence_days"):
+        if key in fields:
+            fields[key] = int(float(fields[key]))
+    return fields
+
+
+def normalize_task(row):
+    """
+    Turns one spreadsheet row into a new task document (sheet_fields() plus defaults).
+
+    Returns:
+        dict: The task, or None for an empty row.
+    """
+    task = sheet_fields(row)
+    if task is None:
+        return None
+    task.setdefault("status", "Not Started")
+    task.setdefault("reminder_hours", 24)
+    task.setdefault("reminder_sent", 0)
+    task.setdefault("recurrence_days", 0)
+    task.setdefault("is_recurring_instance", False)
+    return task
+
+
+def task_key(task):
+    """Identity used to match rows to tasks: course and name (ignoring case and spacing) and due time."""
+    return (" ".join(str(task.get("course", "")).split()).casefold(),
+            " ".join(str(task.get("name", "")).split()).casefold(),
+            task.get("due"))
+
+
+def content_hash(fields):
+    """Stable hash of a row's fields, stored on the task as import_hash."""
+    payload = json.dumps(fields, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_index(col):
+    """
+    Loads the key -> task index that imports are matched against, with one projected query.
+
+    Recurring instances are left out, since they share their parent's name.
+    Tasks written before import_hash existed keep their STORED_COLUMNS
+    values instead, which unchanged() compares with the row's cells.
+
+    Returns:
+        dict: {task_key: {"id": doc_id, "hash": str or None, "stored": dict, "before": counted fields}}
+    """
+    index = {}
+    fields = sorted(set(STORED_COLUMNS + counters.COUNTED_FIELDS + ["import_hash", "is_recurring_instance"]))
+    for doc in col.select(fields).stream():
+        task = doc.to_dict()
+        if task.get("is_recurring_instance"):
+            continue
+        key = task_key(task)
+        if key in index:
+            continue
+        stored_hash = task.get("import_hash")
+        index[key] = {"id": doc.id, "hash": stored_hash,
+                      "stored": None if stored_hash else {column: task.get(column) for column in STORED_COLUMNS},
+                      "before": {field: task.get(field) for field in counters.COUNTED_FIELDS}}
+    return index
+
+
+def unchanged(existing, fields, row_hash):
+    """
+    True if a row would not change the task it matched.
+
+    Tasks with an import_hash compare hashes; older tasks compare only the
+    columns the row has, so a sheet that was imported before hashes existed
+    is not rewritten in full on its next import.
+
+    Args:
+        existing (dict): The task's load_index() entry.
+        fields (dict): The row's sheet_fields().
+        row_hash (str): content_hash(fields).
+    """
+    if existing["hash"] is not None:
+        return existing["hash"] == row_hash
+    stored = existing["stored"]
+    return all(column in stored and stored[column] == value for column, value in fields.items())
+
+
+def import_rows(col, rows, on_progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Upserts rows into the tasks collection, one batch (with its counter increments) per batch_size writes.
+
+    New rows are added as tasks, changed rows update the matching task and
+    unchanged rows are not written at all. A row for a task an earlier row of
+    the same file already wrote is reported as skipped.
+
+    Args:
+        col: The tasks collection.
+        rows (iterable): Row dicts, e.g. from open_rows().
+        on_progress (callable): Called as on_progress(rows_read) after each batch.
+        batch_size (int): Writes per batched commit.
+
+    Returns:
+        dict: {"imported": int, "updated": int, "unchanged": int, "skipped": int,
+               "errors": [first few "row N: reason" strings]}
+    """
+    db = get_db()
+    index = load_index(col)
+    result = {"imported": 0, "updated": 0, "unchanged": 0, "skipped": 0, "errors": []}
+    # task_key -> row number, for rows of this file that matched or created a task
+    seen = {}
+    batch = db.batch()
+    delta = None
+    pending = 0
+    read = 0
+
+    def commit():
+        nonlocal batch, delta, pending
+        counters.write_delta(batch, col, delta)
+        batch.commit()
+        batch, delta, pending = db.batch(), None, 0
+        if on_progress is not None:
+            on_progress(read)
+
+    def skip(reason):
+        result["skipped"] += 1
+        if len(result["errors"]) < 20:
+            # +1 for the header row
+            result["errors"].append(f"row {read + 1}: {reason}")
+
+    for read, row in enumerate(rows, start=1):
+        try:
+            fields = sheet_fields(row)
+        except ValueError as e:
+            skip(e)
+            continue
+        if fields is None:
+            continue
+        row_hash = content_hash(fields)
+        key = task_key(fields)
+        if key in seen:
+            # Writing it too would make the two rows overwrite each other (or, in one batch, update a
+            # task the batch has not created yet)
+            skip(f"same course, name and due time as row {seen[key]}")
+            continue
+        seen[key] = read + 1
+        existing = index.get(key)
+        if existing is None:
+            task = normalize_task(row)
+            ref = col.document()
+            batch.set(ref, stamp({**task, "import_hash": row_hash}))
+            delta = counters.diff(None, task, delta)
+            result["imported"] += 1
+        elif not unchanged(existing, fields, row_hash):
+            after = {**existing["before"], **{field: fields[field] for field in counters.COUNTED_FIELDS
+                                              if field in fields}}
+            update = counters.with_completion(existing["before"], {**fields, "import_hash": row_hash})
+            batch.update(col.document(existing["id"]), stamp(update))
+            delta = counters.diff(existing["before"], after, delta)
+            result["updated"] += 1
+        else:
+            result["unchanged"] += 1
+            continue
+        pending += 1
+        if pending >= batch_size:
+            commit()
+    if pending:
+        commit()
+    elif on_progress is not None:
+        on_progress(read)
+    return result
+
+
+def import_file(col, path, on_progress=None):
+    """Streams an .xlsx/.csv file into the tasks collection. See import_rows()."""
+    rows, _ = open_rows(path)
+    return import_rows(col, rows, on_progress)
+
+
+def is_supported(filename):
+    return os.path.splitext(filename or "")[1].lower() in (".xlsx", ".csv")
+
+
+def import_job(job, col, path):
+    """
+    Background job body (see jobs.py) for an uploaded file; deletes the upload when done.
+
+    Returns:
+        dict: The import_rows() result.
+    """
+    try:
+        rows, total = open_rows(path)
+        job.progress(0, total, "Importing tasks")
+        result = import_rows(col, rows, on_progress=job.progress)
+    finally:
+        os.remove(path)
+    job.progress(job.record["done"], message=f"Added {result['imported']} tasks, updated {result['updated']}, "
+                                             f"{result['unchanged']} unchanged, skipped {result['skipped']} rows")
+    return result
@@ -0,0 +1,158 @@
+"""
+Task utility module for Task Manager
+Date formatting and recurrence helpers shared by the desktop and web apps
+"""
+import io
+from datetime import datetime, timedelta
+
+STORAGE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DISPLAY_FORMAT = "%m/%d/%y %I:%M %p"
+DONE_STATUSES = ["Completed", "Graded"]
+ACTIVE_STATUSES = ["Not Started", "In Progress"]
+
+
+def decode_recurrence_days(bitmask):
+    day_map = {1: "Mon", 2: "Tue", 4: "Wed", 8: "Thu", 16: "Fri", 32: "Sat", 64: "Sun"}
+    weekdays = [name for bit, name in day_map.items() if bitmask and (bitmask & bit)]
+    return ", ".join(weekdays)
+
+
+def calculate_next_occurrence(current_due, recurrence_days):
+    day_map = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6}
+    selected_days = [day_map[bit] for bit in day_map.keys() if recurrence_days & bit]
+
+    if not selected_days:
+        return None
+
+    next_date = current_due + timedelta(days=1)
+
+    for i in range(7):
+        check_date = next_date + timedelta(days=i)
+        if check_date.weekday() in selected_days:
+            return check_date.replace(hour=current_due.hour, minute=current_due.minute, second=current_due.second)
+
+    return next_date + timedelta(days=7)
+
+
+def format_task(task):
+    """
+    Adds the display fields used by the web templates.
+
+    Args:
+        task (dict): A task as stored in Firestore.
+
+    Returns:
+        dict: The same task with start_formatted and due_formatted set.
+    """
+    try:
+        start_dt = datetime.strptime(task.get("start", ""), STORAGE_FORMAT)
+        due_dt = datetime.strptime(task.get("due", ""), STORAGE_FORMAT)
+        task['start_formatted'] = start_dt.strftime(DISPLAY_FORMAT)
+        task['due_formatted'] = due_dt.strftime(DISPLAY_FORMAT)
+    except (ValueError, TypeError):
+        task['start_formatted'] = "Invalid Date"
+        task['due_formatted'] = "Invalid Date"
+    return task
+
+
+def shift_task(task, days):
+    """
+    Returns the fields that move a task's start and due dates by a number of days.
+
+    The reminder is re-armed so it fires again before the new due date.
+    """
+    start_dt = datetime.strptime(task["start"], STORAGE_FORMAT) + timedelta(days=days)
+    due_dt = datetime.strptime(task["due"], STORAGE_FORMAT) + timedelta(days=days)
+    return {"start": start_dt.strftime(STORAGE_FORMAT), "due": due_dt.strftime(STORAGE_FORMAT), "reminder_sent": 0}
+
+
+def recurrence_from_form(form):
+    """Reads the add-task form's recurrence fields into the stored bitmask (-1 = same weekday as due)."""
+    recurrence_type = form.get('recurrence_type', 'none')
+    recurrence_days = 0
+
+    if recurrence_type == 'weekly':
+        day_map = {'mon': 1, 'tue': 2, 'wed': 4, 'thu': 8, 'fri': 16, 'sat': 32, 'sun': 64}
+        for day in day_map.keys():
+            if form.get(f'recurrence_{day}'):
+                recurrence_days |= day_map[day]
+    elif recurrence_type == 'due_weekday':
+        recurrence_days = -1
+    return recurrence_days
+
+
+def recurring_instance_dues(start_dt, due_dt, recurrence_days, weeks=12):
+    """
+    Lists the (start, due) datetimes of the future instances a recurring task should spawn.
+
+    Args:
+        start_dt (datetime): Start of the original task.
+        due_dt (datetime): Due date of the original task.
+        recurrence_days (int): Weekday bitmask, or -1 for "same weekday as due, next week".
+        weeks (int): How many occurrences to generate for a weekday bitmask.
+
+    Returns:
+        list: [(start_dt, due_dt)] for each future instance.
+    """
+    duration = due_dt - start_dt
+    if recurrence_days == -1:
+        next_due = due_dt + timedelta(days=7)
+        return [(next_due - duration, next_due)]
+
+    instances = []
+    current_due = due_dt
+    for week in range(1, weeks + 1):
+        next_occurrence = calculate_next_occurrence(current_due, recurrence_days)
+        if not next_occurrence:
+            break
+        instances.append((next_occurrence - duration, next_occurrence))
+        current_due = next_occurrence
+    return instances
+
+
+def tasks_to_excel(tasks):
+    """
+    Builds the colour-coded Excel export.
+
+    pandas/openpyxl are only needed here, so they are imported on first export.
+
+    Args:
+        tasks (list): Task dicts as stored in Firestore.
+
+    Returns:
+        io.BytesIO: The .xlsx file, rewound to the start.
+    """
+    import pandas as pd
+    from openpyxl.styles import PatternFill
+
+    df = pd.DataFrame(tasks)
+
+    df['start'] = pd.to_datetime(df['start']).dt.strftime('%m/%d/%y %I:%M %p')
+    df['due'] = pd.to_datetime(df['due']).dt.strftime('%m/%d/%y %I:%M %p')
+
+    df = df[['name', 'course', 'start', 'due', 'status']]
+    df.columns = ['Task Name', 'Class', 'Start Date', 'Due Date', 'Status']
+
+    output = io.BytesIO()
+    writer = pd.ExcelWriter(output, engine='openpyxl')
+    df.to_excel(writer, index=False, sheet_name='Tasks')
+
+    worksheet = writer.sheets['Tasks']
+
+    colors = {
+        'Not Started': 'FF7171',
+        'In Progress': 'FFFACD',
+        'Completed': 'D0F0C0',
+        'Graded': 'ADD8E6'
+    }
+
+    for index, row in df.iterrows():
+        status = row['Status']
+        if status in colors:
+            fill = PatternFill(start_color=colors[status], end_color=colors[status], fill_type="solid")
+            for col_idx in range(1, len(df.columns) + 1):
+                worksheet.cell(row=index + 2, column=col_idx).fill = fill
+
+    writer.close()
+    output.seek(0)
+    return output
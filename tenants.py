@@ -0,0 +1,201 @@
+"""
+Tenants module for Task Manager
+Per-user partitioning of tasks under users/<uid>/tasks
+
+Each user's tasks live in their own subcollection, with their counters,
+archive and deletion log next to it (counters.py, archive.py and sync.py
+already place those beside whatever tasks collection they are given), so
+every query, listener and export only touches one user's documents. The
+empty user ID means the original top-level `tasks` collection, which keeps
+single-user installs working unchanged.
+
+The desktop app, import.py and the CLI tools act as TASKMANAGER_USER; the
+web app acts as the user signed in to the browser session or named by an
+authenticating proxy (see web_common.request_user). A user's web password
+hash is the `password_hash` field of users/<uid> (set it with
+`python tenants.py set-password <uid>`) and their Discord webhook is its
+`discord_webhook_url` field, falling back to DISCORD_WEBHOOK_URL.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from firestore_utils import get_db
+
+USERS_COLLECTION = "users"
+TASKS_COLLECTION = "tasks"
+WEBHOOK_CACHE_SECONDS = int(os.getenv("WEBHOOK_CACHE_SECONDS", "300"))
+COPY_BATCH = 400
+
+_UID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_webhook_lock = threading.Lock()
+_webhooks = {}
+
+
+def default_user():
+    """The user the desktop app and the CLI tools act as: TASKMANAGER_USER, "" for the shared collection."""
+    return os.getenv("TASKMANAGER_USER", "")
+
+
+def valid_uid(uid):
+    """True for "" (the shared collection) or 1-64 letters, digits, '-' and '_'."""
+    return uid == "" or (isinstance(uid, str) and _UID_RE.match(uid) is not None)
+
+
+def tasks_col(uid=None, db=None):
+    """
+    Returns a user's tasks collection.
+
+    Args:
+        uid (str): User ID; None means default_user(), "" the shared top-level collection.
+        db: Firestore client (sync or async); defaults to get_db().
+
+    Returns:
+        CollectionReference: users/<uid>/tasks, or tasks.
+
+    Raises:
+        ValueError: If the user ID is not valid.
+    """
+    uid = default_user() if uid is None else uid
+    if not valid_uid(uid):
+        raise ValueError(f"Invalid user ID: {uid!r}")
+    db = db or get_db()
+    if not uid:
+        return db.collection(TASKS_COLLECTION)
+    return db.collection(USERS_COLLECTION).document(uid).collection(TASKS_COLLECTION)
+
+
+def list_users(db=None):
+    """
+    Lists the users that have tasks, for jobs that visit every tenant (e.g. reminders).
+
+    Uses list_documents(), which also returns users/<uid> documents that were
+    never written but have a tasks subcollection. The shared collection ("")
+    is included first.
+
+    Returns:
+        list: User IDs.
+    """
+    db = db or get_db()
+    return [""] + sorted(ref.id for ref in db.collection(USERS_COLLECTION).list_documents() if valid_uid(ref.id))
+
+
+def webhook_url(uid=None):
+    """
+    Returns the Discord webhook a user's reminders go to.
+
+    The users/<uid> document is read at most once per WEBHOOK_CACHE_SECONDS.
+
+    Args:
+        uid (str): User ID; None means default_user().
+
+    Returns:
+        str: The user's `discord_webhook_url`, else DISCORD_WEBHOOK_URL (may be None).
+    """
+    uid = default_user() if uid is None else uid
+    fallback = os.getenv("DISCORD_WEBHOOK_URL")
+    if not uid:
+        return fallback
+    now = time.monotonic()
+    with _webhook_lock:
+        cached = _webhooks.get(uid)
+        if cached is not None and now - cached[1] < WEBHOOK_CACHE_SECONDS:
+            return cached[0] or fallback
+    try:
+        doc = get_db().collection(USERS_COLLECTION).document(uid).get(field_paths=["discord_webhook_url"])
+        url = (doc.to_dict() or {}).get("discord_webhook_url") if doc.exists else None
+    except Exception as e:
+        print(f"[WARN] Could not read the webhook for user {uid}: {e}")
+        url = cached[0] if cached is not None else None
+    with _webhook_lock:
+        _webhooks[uid] = (url, now)
+    return url or fallback
+
+
+def set_password(uid, password, db=None):
+    """
+    Stores the hash of a user's web app password on users/<uid>.
+
+    Args:
+        uid (str): A non-empty user ID.
+        password (str): The new password.
+    """
+    from werkzeug.security import generate_password_hash
+    if not uid or not valid_uid(uid):
+        raise ValueError(f"Invalid user ID: {uid!r}")
+    db = db or get_db()
+    db.collection(USERS_COLLECTION).document(uid).set({"password_hash": generate_password_hash(password)},
+                                                      merge=True)
+
+
+def check_password(uid, password, db=None):
+    """
+    Checks a web app sign-in against the hash stored by set_password().
+
+    Returns:
+        bool: False for an unknown user, a user without a password or a wrong password.
+    """
+    from werkzeug.security import check_password_hash
+    if not uid or not valid_uid(uid) or not password:
+        return False
+    db = db or get_db()
+    doc = db.collection(USERS_COLLECTION).document(uid).get(field_paths=["password_hash"])
+    stored = (doc.to_dict() or {}).get("password_hash") if doc.exists else None
+    return bool(stored) and check_password_hash(stored, password)
+
+
+def migrate(uid, db=None):
+    """
+    Copies the shared top-level tasks into a user's collection and rebuilds its counters.
+
+    Document IDs are kept, so running it twice is harmless. The original
+    documents are left in place; delete them (e.g. with the web app's
+    Delete All while no user is selected) once the copy is checked.
+
+    Args:
+        uid (str): The user to copy the tasks to.
+
+    Returns:
+        int: Number of tasks copied.
+    """
+    import counters
+    if not uid or not valid_uid(uid):
+        raise ValueError(f"Invalid user ID: {uid!r}")
+    db = db or get_db()
+    source, target = tasks_col("", db), tasks_col(uid, db)
+    copied = 0
+    batch = db.batch()
+    for doc in source.stream():
+        batch.set(target.document(doc.id), doc.to_dict())
+        copied += 1
+        if copied % COPY_BATCH == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    counters.reconcile(target)
+    return copied
+
+
+if __name__ == '__main__':
+    # Copy the shared tasks to a user: python tenants.py migrate <uid>
+    # List the users with tasks:       python tenants.py list
+    # Set a web app password:          python tenants.py set-password <uid>
+    from dotenv import load_dotenv
+    load_dotenv()
+    if len(sys.argv) == 3 and sys.argv[1] == "migrate":
+        print(f"✅ Copied {migrate(sys.argv[2])} tasks to users/{sys.argv[2]}/tasks.")
+    elif len(sys.argv) == 2 and sys.argv[1] == "list":
+        for uid in list_users():
+            print(uid or "(shared)")
+    elif len(sys.argv) == 3 and sys.argv[1] == "set-password":
+        import getpass
+        password = getpass.getpass(f"New password for {sys.argv[2]}: ")
+        if not password or password != getpass.getpass("Repeat it: "):
+            print("❌ The passwords are empty or do not match.")
+            sys.exit(1)
+        set_password(sys.argv[2], password)
+        print(f"✅ Password set for {sys.argv[2]}.")
+    else:
+        print("Usage: python tenants.py migrate <uid> | list | set-password <uid>")
+        sys.exit(2)
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Seeded for user "alice" (password "correct horse") by the web_app fixture
+ALICE_TASK = {"name": "Essay draft for alice", "course": "History", "start": "2030-01-01 09:00:00",
+              "due": "2030-01-02 09:00:00", "status": "Not Started", "reminder_sent": 0}
+
+
+@pytest.fixture
+def fake_db():
+    """A fresh in-memory Firestore client installed as the app's database."""
+    import firestore_fake
+    return firestore_fake.install()
+
+
+@pytest.fixture(scope="session")
+def web_app():
+    """The Flask app module, imported once against its own fake database with user "alice" set up."""
+    import firestore_fake
+    os.environ["TASKMANAGER_DISABLE_SCHEDULER"] = "1"
+    os.environ["SECRET_KEY"] = "test-secret"
+    db = firestore_fake.install()
+    import counters
+    import tenants
+    import web_app
+    tenants.set_password("alice", "correct horse", db)
+    counters.add_task(tenants.tasks_col("alice", db), dict(ALICE_TASK))
+    return web_app
+
+
+@pytest.fixture(scope="session")
+def async_web_app(web_app):
+    """The Quart app module, imported once against the Flask app's fake database."""
+    import firestore_fake
+    firestore_fake.install(web_app.db)
+    import async_web_app
+    return async_web_app
+
+
+class Page:
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+
+class FlaskClient:
+    def __init__(self, module):
+        self.module = module
+        self._client = module.app.test_client()
+
+    def get(self, path, headers=None, remote_addr="127.0.0.1"):
+        response = self._client.get(path, headers=headers, environ_base={"REMOTE_ADDR": remote_addr})
+        return Page(response.status_code, response.headers, response.get_data(as_text=True))
+
+    def post(self, path, data):
+        response = self._client.post(path, data=data)
+        return Page(response.status_code, response.headers, response.get_data(as_text=True))
+
+
+class QuartClient:
+    def __init__(self, module, loop):
+        self.module = module
+        self._client = module.app.test_client()
+        self._loop = loop
+
+    def _page(self, request):
+        response = self._loop.run_until_complete(request)
+        text = self._loop.run_until_complete(response.get_data(as_text=True))
+        return Page(response.status_code, response.headers, text)
+
+    def get(self, path, headers=None, remote_addr="127.0.0.1"):
+        return self._page(self._client.get(path, headers=headers, scope_base={"client": (remote_addr, 0)}))
+
+    def post(self, path, data):
+        return self._page(self._client.post(path, form=data))
+
+
+@pytest.fixture(scope="session")
+def event_loop_for_quart():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(params=["flask", "quart"])
+def client_factory(request, web_app):
+    """Makes test clients for web_app.py or async_web_app.py, so a test runs the same requests against both."""
+    import firestore_fake
+    # Module-level get_db() calls (counters, sync) must see the apps' database, not an earlier test's fake_db
+    firestore_fake.install(web_app.db)
+    if request.param == "flask":
+        return lambda: FlaskClient(web_app)
+    module = request.getfixturevalue("async_web_app")
+    loop = request.getfixturevalue("event_loop_for_quart")
+    return lambda: QuartClient(module, loop)
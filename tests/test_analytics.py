@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from analytics import AnalyticsCache, analyze
+from search_index import TaskIndex
+
+NOW = datetime(2024, 5, 8, 12, 0)  # a Wednesday
+FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def task(course, status, due, completed=None):
+    fields = {"name": "Task", "course": course, "status": status,
+              "start": (due - timedelta(days=1)).strftime(FMT), "due": due.strftime(FMT)}
+    if completed is not None:
+        fields["completed_at"] = completed.astimezone()
+    return fields
+
+
+def test_counts_weeks_and_lead_times():
+    rows = list(enumerate([
+        task("Math", "Not Started", NOW - timedelta(hours=1)),                     # overdue
+        task("Math", "In Progress", NOW + timedelta(days=2)),                      # due soon
+        task("Math", "Completed", NOW - timedelta(days=1), NOW - timedelta(days=2)),  # 24h early
+        task("Art", "Graded", NOW - timedelta(days=3), NOW - timedelta(days=2)),      # 24h late
+        task("Art", "Not Started", NOW + timedelta(days=30)),
+        {"name": "Broken", "course": "Art", "status": "Not Started", "due": "next week"},
+    ]))
+    stats = analyze(rows, NOW)
+    assert (stats["total"], stats["active"], stats["completed"], stats["overdue"]) == (6, 4, 2, 1)
+
+    current = [week for week in stats["weeks"] if week["start"] == "2024-05-06"][0]
+    assert current == {"start": "2024-05-06", "due": 3, "active": 2, "done": 1}
+    assert sum(week["due"] for week in stats["weeks"]) == 5
+
+    math, art = stats["courses"]
+    assert (math["course"], math["total"], math["overdue"], math["due_next_7_days"]) == ("Math", 3, 1, 1)
+    assert (art["course"], art["total"], art["active"]) == ("Art", 3, 2)
+    assert math["lead_time"]["median_hours"] == 24.0
+    assert art["lead_time"]["median_hours"] == -24.0
+    assert stats["lead_time"]["count"] == 2
+    assert stats["lead_time"]["on_time_rate"] == 0.5
+
+
+def test_matches_brute_force():
+    rng = random.Random(3)
+    statuses = ["Not Started", "In Progress", "Completed", "Graded"]
+    tasks = [task(rng.choice(["A", "B", "C"]), rng.choice(statuses),
+                  NOW + timedelta(hours=rng.randrange(-24 * 90, 24 * 120)))
+             for _ in range(400)]
+    stats = analyze(enumerate(tasks), NOW)
+
+    due = [datetime.strptime(t["due"], FMT) for t in tasks]
+    active = [t["status"] in ("Not Started", "In Progress") for t in tasks]
+    assert stats["overdue"] == sum(a and d < NOW for a, d in zip(active, due))
+    first = datetime(2024, 5, 6) - timedelta(weeks=8)
+    for i, week in enumerate(stats["weeks"]):
+        lo, hi = first + timedelta(weeks=i), first + timedelta(weeks=i + 1)
+        assert week["due"] == sum(lo <= d < hi for d in due)
+        assert week["active"] == sum(a and lo <= d < hi for a, d in zip(active, due))
+    for course in stats["courses"]:
+        assert course["due_next_7_days"] == sum(
+            a and t["course"] == course["course"] and NOW <= d < NOW + timedelta(days=7)
+            for t, a, d in zip(tasks, active, due))
+
+
+def test_empty():
+    stats = analyze([], NOW)
+    assert stats["total"] == 0
+    assert stats["courses"] == []
+    assert stats["lead_time"]["median_hours"] is None
+
+
+def test_cache_rebuilds_only_after_index_changes():
+    index = TaskIndex()
+    index.upsert("a", task("Math", "Not Started", NOW))
+    cache = AnalyticsCache(index)
+    columns = cache.columns()
+    assert cache.columns() is columns
+    index.upsert("b", task("Art", "Not Started", NOW))
+    assert cache.columns() is not columns
+    assert cache.compute(NOW)["total"] == 2
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import archive
+import counters
+from task_utils import STORAGE_FORMAT
+from tenants import tasks_col
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime(STORAGE_FORMAT)
+
+
+def add(col, **fields):
+    task = {"name": "Weekly quiz", "course": "Physics", "start": fields["due"], "status": "Not Started", **fields}
+    return counters.add_task(col, task)
+
+
+def test_is_archivable():
+    cutoff = days_ago(30)
+    assert archive.is_archivable({"due": days_ago(40), "status": "Completed"}, cutoff)
+    assert archive.is_archivable({"due": days_ago(40), "status": "Not Started", "is_recurring_instance": True}, cutoff)
+    assert not archive.is_archivable({"due": days_ago(40), "status": "Not Started"}, cutoff)
+    assert not archive.is_archivable({"due": days_ago(10), "status": "Completed"}, cutoff)
+
+
+def test_archived_recurring_instance_is_found(fake_db):
+    col = tasks_col("", fake_db)
+    parent_due, instance_due = days_ago(47), days_ago(40)
+    add(col, due=parent_due, recurrence_days=1)
+    add(col, due=instance_due, recurrence_days=1, is_recurring_instance=True)
+
+    assert archive.archive_tasks(col) == 1
+    assert [doc.to_dict()["due"] for doc in col.stream()] == [parent_due]
+    assert archive.is_archived(col, "Weekly quiz", instance_due)
+    assert not archive.is_archived(col, "Weekly quiz", parent_due)
+    assert not archive.is_archived(col, "Other task", instance_due)
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+from calendar_feed import FeedCache, build_feed, not_modified, recurrence_rule, response_headers
+from search_index import TaskIndex
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+PARENT = {"name": "Lab", "course": "Networks", "start": "2024-05-06 09:00:00", "due": "2024-05-06 10:00:00",
+          "recurrence_days": 1 | 4, "status": "Not Started"}
+
+
+def instance(start, due, **fields):
+    return {"name": "Lab", "course": "Networks", "start": start, "due": due,
+            "is_recurring_instance": True, "parent_task_id": "p", **fields}
+
+
+def events(body):
+    return body.count("BEGIN:VEVENT")
+
+
+def test_recurring_instances_collapse_into_rrule():
+    rows = [("p", PARENT),
+            ("i1", instance("2024-05-08 09:00:00", "2024-05-08 10:00:00")),
+            ("i2", instance("2024-05-13 09:00:00", "2024-05-13 10:00:00"))]
+    body, _, _ = build_feed(rows, now=NOW)
+    assert events(body) == 1
+    assert "RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20240513T090000\r\n" in body
+    assert "SUMMARY:Lab (Networks)" in body
+
+
+def test_edited_instance_keeps_its_own_event():
+    rows = [("p", PARENT),
+            ("i1", instance("2024-05-08 09:00:00", "2024-05-08 10:00:00")),
+            ("i2", instance("2024-05-13 11:00:00", "2024-05-13 12:00:00"))]
+    body, _, _ = build_feed(rows, now=NOW)
+    assert events(body) == 2
+    assert "UNTIL=20240508T090000" in body
+
+
+def test_rrule_shifts_days_to_start_weekday():
+    # Due Wednesday, starting the Monday before: the events start on Mondays
+    start, due = datetime(2024, 5, 6, 9), datetime(2024, 5, 8, 9)
+    rule = recurrence_rule({"recurrence_days": 4}, start, due, datetime(2024, 5, 20, 9))
+    assert rule == "FREQ=WEEKLY;BYDAY=MO;UNTIL=20240520T090000"
+    assert recurrence_rule({"recurrence_days": 0}, start, due, due) is None
+    assert recurrence_rule({"recurrence_days": -1}, start, due, due).startswith("FREQ=WEEKLY;UNTIL=")
+
+
+def test_escaping_folding_and_course_filter():
+    name = "Essay; draft, part 1 " + "x" * 80
+    rows = [("a", {"name": name, "course": "English", "start": "2024-05-01 09:00:00", "due": "2024-05-02 09:00:00"}),
+            ("b", {"name": "Other", "course": "Math", "start": "2024-05-01 09:00:00", "due": "2024-05-02 09:00:00"})]
+    body, _, _ = build_feed(rows, course="English", now=NOW)
+    assert events(body) == 1
+    assert r"Essay\; draft\, part 1" in body
+    assert all(len(line.encode("utf-8")) <= 75 for line in body.split("\r\n"))
+    assert body.endswith("END:VCALENDAR\r\n")
+
+
+def test_etag_ignores_dtstamp_and_tracks_changes():
+    updated = datetime(2024, 4, 30, 8, 0, 0, 500000, tzinfo=timezone.utc)
+    rows = [("a", {**PARENT, "recurrence_days": 0, "updated_at": updated})]
+    _, etag, last_modified = build_feed(rows, now=NOW)
+    _, same, _ = build_feed(rows, now=datetime(2024, 5, 2, tzinfo=timezone.utc))
+    _, changed, _ = build_feed([("a", {**rows[0][1], "status": "Completed"})], now=NOW)
+    assert etag == same != changed
+    assert last_modified == updated
+
+    headers = response_headers(etag, last_modified)
+    assert headers["ETag"] == f'"{etag}"'
+    assert headers["Last-Modified"] == "Tue, 30 Apr 2024 08:00:00 GMT"
+    assert not_modified({"If-None-Match": f'W/"{etag}", "other"'}, etag, last_modified)
+    assert not not_modified({"If-None-Match": '"other"'}, etag, last_modified)
+    assert not_modified({"If-Modified-Since": headers["Last-Modified"]}, etag, last_modified)
+    assert not not_modified({"If-Modified-Since": "Mon, 29 Apr 2024 08:00:00 GMT"}, etag, last_modified)
+    assert not not_modified({"If-Modified-Since": "garbage"}, etag, last_modified)
+    assert not not_modified({}, etag, last_modified)
+
+
+def test_feed_cache_renders_once_per_index_version():
+    index = TaskIndex()
+    index.upsert("a", {**PARENT, "recurrence_days": 0})
+    cache = FeedCache(index)
+    first = cache.get()
+    assert cache.get() is first
+    index.upsert("b", {**PARENT, "name": "Quiz", "recurrence_days": 0})
+    second = cache.get()
+    assert second is not first
+    assert events(second[0]) == 2
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import counters
+import metrics
+from tenants import tasks_col
+
+NOW = datetime(2025, 10, 1, 14, 30)
+
+
+def task(status="Not Started", course="Physics", due="2025-10-01 14:15:00"):
+    return {"name": "HW", "course": course, "start": "2025-09-30 09:00:00", "due": due, "status": status}
+
+
+def test_diff_moves_a_task_between_buckets():
+    delta = counters.diff(task(), task(status="Completed"))
+    assert delta["total"] == 0
+    assert delta["status"] == {"Not Started": -1, "Completed": 1}
+    assert delta["course"] == {"Physics": 0}
+    assert delta["active_due"] == {"2025-10-01 14": -1}
+
+
+def test_overdue_starts_with_the_next_hour():
+    data = {"total": 3, "status": {"Not Started": 3},
+            "active_due": {"2025-10-01 13": 1, "2025-10-01 14": 1, "2025-10-01 15": 1}}
+    assert counters.summarize(data, NOW)["overdue"] == 1
+    assert counters.summarize(data, datetime(2025, 10, 1, 15, 0))["overdue"] == 2
+
+
+def test_canonical_folds_past_hours():
+    data = {"total": 2, "overdue": 5, "status": {"Not Started": 2, "Completed": 0},
+            "active_due": {"2025-09-01 10": 2, "2025-10-01 12": -1, "2025-10-02 09": 1}}
+    counts = counters.canonical(data, "2025-10-01 14")
+    assert counts["overdue"] == 6
+    assert counts["active_due"] == {"2025-10-02 09": 1}
+    assert counts["status"] == {"Not Started": 2}
+    assert counters.summarize(data, NOW)["overdue"] == 6
+
+
+def test_correction():
+    live = counters.canonical({"total": 2, "overdue": 1, "status": {"Not Started": 2}}, "2025-10-01 14")
+    counted = counters.canonical({"total": 3, "status": {"Not Started": 2, "Completed": 1},
+                                  "active_due": {"2025-10-01 12": 2}}, "2025-10-01 14")
+    assert counters.correction(live, counted) == {"total": 1, "overdue": 1, "status": {"Completed": 1},
+                                                  "course": {}, "active_due": {}}
+    assert counters.correction(counted, counted) is None
+
+
+def test_reconcile_corrects_drift_with_increments(fake_db):
+    col = tasks_col("", fake_db)
+    for status in ("Not Started", "Completed"):
+        counters.add_task(col, task(status=status))
+    col.document().set(task(due="2025-10-03 09:00:00"))  # written without updating the counters
+
+    counts = counters.reconcile(col, NOW)
+    assert counts["total"] == 3
+    summary = counters.summarize(counters.counters_doc(col).get().to_dict(), NOW)
+    assert (summary["total"], summary["active"], summary["overdue"]) == (3, 2, 0)
+
+
+def test_reconcile_keeps_writes_made_while_counting(fake_db, monkeypatch):
+    col = tasks_col("", fake_db)
+    counters.add_task(col, task())
+    count_tasks = counters._count_tasks
+    calls = []
+
+    def count_then_write(*args):
+        counted = count_tasks(*args)
+        if not calls:
+            # Lands after the count but before reconcile writes
+            counters.add_task(col, task(course="History"))
+        calls.append(1)
+        return counted
+
+    monkeypatch.setattr(counters, "_count_tasks", count_then_write)
+    counters.reconcile(col, NOW)
+    assert len(calls) == 2
+    summary = counters.summarize(counters.counters_doc(col).get().to_dict(), NOW)
+    assert summary["total"] == 2
+    assert summary["by_course"] == {"Physics": 1, "History": 1}
+
+
+def test_prune_past_hours_shrinks_the_document(fake_db):
+    col = tasks_col("", fake_db)
+    for hour in range(10):
+        counters.add_task(col, task(due=f"2025-09-01 {hour:02d}:00:00"))
+    counters.add_task(col, task(due="2025-10-05 09:00:00"))
+    assert counters.prune_past_hours(col, NOW) == 10
+    data = counters.counters_doc(col).get().to_dict()
+    assert data["active_due"] == {"2025-10-05 09": 1}
+    assert counters.summarize(data, NOW)["overdue"] == 10
+
+    # Finishing a task in a folded hour still lowers the overdue count
+    doc = next(d for d in col.stream() if d.to_dict()["due"].startswith("2025-09-01 00"))
+    counters.update_task(col, doc.id, {"status": "Completed"})
+    assert counters.summarize(counters.counters_doc(col).get().to_dict(), NOW)["overdue"] == 9
+
+
+def test_batch_and_transaction_writes_are_counted(fake_db):
+    def written(op):
+        return metrics.snapshot()[0].get(("firestore_documents_written_total", (("op", op),)), 0)
+
+    col = tasks_col("", fake_db)
+    batches, transactions = written("batch_commit"), written("transaction_commit")
+    ref = counters.add_task(col, task())
+    # The task and the counters document, in one batch
+    assert written("batch_commit") == batches + 2
+    counters.update_task(col, ref.id, {"status": "Completed"})
+    assert written("transaction_commit") == transactions + 2
+    assert counters.update_tasks(col, [ref.id], {"status": "In Progress"}) == 1
+    assert written("transaction_commit") == transactions + 4
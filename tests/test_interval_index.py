@@ -0,0 +1,105 @@
+import random
+from datetime import datetime, timedelta
+
+from interval_index import IntervalIndex, busy_warning, week_start, week_view, window
+
+FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def task(start, due, name="Task", status="Not Started"):
+    return {"name": name, "status": status, "start": start, "due": due}
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_window():
+    assert window(task("2024-05-01 09:00:00", "2024-05-02 09:00:00")) == ("2024-05-01 09:00:00", "2024-05-02 09:00:00")
+    assert window(task("2024-05-02 09:00:00", "2024-05-01 09:00:00")) == ("2024-05-01 09:00:00", "2024-05-02 09:00:00")
+    assert window(task("", "2024-05-01 09:00:00")) is None
+    assert window({"due": "2024-05-01 09:00:00"}) is None
+
+
+def test_overlapping_and_updates():
+    index = IntervalIndex()
+    index.upsert("a", task("2024-05-01 09:00:00", "2024-05-03 09:00:00"))
+    index.upsert("b", task("2024-05-02 09:00:00", "2024-05-02 10:00:00", status="Completed"))
+    index.upsert("c", task("2024-05-05 09:00:00", "2024-05-06 09:00:00"))
+    assert ids(index.overlapping("2024-05-02 00:00:00", "2024-05-02 23:59:59")) == ["a", "b"]
+    assert ids(index.overlapping("2024-05-02 00:00:00", "2024-05-02 23:59:59", active_only=True)) == ["a"]
+    # Touching endpoints count as overlapping
+    assert ids(index.overlapping("2024-05-03 09:00:00", "2024-05-05 09:00:00")) == ["a", "c"]
+
+    index.upsert("a", task("2024-05-10 09:00:00", "2024-05-11 09:00:00"))
+    assert ids(index.overlapping("2024-05-01 00:00:00", "2024-05-04 00:00:00")) == ["b"]
+    index.remove("b")
+    index.remove("missing")
+    assert index.overlapping("2024-05-01 00:00:00", "2024-05-04 00:00:00") == []
+    assert len(index) == 2
+
+
+def test_sync_counts_changes():
+    index = IntervalIndex()
+    rows = [("a", task("2024-05-01 09:00:00", "2024-05-02 09:00:00")),
+            ("b", task("2024-05-01 09:00:00", "2024-05-02 09:00:00"))]
+    assert index.sync(rows) == 2
+    assert index.sync(rows) == 0
+    assert index.sync(rows[:1]) == 1
+    assert index.loaded
+
+
+def test_matches_brute_force():
+    rng = random.Random(5)
+    base = datetime(2024, 5, 1)
+    index = IntervalIndex()
+    tasks = {}
+    for _ in range(800):
+        doc_id = str(rng.randrange(80))
+        if rng.random() < 0.25:
+            index.remove(doc_id)
+            tasks.pop(doc_id, None)
+        else:
+            start = base + timedelta(hours=rng.randrange(24 * 60))
+            due = start + timedelta(hours=rng.randrange(-48, 24 * 10))
+            tasks[doc_id] = task(start.strftime(FMT), due.strftime(FMT))
+            index.upsert(doc_id, tasks[doc_id])
+        lo = base + timedelta(hours=rng.randrange(24 * 60))
+        hi = lo + timedelta(hours=rng.randrange(24 * 7))
+        lo, hi = lo.strftime(FMT), hi.strftime(FMT)
+        expected = sorted((window(t)[0], doc_id) for doc_id, t in tasks.items()
+                          if window(t)[0] <= hi and window(t)[1] >= lo)
+        assert ids(index.overlapping(lo, hi)) == [doc_id for _, doc_id in expected]
+
+
+def test_busy_warning():
+    index = IntervalIndex()
+    index.upsert("a", task("2024-05-01 09:00:00", "2024-05-03 09:00:00", "Essay"))
+    index.upsert("b", task("2024-05-02 09:00:00", "2024-05-04 09:00:00", "Lab"))
+    index.upsert("c", task("2024-05-02 12:00:00", "2024-05-02 18:00:00", "Quiz"))
+    index.upsert("d", task("2024-05-02 12:00:00", "2024-05-02 18:00:00", "Done", status="Graded"))
+    new = task("2024-05-02 00:00:00", "2024-05-02 23:00:00")
+
+    peak, at, tasks = index.peak_load(new["start"], new["due"])
+    assert (peak, at) == (3, "2024-05-02 12:00:00")
+    assert ids(tasks) == ["a", "b", "c"]
+    warning = busy_warning(index, new, threshold=3)
+    assert warning.startswith("Busy period: 3 other active tasks")
+    assert "Essay, Lab, Quiz" in warning
+    assert busy_warning(index, new, exclude="c", threshold=3) is None
+    assert busy_warning(index, task("2024-06-01 00:00:00", "2024-06-02 00:00:00"), threshold=1) is None
+
+
+def test_week_view():
+    index = IntervalIndex()
+    index.upsert("a", task("2024-05-04 09:00:00", "2024-05-07 09:00:00"))
+    index.upsert("b", task("2024-05-12 23:00:00", "2024-05-14 09:00:00"))
+    index.upsert("c", task("2024-05-14 09:00:00", "2024-05-15 09:00:00"))
+    monday = week_start(datetime(2024, 5, 9, 15, 30))
+    assert monday == datetime(2024, 5, 6)
+    view = week_view(index, monday)
+    assert view["days"][0] == monday and len(view["days"]) == 7
+    assert [(doc_id, days) for doc_id, _, days in view["tasks"]] == [
+        ("a", [True, True, False, False, False, False, False]),
+        ("b", [False, False, False, False, False, False, True]),
+    ]
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def tenant(web_app):
+    tenant = web_app.web_common.Tenant("reminders", web_app.db)
+    due = datetime.now() + timedelta(hours=1)
+    ref = tenant.col.document()
+    ref.set({"name": "Lab report", "course": "Physics", "start": "2030-01-01 09:00:00",
+             "due": due.strftime("%Y-%m-%d %H:%M:%S"), "status": "Not Started", "reminder_sent": 0,
+             "reminder_hours": 24})
+    return tenant, ref
+
+
+def failures():
+    counters, _ = metrics.snapshot()
+    return counters.get(("reminder_delivery_failures_total", (("source", "web"),)), 0)
+
+
+def test_failed_delivery_is_retried(web_app, tenant, monkeypatch):
+    tenant, ref = tenant
+    monkeypatch.setattr(web_app.web_common, "send_discord_message", lambda message, url=None: False)
+    before = failures()
+    web_app.web_common.send_reminders(tenant, datetime.now())
+    assert ref.get().to_dict()["reminder_sent"] == 0
+    assert ref.id in tenant.pending_reminders
+    assert failures() == before + 1
+
+    monkeypatch.setattr(web_app.web_common, "send_discord_message", lambda message, url=None: True)
+    web_app.web_common.send_reminders(tenant, datetime.now())
+    assert ref.get().to_dict()["reminder_sent"] == 1
+    assert ref.id not in tenant.pending_reminders
@@ -0,0 +1,72 @@
+import random
+
+from search_index import TaskIndex, tokenize
+
+
+def task(name, course="Database Design", due="2025-10-01 17:00:00"):
+    return {"name": name, "course": course, "due": due}
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize():
+    assert tokenize("HW 2 - Assembly Language") == ["hw", "2", "assembly", "language"]
+    assert tokenize(None) == []
+
+
+def test_prefix_search_matches_every_word():
+    index = TaskIndex()
+    index.upsert("a", task("Lab 3 report", "Web Application Development", "2025-10-02 09:00:00"))
+    index.upsert("b", task("Lab 4", "Database Design", "2025-10-01 09:00:00"))
+    index.upsert("c", task("Quiz 2", "Web Application Development"))
+    assert ids(index.search("lab")) == ["b", "a"]
+    assert ids(index.search("la web")) == ["a"]
+    assert ids(index.search("datab")) == ["b"]
+    assert index.search("lab quiz") == []
+    assert index.search("  ") == []
+    assert ids(index.search("lab", limit=1)) == ["b"]
+
+
+def test_updates_and_removals_prune_tokens():
+    index = TaskIndex()
+    index.upsert("a", task("Midterm review"))
+    index.upsert("a", task("Final review"))
+    assert index.search("midterm") == []
+    assert ids(index.search("fin")) == ["a"]
+    index.remove("a")
+    assert index.search("review") == []
+    assert index._trie.children == {}
+    assert len(index) == 0
+
+
+def test_sync_touches_only_changes():
+    index = TaskIndex()
+    rows = [("a", task("Essay")), ("b", task("Lab"))]
+    assert index.sync(rows) == 2
+    assert index.sync(rows) == 0
+    assert index.sync([("a", task("Essay draft"))]) == 2
+    assert ids(index.search("draft")) == ["a"]
+    assert index.search("lab") == []
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    words = ["lab", "label", "quiz", "quick", "essay", "exam", "hw", "db", "design", "web"]
+    index = TaskIndex()
+    tasks = {}
+    for step in range(600):
+        doc_id = str(rng.randrange(60))
+        if rng.random() < 0.2:
+            index.remove(doc_id)
+            tasks.pop(doc_id, None)
+        else:
+            tasks[doc_id] = task(" ".join(rng.sample(words, 2)), rng.choice(words),
+                                 f"2025-10-{rng.randrange(1, 29):02d} 09:00:00")
+            index.upsert(doc_id, tasks[doc_id])
+        query = " ".join(word[:rng.randrange(1, len(word) + 1)] for word in rng.sample(words, rng.randrange(1, 3)))
+        expected = {doc_id for doc_id, t in tasks.items()
+                    if all(any(token.startswith(q) for token in tokenize(t["name"]) + tokenize(t["course"]))
+                           for q in tokenize(query))}
+        assert set(ids(index.search(query))) == expected
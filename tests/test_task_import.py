@@ -0,0 +1,81 @@
+import os
+
+import counters
+import firestore_fake
+import task_import
+from tenants import tasks_col
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "tasks_sample.csv")
+
+
+def count_commits(db):
+    commits = []
+    original = db._commit
+
+    def _commit(writes):
+        commits.append(len(writes))
+        return original(writes)
+
+    db._commit = _commit
+    return commits
+
+
+def test_sample_sheet_imports_every_row(fake_db):
+    col = tasks_col("", fake_db)
+    result = task_import.import_file(col, SAMPLE)
+    assert result["imported"] == 46
+    assert result["skipped"] == 0
+    assert len(list(col.stream())) == 46
+
+
+def test_small_batches_match_default_batches(fake_db):
+    col = tasks_col("", fake_db)
+    rows, _ = task_import.open_rows(SAMPLE)
+    result = task_import.import_rows(col, rows, batch_size=1)
+    assert result["imported"] == 46
+    assert len(list(col.stream())) == 46
+
+
+def test_reimport_writes_nothing(fake_db):
+    col = tasks_col("", fake_db)
+    task_import.import_file(col, SAMPLE)
+    commits = count_commits(fake_db)
+    result = task_import.import_file(col, SAMPLE)
+    assert result == {"imported": 0, "updated": 0, "unchanged": 46, "skipped": 0, "errors": []}
+    assert commits == []
+    assert len(list(col.stream())) == 46
+
+
+def test_reimport_of_tasks_without_import_hash_writes_nothing(fake_db):
+    col = tasks_col("", fake_db)
+    task_import.import_file(col, SAMPLE)
+    for doc in col.stream():
+        doc.reference.update({"import_hash": firestore_fake.DELETE_FIELD})
+    commits = count_commits(fake_db)
+    result = task_import.import_file(col, SAMPLE)
+    assert result["unchanged"] == 46
+    assert commits == []
+
+
+def test_duplicate_rows_are_skipped(fake_db):
+    col = tasks_col("", fake_db)
+    row = {"name": "Quiz 2", "course": "Physics", "start": "2025-09-01", "due": "2025-09-02", "status": "Not Started"}
+    result = task_import.import_rows(col, [row, {**row, "status": "Completed"}])
+    assert result["imported"] == 1
+    assert result["skipped"] == 1
+    assert "row 2" in result["errors"][0]
+    assert len(list(col.stream())) == 1
+
+
+def test_status_change_stamps_completed_at_and_counters(fake_db):
+    col = tasks_col("", fake_db)
+    row = {"name": "HW 1", "course": "Physics", "start": "2025-09-01", "due": "2025-09-02", "status": "Not Started"}
+    task_import.import_rows(col, [row])
+    result = task_import.import_rows(col, [{**row, "status": "Completed"}])
+    assert result["updated"] == 1
+    task = next(iter(col.stream())).to_dict()
+    assert task["status"] == "Completed"
+    assert task.get("completed_at") is not None
+    summary = counters.summarize(counters.counters_doc(col).get().to_dict())
+    assert summary["completed"] == 1
+    assert summary["by_status"] == {"Completed": 1}
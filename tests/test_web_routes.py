@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+import metrics
+
+# Users are picked with the proxy header, so each test (and app) works on its own empty collection
+HEADER = "X-Forwarded-User"
+FORM = {"name": "Problem set", "course": "Algebra", "start_date": "2030-03-01", "start_time": "09:00",
+        "due_date": "2030-03-02", "due_time": "09:00", "status": "Not Started"}
+
+
+@pytest.fixture
+def as_user(client_factory, monkeypatch, request):
+    """Returns (client, get) where get(path, uid) requests a page as that user."""
+    import web_common
+    monkeypatch.setattr(web_common, "TENANT_HEADER", HEADER)
+    client = client_factory()
+    suffix = request.node.callspec.id
+
+    def get(path, uid, **kwargs):
+        return client.get(path, headers={HEADER: f"{uid}-{suffix}", **kwargs.pop("headers", {})}, **kwargs)
+
+    return client, get, suffix
+
+
+def counter(name, **labels):
+    counters, _ = metrics.snapshot()
+    return counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def add_task(client, uid):
+    import web_common
+    tenant = client.module.registry.get(uid)
+    web_common.add_task(tenant, web_common.task_from_form(FORM))
+    return tenant, next(iter(tenant.col.stream())).id
+
+
+def test_status_change_goes_through_write_behind(as_user):
+    client, get, suffix = as_user
+    tenant, task_id = add_task(client, f"erin-{suffix}")
+    before = counter("write_behind_updates_total")
+    assert get(f"/update_status/{task_id}/Completed", "erin").status_code == 302
+    assert counter("write_behind_updates_total") == before + 1
+    # Shown straight away, before the queue is flushed
+    assert '<option value="Completed" selected>' in get(f"/edit_task/{task_id}", "erin").text
+    assert tenant.write_queue.flush()
+    assert tenant.col.document(task_id).get().to_dict()["status"] == "Completed"
+
+
+def test_jobs_belong_to_their_user(as_user):
+    client, get, suffix = as_user
+    add_task(client, f"frank-{suffix}")
+    response = get("/delete_all_tasks", "frank")
+    assert response.status_code == 302
+    job_id = response.headers["Location"].rsplit("/", 1)[1]
+
+    json = {"Accept": "application/json"}
+    assert get(f"/jobs/{job_id}", "grace", headers=json).status_code == 404
+    assert get(f"/jobs/{job_id}/download", "grace").status_code == 302
+    for _ in range(100):
+        record = client.module.web_common.user_job(job_id, f"frank-{suffix}")
+        if record["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.02)
+    assert record["status"] == "done"
+    assert record["result"] == {"deleted": 1}
+    assert get(f"/jobs/{job_id}", "frank", headers=json).status_code == 200
+
+
+def test_list_pages_are_cached_until_a_write(as_user):
+    client, get, suffix = as_user
+    tenant, task_id = add_task(client, f"heidi-{suffix}")
+    get("/view_active", "heidi")
+    # Let the listener deliver its initial snapshot, which invalidates the cache once
+    time.sleep(0.2)
+    get("/view_active", "heidi")
+    hits = counter("page_cache_requests_total", view="view_active", result="hit")
+    assert FORM["name"] in get("/view_active", "heidi").text
+    assert counter("page_cache_requests_total", view="view_active", result="hit") == hits + 1
+
+    get(f"/delete_task/{task_id}", "heidi")
+    assert FORM["name"] not in get("/view_active", "heidi").text
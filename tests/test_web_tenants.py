@@ -0,0 +1,86 @@
+import re
+
+from conftest import ALICE_TASK as TASK
+
+
+def sign_in(client, password="correct horse"):
+    return client.post("/login", data={"user": "alice", "password": password})
+
+
+def test_query_argument_does_not_select_a_user(client_factory):
+    client = client_factory()
+    assert TASK["name"] not in client.get("/?user=alice").text
+    assert client.get("/user/alice").status_code == 404
+
+
+def test_sign_in(client_factory):
+    client = client_factory()
+    assert "Wrong user ID or password" in sign_in(client, "wrong").text
+    assert TASK["name"] not in client.get("/").text
+    assert sign_in(client).status_code == 302
+    assert TASK["name"] in client.get("/").text
+    client.get("/logout")
+    assert TASK["name"] not in client.get("/").text
+
+
+def test_calendar_feed_needs_the_users_token(client_factory):
+    client = client_factory()
+    sign_in(client)
+    page = client.get("/").text
+    feed = re.search(r'href="(http[^"]*calendar\.ics[^"]*)"', page).group(1).replace("&amp;", "&")
+    assert "token=" in feed
+    feed = feed[feed.index("/calendar.ics"):]
+
+    anonymous = client_factory()
+    assert TASK["name"] in anonymous.get(feed).text
+    assert anonymous.get("/calendar.ics?user=alice").status_code == 403
+    assert anonymous.get("/calendar.ics?user=alice&token=guess").status_code == 403
+
+
+def test_tenant_header_only_from_trusted_proxy(client_factory, monkeypatch):
+    import web_common
+    monkeypatch.setattr(web_common, "TENANT_HEADER", "X-Forwarded-User")
+    client = client_factory()
+    untrusted = client.get("/", headers={"X-Forwarded-User": "alice"}, remote_addr="203.0.113.9")
+    assert untrusted.status_code == 403
+    trusted = client.get("/", headers={"X-Forwarded-User": "alice"})
+    assert TASK["name"] in trusted.text
+
+
+def test_require_login_redirects(client_factory, monkeypatch):
+    import web_common
+    monkeypatch.setattr(web_common, "REQUIRE_LOGIN", True)
+    client = client_factory()
+    response = client.get("/view_active")
+    assert response.status_code == 302
+    assert response.headers["Location"] == "/login?next=/view_active"
+    assert client.get("/login").status_code == 200
+
+
+def test_unknown_url_is_not_found(client_factory, monkeypatch):
+    import web_common
+    monkeypatch.setattr(web_common, "REQUIRE_LOGIN", True)
+    assert client_factory().get("/active").status_code == 404
+
+
+def test_empty_full_scan_leaves_a_usable_watermark(web_app):
+    import web_common
+    tenant = web_common.Tenant("nobody", web_app.db)
+    web_common.refresh_pending_reminders(tenant)
+    assert not web_common.needs_full_scan(tenant)
+
+
+def test_metrics_need_a_signed_in_user_or_the_token(client_factory, monkeypatch):
+    import web_common
+    anonymous = client_factory()
+    assert anonymous.get("/metrics").status_code == 401
+
+    monkeypatch.setattr(web_common, "METRICS_TOKEN", "scrape-me")
+    assert anonymous.get("/metrics", headers={"Authorization": "Bearer guess"}).status_code == 401
+    scraped = anonymous.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert scraped.status_code == 200
+    assert "firestore_calls_total" in scraped.text
+
+    client = client_factory()
+    sign_in(client)
+    assert client.get("/metrics").status_code == 200
@@ -0,0 +1,104 @@
+import threading
+
+import counters
+import write_behind
+from tenants import tasks_col
+from write_behind import WriteBehindQueue
+
+
+def make_task(col):
+    return counters.add_task(col, {"name": "HW", "course": "Physics", "start": "2030-01-01 09:00:00",
+                                   "due": "2030-01-02 09:00:00", "status": "Not Started"}).id
+
+
+def test_updates_coalesce_and_overlay(fake_db):
+    col = tasks_col("", fake_db)
+    doc_id = make_task(col)
+    queue = WriteBehindQueue(col, delay=60)
+    queue.update(doc_id, {"status": "In Progress"})
+    queue.update(doc_id, {"status": "Completed"})
+    assert queue.pending_count() == 1
+    assert queue.overlay(doc_id, {"status": "Not Started"})["status"] == "Completed"
+    assert queue.flush()
+    assert col.document(doc_id).get().to_dict()["status"] == "Completed"
+
+
+def test_discard_waits_for_an_inflight_flush(fake_db, monkeypatch):
+    col = tasks_col("", fake_db)
+    doc_id = make_task(col)
+    queue = WriteBehindQueue(col, delay=60)
+    queue.update(doc_id, {"status": "Completed"})
+
+    started, release = threading.Event(), threading.Event()
+    update_each = counters.update_each
+
+    def slow_update_each(col, updates):
+        started.set()
+        release.wait(5)
+        return update_each(col, updates)
+
+    monkeypatch.setattr(counters, "update_each", slow_update_each)
+    flusher = threading.Thread(target=queue.flush)
+    flusher.start()
+    started.wait(5)
+
+    discarded = threading.Event()
+
+    def edit():
+        queue.discard([doc_id])
+        discarded.set()
+        # The direct edit that replaces the queued status
+        col.document(doc_id).update({"status": "In Progress"})
+
+    editor = threading.Thread(target=edit)
+    editor.start()
+    assert not discarded.wait(0.2)
+    release.set()
+    flusher.join(5)
+    editor.join(5)
+    assert col.document(doc_id).get().to_dict()["status"] == "In Progress"
+
+
+def test_discard_drops_a_failed_flush(fake_db, monkeypatch):
+    col = tasks_col("", fake_db)
+    doc_id = make_task(col)
+    queue = WriteBehindQueue(col, delay=60)
+    queue.update(doc_id, {"status": "Completed"})
+
+    def failing_update_each(col, updates):
+        raise RuntimeError("unavailable")
+
+    monkeypatch.setattr(counters, "update_each", failing_update_each)
+    assert not queue.flush()
+    assert queue.pending_count() == 1
+    queue.discard([doc_id])
+    assert queue.pending_count() == 0
+
+
+def test_a_failing_update_is_given_up(fake_db, monkeypatch):
+    col = tasks_col("", fake_db)
+    good, bad = make_task(col), make_task(col)
+    dropped = []
+    queue = WriteBehindQueue(col, delay=60, on_drop=dropped.extend)
+    queue.update(good, {"status": "Completed"})
+    queue.update(bad, {"status": "Completed"})
+
+    update_each = counters.update_each
+
+    def rejecting_update_each(col, updates):
+        if bad in updates:
+            raise ValueError("invalid update")
+        return update_each(col, updates)
+
+    monkeypatch.setattr(counters, "update_each", rejecting_update_each)
+    monkeypatch.setattr(write_behind, "MAX_FLUSH_ATTEMPTS", 3)
+    assert not queue.flush()
+    # The retry writes each task on its own, so the good one lands
+    assert not queue.flush()
+    assert col.document(good).get().to_dict()["status"] == "Completed"
+    assert queue.pending_count() == 1
+    assert not queue.flush()
+    assert dropped == [bad]
+    assert queue.pending_count() == 0
+    assert queue.overlay(bad, {"status": "Not Started"})["status"] == "Not Started"
+    assert queue.flush()
@@ -1,215 +1,163 @@
 """
 Task Manager Web App
 A Flask-based web application for managing tasks (Firestore-backed)
+
+Tenants, sign-in, writes, background jobs and reminders are shared with
+async_web_app.py through web_common.py; this module holds the Flask routes.
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, Response, abort, g, session
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-from apscheduler.schedulers.background import BackgroundScheduler
-from discord_utils import send_discord_message
-import pandas as pd
-from openpyxl.styles import PatternFill
+from firestore_utils import get_db
+from task_utils import recurrence_from_form, format_task
+from archive import archive_col, archive_page_query, archive_count, ARCHIVE_PAGE_SIZE
+import counters
+import page_cache
+import assets
+import web_common
+from web_common import TenantRegistry
+import jobs
+from calendar_feed import build_feed, not_modified, response_headers
+from analytics import analyze, PAST_WEEKS
+from interval_index import week_start, week_view, BUSY_THRESHOLD
+from task_import import is_supported
+from page_cache import cached_page
+from metrics import instrument_app
 from flask import send_file
-import io
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+app.secret_key = web_common.SECRET_KEY
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # upload limit for /import
+# /metrics is only served to signed-in users and scrapers with METRICS_TOKEN
+instrument_app(app, allow=lambda: web_common.metrics_allowed(request, session))
+# Hashed, precompressed static bundles (build_assets.py) and compressed HTML
+assets.init_app(app)
 
 # Initialize Firebase/Firestore
 try:
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json"))
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    tasks_col = db.collection("tasks")
+    db = get_db()
     print("[DEBUG] Firestore connection successful.")
 except Exception as e:
     print(f"[ERROR] Firestore connection failed: {e}")
     db = None
-    tasks_col = None
-
-# --- Helper Functions ---
-def decode_recurrence_days(bitmask):
-    day_map = {1: "Mon", 2: "Tue", 4: "Wed", 8: "Thu", 16: "Fri", 32: "Sat", 64: "Sun"}
-    weekdays = [name for bit, name in day_map.items() if bitmask and (bitmask & bit)]
-    return ", ".join(weekdays)
-
-def calculate_next_occurrence(current_due, recurrence_days):
-    day_map = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6}
-    selected_days = [day_map[bit] for bit in day_map.keys() if recurrence_days & bit]
 
-    if not selected_days:
+# --- Tenants ---
+# Who a request acts as is decided in web_common (session, trusted proxy header or
+# TASKMANAGER_USER); each user has their own collection, caches and indexes.
+registry = TenantRegistry(db)
+
+def current_tenant():
+    """Returns the Tenant for this request (400 for an invalid user ID, sign-in page if required)."""
+    if "tenant" not in g:
+        uid = web_common.request_user(request, session)
+        if uid is None:
+            abort(redirect(url_for('login', next=request.full_path if request.query_string else request.path)))
+        g.tenant = registry.get(uid)
+    return g.tenant
+
+def feed_tenant():
+    """Returns the Tenant a calendar feed is for: ?user= with its token, else the request's user."""
+    uid = web_common.calendar_user(request.args)
+    if uid is None:
+        return current_tenant()
+    tenant = registry.get(uid)
+    tenant.cache.start_listener()
+    return tenant
+
+def request_cache():
+    # The page cache hook runs before every request, including public ones and unknown URLs (404)
+    if not web_common.acts_as_user(request.endpoint):
         return None
+    return current_tenant().cache
 
-    next_date = current_due + timedelta(days=1)
-
-    for i in range(7):
-        check_date = next_date + timedelta(days=i)
-        if check_date.weekday() in selected_days:
-            return check_date.replace(hour=current_due.hour, minute=current_due.minute, second=current_due.second)
-
-    return next_date + timedelta(days=7)
-
-def create_future_recurring_instances(name, course, start_dt, due_dt, recurrence_days, parent_task_id):
-    if tasks_col is None:
-        return
-    current_due = due_dt
-    duration = due_dt - start_dt
-
-    for week in range(1, 13):
-        next_occurrence = calculate_next_occurrence(current_due, recurrence_days)
-        if next_occurrence:
-            new_start = next_occurrence - duration
-            due_str = next_occurrence.strftime("%Y-%m-%d %H:%M:%S")
-
-            results = list(tasks_col.where("name", "==", name).where("due", "==", due_str).limit(1).stream())
-            if not results:
-                try:
-                    tasks_col.add({
-                        "name": name,
-                        "course": course,
-                        "start": new_start.strftime("%Y-%m-%d %H:%M:%S"),
-                        "due": due_str,
-                        "status": "Not Started",
-                        "recurrence_days": recurrence_days,
-                        "parent_task_id": str(parent_task_id) if parent_task_id else None,
-                        "is_recurring_instance": True
-                    })
-                except Exception as e:
-                    print(f"Failed to create future recurring instance: {e}")
-
-            current_due = next_occurrence
-        else:
-            break
-
-def create_due_weekday_instance(name, course, start_dt, due_dt, parent_task_id):
-    if tasks_col is None:
-        return
+page_cache.init_app(app, request_cache)
 
-    duration = due_dt - start_dt
-    next_due = due_dt + timedelta(days=7)
-    next_start = next_due - duration
-    due_str = next_due.strftime("%Y-%m-%d %H:%M:%S")
+@app.context_processor
+def inject_user():
+    return web_common.template_context(g.tenant.uid if "tenant" in g else "")
 
-    results = list(tasks_col.where("name", "==", name).where("due", "==", due_str).limit(1).stream())
-    if not results:
-        try:
-            tasks_col.add({
-                "name": name,
-                "course": course,
-                "start": next_start.strftime("%Y-%m-%d %H:%M:%S"),
-                "due": due_str,
-                "status": "Not Started",
-                "recurrence_days": -1,
-                "parent_task_id": str(parent_task_id) if parent_task_id else None,
-                "is_recurring_instance": True
-            })
-        except Exception as e:
-            print(f"Failed to create due weekday instance: {e}")
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Signs a browser session in as a user (password set with `python tenants.py set-password`)."""
+    if web_common.TENANT_HEADER:
+        abort(404)
+    next_url = web_common.safe_next(request.values.get('next', ''), url_for('index'))
+    if request.method == 'POST':
+        uid = request.form.get('user', '').strip()
+        error = web_common.sign_in_error(uid, request.form.get('password', ''), db)
+        if error is None:
+            session.clear()
+            session['user'] = uid
+            return redirect(next_url)
+        flash(error, 'error')
+    return render_template('login.html', next_url=next_url)
+
+@app.route('/logout')
+def logout():
+    session.pop('user', None)
+    return redirect(url_for('login') if web_common.REQUIRE_LOGIN else url_for('index'))
 
 # --- Routes ---
 @app.route('/')
+@cached_page('index')
 def index():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
-        return render_template('index.html', tasks=[], total_count=0, active_count=0, completed_count=0)
+        return render_template('index.html', tasks=[], total_count=0, active_count=0, completed_count=0,
+                               overdue_count=0)
 
     tasks = []
     active_tasks = []
     completed_tasks = []
+    summary = None
 
     try:
-        all_docs = tasks_col.stream()
-
-        for doc in all_docs:
-            task = doc.to_dict()
-            task['id'] = doc.id
-
-            try:
-                start_dt = datetime.strptime(task.get("start", ""), "%Y-%m-%d %H:%M:%S")
-                due_dt = datetime.strptime(task.get("due", ""), "%Y-%m-%d %H:%M:%S")
-                task['start_formatted'] = start_dt.strftime("%m/%d/%y %I:%M %p")
-                task['due_formatted'] = due_dt.strftime("%m/%d/%y %I:%M %p")
-            except (ValueError, TypeError):
-                task['start_formatted'] = "Invalid Date"
-                task['due_formatted'] = "Invalid Date"
-
-            if task.get("status") in ["Completed", "Graded"]:
-                completed_tasks.append(task)
-            else:
-                active_tasks.append(task)
-
-        active_tasks.sort(key=lambda x: x.get("due", ""))
-        completed_tasks.sort(key=lambda x: x.get("due", ""))
+        tasks = web_common.display_tasks(tenant, tenant.col.stream())
+        active_tasks = [task for task in tasks if task.get("status") not in web_common.DONE_STATUSES]
+        completed_tasks = [task for task in tasks if task.get("status") in web_common.DONE_STATUSES]
         tasks = active_tasks + completed_tasks
-
     except Exception as e:
         flash(f"Error loading tasks: {e}", "error")
         print(f"[ERROR] Exception in index(): {e}")
 
-    return render_template('index.html', tasks=tasks, total_count=len(tasks), active_count=len(active_tasks), completed_count=len(completed_tasks))
+    try:
+        summary = counters.read_summary(tenant.col)
+    except Exception as e:
+        print(f"[ERROR] Could not read task counters: {e}")
+
+    if summary is None:
+        return render_template('index.html', tasks=tasks, total_count=len(tasks), active_count=len(active_tasks),
+                               completed_count=len(completed_tasks), overdue_count=0)
+    return render_template('index.html', tasks=tasks, total_count=summary["total"], active_count=summary["active"],
+                           completed_count=summary["completed"], overdue_count=summary["overdue"])
 
 @app.route('/add_task', methods=['GET', 'POST'])
 def add_task():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return render_template('add_task.html')
 
     if request.method == 'POST':
         try:
-            name = request.form.get('name')
-            course = request.form.get('course')
-            start_date = request.form.get('start_date')
-            start_time = request.form.get('start_time')
-            due_date = request.form.get('due_date')
-            due_time = request.form.get('due_time')
-            status = request.form.get('status')
-            reminder_hours = int(request.form.get('reminder_hours', 24))
-
-            if not all([name, course, start_date, start_time, due_date, due_time]):
+            task = web_common.task_from_form(request.form)
+            if task is None:
                 flash('All fields are required!', 'error')
                 return render_template('add_task.html')
-
-            start_dt = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
-            due_dt = datetime.strptime(f"{due_date} {due_time}", "%Y-%m-%d %H:%M")
-
-            recurrence_type = request.form.get('recurrence_type', 'none')
-            recurrence_days = 0
-
-            if recurrence_type == 'weekly':
-                day_map = {'mon': 1, 'tue': 2, 'wed': 4, 'thu': 8, 'fri': 16, 'sat': 32, 'sun': 64}
-                for day in day_map.keys():
-                    if request.form.get(f'recurrence_{day}'):
-                        recurrence_days |= day_map[day]
-            elif recurrence_type == 'due_weekday':
-                recurrence_days = -1
-
-            _, doc_ref = tasks_col.add({
-                "name": name,
-                "course": course,
-                "start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "due": due_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "status": status,
-                "recurrence_days": recurrence_days,
-                "is_recurring_instance": False,
-                "reminder_hours": reminder_hours,
-                "reminder_sent": 0
-            })
-
-            if recurrence_days > 0:
-                create_future_recurring_instances(name, course, start_dt, due_dt, recurrence_days, doc_ref.id)
-            elif recurrence_days == -1:
-                create_due_weekday_instance(name, course, start_dt, due_dt, doc_ref.id)
+            task.update({"recurrence_days": recurrence_from_form(request.form), "is_recurring_instance": False,
+                         "reminder_hours": int(request.form.get('reminder_hours', 24)), "reminder_sent": 0})
+            warning = web_common.add_task(tenant, task)
 
             flash('Task added successfully!', 'success')
+            if warning:
+                flash(warning, 'warning')
             return redirect(url_for('index'))
 
         except ValueError as e:
@@ -221,34 +169,18 @@ def add_task():
 
 @app.route('/edit_task/<task_id>', methods=['GET', 'POST'])
 def edit_task(task_id):
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return redirect(url_for('index'))
 
     if request.method == 'POST':
         try:
-            name = request.form.get('name')
-            course = request.form.get('course')
-            start_date = request.form.get('start_date')
-            start_time = request.form.get('start_time')
-            due_date = request.form.get('due_date')
-            due_time = request.form.get('due_time')
-            status = request.form.get('status')
-
-            if not all([name, course, start_date, start_time, due_date, due_time]):
+            fields = web_common.task_from_form(request.form)
+            if fields is None:
                 flash('All fields are required!', 'error')
                 return redirect(url_for('edit_task', task_id=task_id))
-
-            start_dt = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
-            due_dt = datetime.strptime(f"{due_date} {due_time}", "%Y-%m-%d %H:%M")
-
-            tasks_col.document(task_id).update({
-                "name": name,
-                "course": course,
-                "start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "due": due_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "status": status
-            })
+            web_common.update_task(tenant, task_id, fields)
 
             flash('Task updated successfully!', 'success')
             return redirect(url_for('index'))
@@ -259,16 +191,11 @@ def edit_task(task_id):
             flash(f'Error updating task: {e}', 'error')
 
     try:
-        doc = tasks_col.document(task_id).get()
+        doc = tenant.col.document(task_id).get()
         if doc.exists:
-            task = doc.to_dict()
+            task = tenant.write_queue.overlay(doc.id, doc.to_dict())
             task['id'] = doc.id
-            start_dt = datetime.strptime(task.get("start"), "%Y-%m-%d %H:%M:%S")
-            due_dt = datetime.strptime(task.get("due"), "%Y-%m-%d %H:%M:%S")
-            task['start_date'] = start_dt.strftime("%Y-%m-%d")
-            task['start_time'] = start_dt.strftime("%H:%M")
-            task['due_date'] = due_dt.strftime("%Y-%m-%d")
-            task['due_time'] = due_dt.strftime("%H:%M")
+            task = web_common.edit_form_task(task)
             return render_template('edit_task.html', task=task)
         else:
             flash('Task not found!', 'error')
@@ -280,12 +207,13 @@ def edit_task(task_id):
 
 @app.route('/delete_task/<task_id>')
 def delete_task(task_id):
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return redirect(url_for('index'))
 
     try:
-        tasks_col.document(task_id).delete()
+        web_common.delete_task(tenant, task_id)
         flash('Task deleted successfully!', 'success')
     except Exception as e:
         flash(f'Error deleting task: {e}', 'error')
@@ -294,189 +222,283 @@ def delete_task(task_id):
 
 @app.route('/update_status/<task_id>/<status>')
 def update_status(task_id, status):
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return redirect(url_for('index'))
 
     try:
-        tasks_col.document(task_id).update({"status": status})
+        web_common.update_status(tenant, task_id, status)
         flash('Status updated successfully!', 'success')
     except Exception as e:
         flash(f'Error updating status: {e}', 'error')
 
     return redirect(url_for('index'))
 
+@app.route('/bulk', methods=['POST'])
+def bulk_update():
+    """Applies a status change, reschedule or delete to every selected task in one batched commit."""
+    tenant = current_tenant()
+    if tenant.col is None:
+        flash("Database connection error", "error")
+        return redirect(url_for('index'))
+
+    task_ids = request.form.getlist('task_ids')
+    if not task_ids:
+        flash('Select at least one task.', 'error')
+        return redirect(request.referrer or url_for('index'))
+
+    try:
+        flash(web_common.bulk_update(tenant, task_ids, request.form.get('action', ''), request.form.get('days')),
+              'success')
+    except ValueError as e:
+        flash(str(e), 'error')
+    except Exception as e:
+        flash(f'Error updating tasks: {e}', 'error')
+
+    return redirect(request.referrer or url_for('index'))
+
+@app.route('/search')
+def search():
+    tenant = current_tenant()
+    query = request.args.get('q', '').strip()
+    if tenant.col is None:
+        flash("Database connection error", "error")
+        return render_template('search.html', tasks=[], query=query)
+
+    tasks = []
+    try:
+        # The index holds the stored dicts; format copies
+        tasks = [format_task(dict(task, id=doc_id)) for doc_id, task in web_common.search_tasks(tenant, query)]
+    except Exception as e:
+        flash(f"Error searching tasks: {e}", "error")
+
+    return render_template('search.html', tasks=tasks, query=query)
+
+@app.route('/search/suggest')
+def search_suggest():
+    tenant = current_tenant()
+    if tenant.col is None:
+        return jsonify([])
+    suggestions = []
+    for doc_id, task in web_common.search_tasks(tenant, request.args.get('q', ''), limit=10):
+        task = format_task(dict(task, id=doc_id))
+        suggestions.append({"id": doc_id, "name": task.get("name"), "course": task.get("course"),
+                            "due_formatted": task.get("due_formatted")})
+    return jsonify(suggestions)
+
+def calendar_response(tenant, course=None):
+    if tenant.col is None:
+        return Response("Database connection error", status=503)
+    if tenant.indexed():
+        body, etag, last_modified = tenant.calendar_feeds.get(course)
+    else:
+        body, etag, last_modified = build_feed(((doc.id, doc.to_dict()) for doc in tenant.col.stream()), course)
+    headers = response_headers(etag, last_modified)
+    if not_modified(request.headers, etag, last_modified):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='text/calendar', headers=headers)
+
+@app.route('/calendar.ics')
+def calendar_ics():
+    return calendar_response(feed_tenant())
+
+@app.route('/calendar/<course>.ics')
+def course_calendar_ics(course):
+    return calendar_response(feed_tenant(), course)
+
+@app.route('/analytics')
+def analytics_view():
+    tenant = current_tenant()
+    if tenant.col is None:
+        flash("Database connection error", "error")
+        return redirect(url_for('index'))
+    try:
+        if tenant.indexed():
+            stats = tenant.analytics_cache.compute()
+        else:
+            stats = analyze((doc.id, doc.to_dict()) for doc in tenant.col.stream())
+    except Exception as e:
+        flash(f"Error computing analytics: {e}", "error")
+        return redirect(url_for('index'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(stats)
+    return render_template('analytics.html', stats=stats, past_weeks=PAST_WEEKS)
+
+@app.route('/week')
+@cached_page('week')
+def week():
+    tenant = current_tenant()
+    try:
+        day = datetime.strptime(request.args.get('start', ''), "%Y-%m-%d")
+    except ValueError:
+        day = datetime.now()
+    monday = week_start(day)
+    view = {"days": [monday + timedelta(days=i) for i in range(7)], "tasks": []}
+    if tenant.col is None:
+        flash("Database connection error", "error")
+    else:
+        try:
+            view = week_view(web_common.current_intervals(tenant, monday.strftime("%Y-%m-%d %H:%M:%S")), monday)
+        except Exception as e:
+            flash(f"Error loading tasks: {e}", "error")
+    tasks, active_per_day = web_common.week_tasks(tenant, view)
+
+    return render_template('week.html', days=view["days"], tasks=tasks, active_per_day=active_per_day,
+                           busy_threshold=BUSY_THRESHOLD, today=datetime.now().strftime("%Y-%m-%d"),
+                           prev_week=(monday - timedelta(days=7)).strftime("%Y-%m-%d"),
+                           next_week=(monday + timedelta(days=7)).strftime("%Y-%m-%d"))
+
 @app.route('/view_by_class/<class_name>')
+@cached_page('view_by_class')
 def view_by_class(class_name):
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return render_template('view_by_class.html', tasks=[], class_name=class_name, class_count=0)
 
     tasks = []
     try:
-        docs = tasks_col.where("course", "==", class_name).stream()
-        for doc in docs:
-            task = doc.to_dict()
-            task['id'] = doc.id
-            try:
-                start_dt = datetime.strptime(task.get("start", ""), "%Y-%m-%d %H:%M:%S")
-                due_dt = datetime.strptime(task.get("due", ""), "%Y-%m-%d %H:%M:%S")
-                task['start_formatted'] = start_dt.strftime("%m/%d/%y %I:%M %p")
-                task['due_formatted'] = due_dt.strftime("%m/%d/%y %I:%M %p")
-            except (ValueError, TypeError):
-                task['start_formatted'] = "Invalid Date"
-                task['due_formatted'] = "Invalid Date"
-            tasks.append(task)
-        tasks.sort(key=lambda x: x.get("due", ""))
+        tasks = web_common.display_tasks(tenant, tenant.col.where("course", "==", class_name).stream())
     except Exception as e:
         flash(f"Error loading tasks: {e}", "error")
 
     return render_template('view_by_class.html', tasks=tasks, class_name=class_name, class_count=len(tasks))
 
 @app.route('/view_completed')
+@cached_page('view_completed')
 def view_completed():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return render_template('view_completed.html', tasks=[], completed_count=0)
 
     tasks = []
     try:
-        docs = tasks_col.where("status", "in", ["Completed", "Graded"]).stream()
-        for doc in docs:
-            task = doc.to_dict()
-            task['id'] = doc.id
-            try:
-                start_dt = datetime.strptime(task.get("start", ""), "%Y-%m-%d %H:%M:%S")
-                due_dt = datetime.strptime(task.get("due", ""), "%Y-%m-%d %H:%M:%S")
-                task['start_formatted'] = start_dt.strftime("%m/%d/%y %I:%M %p")
-                task['due_formatted'] = due_dt.strftime("%m/%d/%y %I:%M %p")
-            except (ValueError, TypeError):
-                task['start_formatted'] = "Invalid Date"
-                task['due_formatted'] = "Invalid Date"
-            tasks.append(task)
-        tasks.sort(key=lambda x: x.get("due", ""))
+        tasks = web_common.display_tasks(tenant, tenant.col.where("status", "in", web_common.DONE_STATUSES).stream())
     except Exception as e:
         flash(f"Error loading completed tasks: {e}", "error")
 
-    return render_template('view_completed.html', tasks=tasks, completed_count=len(tasks))
+    # Archived history is only read when asked for, one page at a time
+    archived = []
+    archived_count = 0
+    next_archive_after = None
+    show_archive = request.args.get('archive') == '1'
+    try:
+        if show_archive:
+            after_id = request.args.get('archive_after')
+            after = archive_col(tenant.col).document(after_id).get() if after_id else None
+            for doc in archive_page_query(tenant.col, after).stream():
+                task = doc.to_dict()
+                task['id'] = doc.id
+                archived.append(format_task(task))
+            if len(archived) == ARCHIVE_PAGE_SIZE:
+                next_archive_after = archived[-1]['id']
+        else:
+            archived_count = archive_count(tenant.col)
+    except Exception as e:
+        flash(f"Error loading archived tasks: {e}", "error")
+
+    return render_template('view_completed.html', tasks=tasks, completed_count=len(tasks), show_archive=show_archive,
+                           archived=archived, archived_count=archived_count, next_archive_after=next_archive_after)
 
 @app.route('/view_active')
+@cached_page('view_active')
 def view_active():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return render_template('view_active.html', tasks=[], active_count=0)
 
     tasks = []
     try:
-        docs = tasks_col.where("status", "in", ["Not Started", "In Progress"]).stream()
-        for doc in docs:
-            task = doc.to_dict()
-            task['id'] = doc.id
-            try:
-                start_dt = datetime.strptime(task.get("start", ""), "%Y-%m-%d %H:%M:%S")
-                due_dt = datetime.strptime(task.get("due", ""), "%Y-%m-%d %H:%M:%S")
-                task['start_formatted'] = start_dt.strftime("%m/%d/%y %I:%M %p")
-                task['due_formatted'] = due_dt.strftime("%m/%d/%y %I:%M %p")
-            except (ValueError, TypeError):
-                task['start_formatted'] = "Invalid Date"
-                task['due_formatted'] = "Invalid Date"
-            tasks.append(task)
-        tasks.sort(key=lambda x: x.get("due", ""))
+        tasks = web_common.display_tasks(tenant,
+                                         tenant.col.where("status", "in", web_common.ACTIVE_STATUSES).stream())
     except Exception as e:
         flash(f"Error loading active tasks: {e}", "error")
 
     return render_template('view_active.html', tasks=tasks, active_count=len(tasks))
 
+# --- Background Jobs ---
+# Long operations run on the jobs.py pool (see web_common); the request only
+# starts them and the browser polls /jobs/<id> for progress.
 @app.route('/delete_all_tasks')
 def delete_all_tasks():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return redirect(url_for('index'))
 
-    try:
-        docs = list(tasks_col.stream())
-        for doc in docs:
-            doc.reference.delete()
-        flash(f'Successfully deleted {len(docs)} tasks!', 'success')
-    except Exception as e:
-        flash(f'Error deleting all tasks: {e}', 'error')
-    return redirect(url_for('index'))
-
-def check_reminders():
-    with app.app_context():
-        if tasks_col is None:
-            return
-        now = datetime.now()
-        docs = tasks_col.where("reminder_sent", "==", 0).stream()
-
-        for doc in docs:
-            task = doc.to_dict()
-            if task.get("status") == "Completed":
-                continue
-            due = datetime.strptime(task["due"], "%Y-%m-%d %H:%M:%S")
-            reminder_hours = task.get("reminder_hours", 24)
-            reminder_time = due - timedelta(hours=reminder_hours)
-
-            if reminder_time <= now < due:
-                message = f"Reminder: Your task '{task['name']}' is due at {due.strftime('%I:%M %p')}."
-                try:
-                    send_discord_message(message)
-                    tasks_col.document(doc.id).update({"reminder_sent": 1})
-                except Exception as e:
-                    print(f"Failed to send Discord reminder: {e}")
-
-scheduler = BackgroundScheduler(daemon=True)
-scheduler.add_job(check_reminders, 'interval', seconds=60)
-scheduler.start()
+    job = web_common.start_job("delete_all", tenant, web_common.delete_all_job)
+    return redirect(url_for('job_status', job_id=job.id))
 
 @app.route('/export')
 def export_to_excel():
-    if tasks_col is None:
+    tenant = current_tenant()
+    if tenant.col is None:
         flash("Database connection error", "error")
         return redirect(url_for('index'))
 
-    docs = list(tasks_col.stream())
-    if not docs:
-        flash('No tasks to export!', 'info')
-        return redirect(url_for('index'))
-
-    tasks = [doc.to_dict() for doc in docs]
-    df = pd.DataFrame(tasks)
-
-    df['start'] = pd.to_datetime(df['start']).dt.strftime('%m/%d/%y %I:%M %p')
-    df['due'] = pd.to_datetime(df['due']).dt.strftime('%m/%d/%y %I:%M %p')
-
-    df = df[['name', 'course', 'start', 'due', 'status']]
-    df.columns = ['Task Name', 'Class', 'Start Date', 'Due Date', 'Status']
+    job = web_common.start_job("export", tenant, web_common.export_job, request.args.get('include_archive') == '1')
+    return redirect(url_for('job_status', job_id=job.id))
 
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='openpyxl')
-    df.to_excel(writer, index=False, sheet_name='Tasks')
-
-    workbook = writer.book
-    worksheet = writer.sheets['Tasks']
-
-    colors = {
-        'Not Started': 'FF7171',
-        'In Progress': 'FFFACD',
-        'Completed': 'D0F0C0',
-        'Graded': 'ADD8E6'
-    }
-
-    for index, row in df.iterrows():
-        status = row['Status']
-        if status in colors:
-            fill = PatternFill(start_color=colors[status], end_color=colors[status], fill_type="solid")
-            for col_idx in range(1, len(df.columns) + 1):
-                worksheet.cell(row=index + 2, column=col_idx).fill = fill
+@app.route('/import', methods=['GET', 'POST'])
+def import_tasks():
+    tenant = current_tenant()
+    if request.method == 'POST':
+        if tenant.col is None:
+            flash("Database connection error", "error")
+            return redirect(url_for('index'))
+        upload = request.files.get('file')
+        if upload is None or not is_supported(upload.filename):
+            flash('Choose an .xlsx or .csv file.', 'error')
+            return render_template('import.html')
+        job = jobs.new_job("import", tenant.uid)
+        path = jobs.file_path(job.id, os.path.splitext(upload.filename)[1].lower())
+        upload.save(path)
+        jobs.submit(job, web_common.import_file_job, tenant, path)
+        return redirect(url_for('job_status', job_id=job.id))
+    return render_template('import.html')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    # Jobs are only visible to the user who started them
+    record = web_common.user_job(job_id, current_tenant().uid)
+    if record is None:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({"error": "unknown job"}), 404
+        flash('That job has expired or does not exist.', 'error')
+        return redirect(url_for('index'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(record)
+    return render_template('job.html', job=record)
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    download = web_common.job_download(job_id, current_tenant().uid)
+    if download is None:
+        flash('That download is not available.', 'error')
+        return redirect(url_for('index'))
+    path, name = download
+    return send_file(path, download_name=name, as_attachment=True)
 
-    writer.close()
-    output.seek(0)
+# --- Reminders ---
+def check_reminders():
+    """One reminder pass over this app's users (see web_common.check_reminders)."""
+    web_common.check_reminders(registry)
 
-    current_date = datetime.now().strftime("%m-%d-%y")
-    filename = f"tasks_{current_date}.xlsx"
+def start_scheduler():
+    """Starts the reminder scheduler and the daily jobs once per process."""
+    return web_common.start_scheduler(registry)
 
-    return send_file(output, download_name=filename, as_attachment=True)
+# TASKMANAGER_DISABLE_SCHEDULER=1 skips it (gunicorn.conf.py starts it in one worker instead;
+# check_startup.py). Under `python web_app.py` the __main__ block starts it.
+if os.getenv("TASKMANAGER_DISABLE_SCHEDULER") != "1" and __name__ != '__main__':
+    start_scheduler()
 
 if __name__ == '__main__':
+    # Development server only; use start_web_app.py (gunicorn) in production.
+    # The reloader runs this file twice; only the serving child sends reminders.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true" and os.getenv("TASKMANAGER_DISABLE_SCHEDULER") != "1":
+        start_scheduler()
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,629 @@
+"""
+Shared request handling for Task Manager's web apps
+Tenants, sign-in, task writes, background jobs and reminders for web_app.py
+(Flask) and async_web_app.py (Quart)
+
+Both apps call these helpers and only add their framework glue (routes,
+flash messages, templates), so a change here reaches both. Writes go
+through the sync Firestore client: status changes through the tenant's
+write-behind queue, everything else through counters.py and sync.py, and
+each one invalidates the tenant's page cache. The async app runs them on a
+worker thread and keeps the async client for its reads.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from werkzeug.exceptions import abort
+from firestore_utils import get_db
+from tenants import default_user, list_users, valid_uid, webhook_url, check_password, tasks_col as tenant_tasks_col
+from discord_utils import send_discord_message
+from task_utils import (recurring_instance_dues, tasks_to_excel, format_task, shift_task, STORAGE_FORMAT,
+                        ACTIVE_STATUSES, DONE_STATUSES)
+from sync import (stamp, delete_tasks, fetch_changes, full_scan_watermark, is_watermark_usable,
+                  prune_deletion_log)
+import counters
+from archive import archive_tasks, archive_col
+import page_cache
+from search_index import TaskIndex
+from calendar_feed import FeedCache
+from analytics import AnalyticsCache
+from interval_index import IntervalIndex, busy_warning
+from write_behind import WriteBehindQueue
+import jobs
+from task_import import import_job
+from metrics import (instrument_collection, record_reminder_scan, record_reminder_sent, record_reminder_failed,
+                     start_summary_logger)
+
+# --- Configuration ---
+# Sessions and calendar tokens are signed with SECRET_KEY; with the placeholder anyone could forge them
+SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
+SECRET_KEY_SET = bool(os.getenv('SECRET_KEY'))
+
+# Each user's tasks live in users/<uid>/tasks ("" = the shared top-level collection, see
+# tenants.py) and every request only reads its own user's collection and in-memory state.
+# The user is the one signed in to this browser session (/login, checked against the
+# password hash on users/<uid>) or, behind an authenticating proxy, the one named by
+# TENANT_HEADER; the header is only accepted from TRUSTED_PROXIES and then replaces sign-in.
+# Requests without a user act as TASKMANAGER_USER unless REQUIRE_LOGIN is set. Calendar
+# apps cannot sign in, so feed links carry ?user=<uid>&token=<calendar_token(uid)> instead.
+TENANT_HEADER = os.getenv("TENANT_HEADER", "")
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if ip.strip()}
+REQUIRE_LOGIN = os.getenv("REQUIRE_LOGIN", "").lower() in ("1", "true", "yes")
+# Users with a live listener and in-memory indexes; the least recently used beyond this are suspended
+MAX_ACTIVE_TENANTS = int(os.getenv("MAX_ACTIVE_TENANTS", "32"))
+# Endpoints that do not act as the request's user (calendar feeds and /metrics check their own access)
+PUBLIC_ENDPOINTS = {"login", "logout", "static", "asset", "metrics", "calendar_ics", "course_calendar_ics"}
+# Bearer token a Prometheus scraper sends for /metrics; signed-in users and trusted proxies need none
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# How long the user list (a list_documents() call) is reused by the reminder scans and daily jobs
+USER_LIST_SECONDS = int(os.getenv("USER_LIST_SECONDS", "300"))
+
+if not SECRET_KEY_SET:
+    print("[WARN] SECRET_KEY is not set; sign-in and per-user calendar feeds are disabled.")
+
+
+# --- Tenants ---
+class Tenant:
+    """
+    One user's tasks collection and everything this process keeps in memory for it.
+
+    Args:
+        uid (str): User ID ("" for the shared collection).
+        db: The sync Firestore client, or None without a database.
+        async_db: The async Firestore client, for the async app's reads.
+    """
+
+    def __init__(self, uid, db, async_db=None):
+        self.uid = uid
+        self.col = instrument_collection(tenant_tasks_col(uid, db)) if db is not None else None
+        self.async_col = tenant_tasks_col(uid, async_db) if async_db is not None else None
+        # Rendered pages, invalidated by this user's writes and their collection's listener
+        self.cache = page_cache.PageCache(self.col)
+        # Status changes are queued, coalesced and written in batches; pages overlay the pending ones
+        # (and are re-rendered from the stored tasks if an update is given up)
+        self.write_queue = None
+        if self.col is not None:
+            self.write_queue = WriteBehindQueue(self.col, on_drop=lambda doc_ids: self.cache.invalidate())
+        # Tasks still waiting for a reminder, kept up to date with delta queries
+        self.pending_reminders = {}
+        self.reminder_watermark = None
+        self._reset_indexes()
+        self.cache.on_change(lambda changes: self.search_index.apply_changes(changes))
+        self.cache.on_change(lambda changes: self.interval_index.apply_changes(changes))
+
+    def _reset_indexes(self):
+        # Search index, kept current by the page cache's Firestore listener
+        self.search_index = TaskIndex()
+        # Calendar feeds, rendered from the search index once per index version
+        self.calendar_feeds = FeedCache(self.search_index)
+        # Columnar arrays for /analytics, rebuilt from the search index only after it changes
+        self.analytics_cache = AnalyticsCache(self.search_index)
+        # Interval tree over start-due windows for the week view and busy-period warnings
+        self.interval_index = IntervalIndex()
+
+    def indexed(self):
+        """True while the listener keeps the in-memory indexes current, so reads need no Firestore query."""
+        return self.cache.listener_active() and self.search_index.loaded
+
+    def suspend(self):
+        """Stops the listener and frees the in-memory indexes; the next request starts them again."""
+        self.cache.stop_listener()
+        self._reset_indexes()
+
+
+class TenantRegistry:
+    """
+    The Tenants of one app, created on first use.
+
+    Args:
+        db: The sync Firestore client, or None without a database.
+        async_db: The async Firestore client (async app only).
+    """
+
+    def __init__(self, db, async_db=None):
+        self.db = db
+        self.async_db = async_db
+        self._lock = threading.Lock()
+        self._tenants = {}
+        self._active = OrderedDict()
+        self._users = None
+        self._users_at = 0.0
+
+    def get(self, uid, touch=True):
+        """
+        Returns the Tenant for a user ID.
+
+        Args:
+            uid (str): A valid user ID ("" for the shared collection).
+            touch (bool): Count this as a request (keeps the user's listener running); background
+                jobs pass False so they do not wake every user up.
+        """
+        suspend = []
+        with self._lock:
+            tenant = self._tenants.get(uid)
+            if tenant is None:
+                tenant = self._tenants[uid] = Tenant(uid, self.db, self.async_db)
+            if touch:
+                self._active[uid] = tenant
+                self._active.move_to_end(uid)
+                while len(self._active) > MAX_ACTIVE_TENANTS:
+                    suspend.append(self._active.popitem(last=False)[1])
+        for idle in suspend:
+            idle.suspend()
+        return tenant
+
+    def suspend_all(self):
+        """Stops every listener, e.g. when the app shuts down."""
+        with self._lock:
+            active = list(self._active.values())
+            self._active.clear()
+        for tenant in active:
+            tenant.suspend()
+
+    def each_user(self):
+        """The users the daily jobs and reminder scans visit (listed at most once per USER_LIST_SECONDS)."""
+        if self._users is not None and time.monotonic() - self._users_at < USER_LIST_SECONDS:
+            return self._users
+        try:
+            self._users, self._users_at = list_users(self.db), time.monotonic()
+        except Exception as e:
+            print(f"[ERROR] Could not list users: {e}")
+            return self._users or [default_user()]
+        return self._users
+
+    def for_each_user(self, job):
+        """Runs job(tasks collection) for every user, e.g. archiving or counter reconciliation."""
+        for uid in self.each_user():
+            try:
+                job(self.get(uid, touch=False).col)
+            except Exception as e:
+                print(f"[ERROR] {job.__name__} for user {uid or '(shared)'} failed: {e}")
+
+
+# --- Sign-in ---
+def request_user(request, session):
+    """
+    Returns the authenticated user ID for a request (Flask or Quart).
+
+    Returns:
+        str: The proxy's or session's user, else TASKMANAGER_USER; None if REQUIRE_LOGIN
+            is set and nobody is signed in.
+    """
+    if TENANT_HEADER:
+        uid = request.headers.get(TENANT_HEADER)
+        if uid is not None and request.remote_addr not in TRUSTED_PROXIES:
+            abort(403, f"{TENANT_HEADER} is only accepted from a trusted proxy")
+    else:
+        uid = session.get('user') if SECRET_KEY_SET else None
+    if uid is None and not REQUIRE_LOGIN:
+        uid = default_user()
+    if uid is not None and not valid_uid(uid):
+        abort(400, "Invalid user ID")
+    return uid
+
+
+def acts_as_user(endpoint):
+    """False for unknown URLs (404) and PUBLIC_ENDPOINTS, which must not resolve the request's user."""
+    return endpoint is not None and endpoint not in PUBLIC_ENDPOINTS
+
+
+def login_enabled():
+    return SECRET_KEY_SET and not TENANT_HEADER
+
+
+def sign_in_error(uid, password, db):
+    """Checks a /login form. Returns the message to flash, or None if the user may sign in."""
+    if not SECRET_KEY_SET:
+        return 'Sign-in is disabled until SECRET_KEY is set.'
+    if not check_password(uid, password, db):
+        return 'Wrong user ID or password.'
+    return None
+
+
+def safe_next(next_url, default):
+    """Only redirect within this site after signing in."""
+    if not next_url or not next_url.startswith('/') or next_url.startswith('//'):
+        return default
+    return next_url
+
+
+def calendar_token(uid):
+    """Secret per-user token that lets calendar apps fetch a user's feed without signing in."""
+    return hmac.new(SECRET_KEY.encode(), f"calendar:{uid}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def calendar_user(args):
+    """Returns the user a feed URL's ?user= and token name (403 if the token is wrong), or None without ?user=."""
+    uid = args.get('user')
+    if uid is None:
+        return None
+    token = args.get('token', '')
+    if not SECRET_KEY_SET or not valid_uid(uid) or not hmac.compare_digest(token, calendar_token(uid)):
+        abort(403, "Invalid calendar token")
+    return uid
+
+
+def metrics_allowed(request, session):
+    """
+    Checks whether a request may read /metrics (request timings, users' task counts and errors).
+
+    Returns:
+        bool: True for the METRICS_TOKEN bearer token, a signed-in session or a user named by
+            a trusted proxy; False for anonymous requests, even if they act as TASKMANAGER_USER.
+    """
+    if METRICS_TOKEN and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return True
+    if TENANT_HEADER:
+        return request.headers.get(TENANT_HEADER) is not None and request.remote_addr in TRUSTED_PROXIES
+    return SECRET_KEY_SET and session.get('user') is not None
+
+
+def template_context(uid):
+    """Template globals for the base layout: the user and the token their calendar links carry."""
+    calendar_params = {"user": uid, "token": calendar_token(uid)} if uid and SECRET_KEY_SET else {}
+    return {"current_user": uid, "calendar_params": calendar_params, "login_enabled": login_enabled()}
+
+
+# --- Reading Tasks ---
+def display_tasks(tenant, docs):
+    """Formats task snapshots for a list page, with pending status changes applied, sorted by due date."""
+    tasks = []
+    for doc in docs:
+        task = tenant.write_queue.overlay(doc.id, doc.to_dict())
+        task['id'] = doc.id
+        tasks.append(format_task(task))
+    tasks.sort(key=lambda x: x.get("due", ""))
+    return tasks
+
+
+def edit_form_task(task):
+    """Adds the date and time fields of the edit form to a task."""
+    start_dt = datetime.strptime(task.get("start"), STORAGE_FORMAT)
+    due_dt = datetime.strptime(task.get("due"), STORAGE_FORMAT)
+    task['start_date'] = start_dt.strftime("%Y-%m-%d")
+    task['start_time'] = start_dt.strftime("%H:%M")
+    task['due_date'] = due_dt.strftime("%Y-%m-%d")
+    task['due_time'] = due_dt.strftime("%H:%M")
+    return task
+
+
+def week_tasks(tenant, view):
+    """
+    Formats interval_index.week_view() rows for the week page.
+
+    Returns:
+        tuple: ([(task, open_days)], active tasks open on each of the 7 days)
+    """
+    tasks = []
+    active_per_day = [0] * 7
+    for doc_id, task, open_days in view["tasks"]:
+        task = format_task(dict(tenant.write_queue.overlay(doc_id, task), id=doc_id))
+        tasks.append((task, open_days))
+        if task.get("status") in ACTIVE_STATUSES:
+            active_per_day = [count + is_open for count, is_open in zip(active_per_day, open_days)]
+    return tasks, active_per_day
+
+
+def current_intervals(tenant, due_from=None):
+    """Returns the interval index, or one built from Firestore (tasks due from due_from) while the listener is not running."""
+    if tenant.cache.listener_active() and tenant.interval_index.loaded:
+        return tenant.interval_index
+    fallback = IntervalIndex()
+    query = tenant.col.where("due", ">=", due_from) if due_from else tenant.col
+    fallback.sync((doc.id, doc.to_dict()) for doc in query.stream())
+    return fallback
+
+
+def search_tasks(tenant, query, limit=None):
+    """Searches task names and courses in memory; reads Firestore only while the listener is not running."""
+    if tenant.indexed():
+        return tenant.search_index.search(query, limit)
+    fallback = TaskIndex()
+    fallback.sync((doc.id, doc.to_dict()) for doc in tenant.col.stream())
+    return fallback.search(query, limit)
+
+
+# --- Writing Tasks ---
+def task_from_form(form):
+    """
+    Reads the add/edit task form.
+
+    Returns:
+        dict: name, course, start, due and status, or None if a required field is empty.
+
+    Raises:
+        ValueError: For an invalid date or time.
+    """
+    fields = [form.get(key) for key in ('name', 'course', 'start_date', 'start_time', 'due_date', 'due_time')]
+    if not all(fields):
+        return None
+    name, course, start_date, start_time, due_date, due_time = fields
+    start_dt = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
+    due_dt = datetime.strptime(f"{due_date} {due_time}", "%Y-%m-%d %H:%M")
+    return {"name": name, "course": course, "start": start_dt.strftime(STORAGE_FORMAT),
+            "due": due_dt.strftime(STORAGE_FORMAT), "status": form.get('status')}
+
+
+def create_recurring_instances(tenant, task, parent_task_id):
+    """Writes the missing future instances of a recurring task in one batch with their counters."""
+    start_dt = datetime.strptime(task["start"], STORAGE_FORMAT)
+    due_dt = datetime.strptime(task["due"], STORAGE_FORMAT)
+    batch = get_db().batch()
+    delta = None
+    pending = 0
+    for new_start, new_due in recurring_instance_dues(start_dt, due_dt, task["recurrence_days"]):
+        due_str = new_due.strftime(STORAGE_FORMAT)
+        if list(tenant.col.where("name", "==", task["name"]).where("due", "==", due_str).limit(1).stream()):
+            continue
+        instance = stamp({
+            "name": task["name"],
+            "course": task["course"],
+            "start": new_start.strftime(STORAGE_FORMAT),
+            "due": due_str,
+            "status": "Not Started",
+            "recurrence_days": task["recurrence_days"],
+            "parent_task_id": str(parent_task_id) if parent_task_id else None,
+            "is_recurring_instance": True
+        })
+        batch.set(tenant.col.document(), instance)
+        delta = counters.diff(None, instance, delta)
+        pending += 1
+    if pending:
+        counters.write_delta(batch, tenant.col, delta)
+        batch.commit()
+
+
+def add_task(tenant, task):
+    """
+    Adds a task (and the future instances of a recurring one).
+
+    Returns:
+        str: A busy-period warning to show, or None.
+    """
+    warning = busy_warning(current_intervals(tenant, task["start"]), task)
+    doc_ref = counters.add_task(tenant.col, stamp(task))
+    if task.get("recurrence_days"):
+        try:
+            create_recurring_instances(tenant, task, doc_ref.id)
+        except Exception as e:
+            print(f"[ERROR] Failed to create future recurring instances: {e}")
+    tenant.cache.invalidate()
+    return warning
+
+
+def update_task(tenant, task_id, fields):
+    """Writes an edit directly, dropping any queued status change it replaces."""
+    tenant.write_queue.discard([task_id])
+    counters.update_task(tenant.col, task_id, stamp(fields))
+    tenant.cache.invalidate()
+
+
+def update_status(tenant, task_id, status):
+    """Queues a status change on the write-behind queue; pages show it straight away."""
+    tenant.write_queue.update(task_id, stamp({"status": status}))
+    tenant.cache.invalidate()
+
+
+def delete_task(tenant, task_id):
+    tenant.write_queue.discard([task_id])
+    delete_tasks(tenant.col, [task_id])
+    tenant.cache.invalidate()
+
+
+def bulk_update(tenant, task_ids, action, days=None):
+    """
+    Applies a status change, reschedule or delete to every selected task in one batched commit.
+
+    Args:
+        tenant (Tenant): The request's tenant.
+        task_ids (list): IDs of the selected tasks.
+        action (str): "delete", "reschedule" or "status:<status>".
+        days (str): Days to move the tasks by, for "reschedule".
+
+    Returns:
+        str: The message to flash.
+
+    Raises:
+        ValueError: For an unknown action or an invalid number of days.
+    """
+    if action == 'delete':
+        tenant.write_queue.discard(task_ids)
+        count = delete_tasks(tenant.col, task_ids)
+        message = f'Deleted {count} tasks.'
+    elif action.startswith('status:') and action[7:] in ACTIVE_STATUSES + DONE_STATUSES:
+        tenant.write_queue.discard(task_ids)
+        count = counters.update_tasks(tenant.col, task_ids, stamp({"status": action[7:]}))
+        message = f'Marked {count} tasks {action[7:]}.'
+    elif action == 'reschedule':
+        try:
+            days = int(days or 0)
+        except ValueError as e:
+            raise ValueError(f'Invalid number of days: {e}')
+        count = counters.update_tasks(tenant.col, task_ids, lambda task: stamp(shift_task(task, days)))
+        message = f'Moved {count} tasks by {days} days.'
+    else:
+        raise ValueError('Unknown bulk action.')
+    tenant.cache.invalidate()
+    return message
+
+
+# --- Background Jobs ---
+# Long operations run on the jobs.py pool; the request only starts them and
+# the browser polls /jobs/<id> for progress.
+DELETE_CHUNK = 1000
+
+
+def delete_all_job(job, tenant):
+    before = {doc.id: doc.to_dict() for doc in tenant.col.select(counters.COUNTED_FIELDS).stream()}
+    doc_ids = list(before)
+    tenant.write_queue.discard(doc_ids)
+    job.progress(0, len(doc_ids), "Deleting tasks")
+    deleted = 0
+    for i in range(0, len(doc_ids), DELETE_CHUNK):
+        deleted += delete_tasks(tenant.col, doc_ids[i:i + DELETE_CHUNK], before)
+        job.progress(deleted)
+    tenant.cache.invalidate()
+    job.progress(deleted, message=f"Deleted {deleted} tasks")
+    return {"deleted": deleted}
+
+
+def export_job(job, tenant, include_archive):
+    job.progress(0, message="Reading tasks")
+    tasks = [tenant.write_queue.overlay(doc.id, doc.to_dict()) for doc in tenant.col.stream()]
+    if include_archive:
+        tasks += [doc.to_dict() for doc in archive_col(tenant.col).stream()]
+    if not tasks:
+        raise ValueError("No tasks to export")
+    job.progress(len(tasks), len(tasks), "Building the spreadsheet")
+    output = tasks_to_excel(tasks)
+    with open(jobs.file_path(job.id, ".xlsx"), "wb") as f:
+        f.write(output.getbuffer())
+    job.progress(len(tasks), message=f"Exported {len(tasks)} tasks")
+    return {"download": f"tasks_{datetime.now().strftime('%m-%d-%y')}.xlsx"}
+
+
+def import_file_job(job, tenant, path):
+    result = import_job(job, tenant.col, path)
+    tenant.cache.invalidate()
+    return result
+
+
+def start_job(kind, tenant, fn, *args):
+    """Queues fn(job, tenant, *args) as a job owned by the tenant's user. Returns the job."""
+    job = jobs.new_job(kind, tenant.uid)
+    jobs.submit(job, fn, tenant, *args)
+    return job
+
+
+def user_job(job_id, uid):
+    """Returns a job record if it exists and was started by this user (jobs are private), else None."""
+    record = jobs.get(job_id)
+    if record is None or record.get("user", "") != uid:
+        return None
+    return record
+
+
+def job_download(job_id, uid):
+    """Returns (path, download name) of a finished export the user started, or None."""
+    record = user_job(job_id, uid)
+    if record is None or record["status"] != "done" or not (record.get("result") or {}).get("download"):
+        return None
+    return jobs.file_path(job_id, ".xlsx"), record["result"]["download"]
+
+
+# --- Reminders ---
+REMINDER_INTERVAL_SECONDS = 60
+# Full reminder scans (first scan of a user, or a stale watermark) per pass; the rest wait for a later pass
+FULL_SCANS_PER_PASS = int(os.getenv("REMINDER_FULL_SCANS_PER_PASS", "8"))
+COUNTER_RECONCILE_HOURS = int(os.getenv("COUNTER_RECONCILE_HOURS", "6"))
+
+
+def needs_full_scan(tenant):
+    return not is_watermark_usable(tenant.reminder_watermark)
+
+
+def refresh_pending_reminders(tenant):
+    """Updates tenant.pending_reminders and returns the number of documents read."""
+    if needs_full_scan(tenant):
+        started = datetime.now(timezone.utc)
+        docs = list(tenant.col.where("reminder_sent", "==", 0).stream())
+        tenant.pending_reminders.clear()
+        for doc in docs:
+            tenant.pending_reminders[doc.id] = doc.to_dict()
+        tenant.reminder_watermark = full_scan_watermark(docs, started)
+        return len(docs)
+
+    changed, deleted, tenant.reminder_watermark = fetch_changes(tenant.col, tenant.reminder_watermark)
+    for doc in changed:
+        task = doc.to_dict()
+        if task.get("reminder_sent", 0) == 0:
+            tenant.pending_reminders[doc.id] = task
+        else:
+            tenant.pending_reminders.pop(doc.id, None)
+    for doc_id in deleted:
+        tenant.pending_reminders.pop(doc_id, None)
+    return len(changed) + len(deleted)
+
+
+def send_reminders(tenant, now, source="web"):
+    """Sends one user's due reminders to their webhook; returns the number of documents read."""
+    scanned = refresh_pending_reminders(tenant)
+    for doc_id, task in list(tenant.pending_reminders.items()):
+        if task.get("status") == "Completed":
+            continue
+        due = datetime.strptime(task["due"], STORAGE_FORMAT)
+        reminder_hours = task.get("reminder_hours", 24)
+        reminder_time = due - timedelta(hours=reminder_hours)
+
+        if reminder_time <= now < due:
+            message = f"Reminder: Your task '{task['name']}' is due at {due.strftime('%I:%M %p')}."
+            try:
+                if not send_discord_message(message, webhook_url(tenant.uid)):
+                    # Left pending, so the next scan tries again
+                    record_reminder_failed(source)
+                    continue
+                record_reminder_sent(source, due, reminder_hours)
+                tenant.col.document(doc_id).update(stamp({"reminder_sent": 1}))
+                tenant.pending_reminders.pop(doc_id, None)
+            except Exception as e:
+                record_reminder_failed(source)
+                print(f"Failed to send Discord reminder: {e}")
+    return scanned
+
+
+def check_reminders(registry, source="web"):
+    """One reminder pass over every user, with at most FULL_SCANS_PER_PASS full scans."""
+    if registry.db is None:
+        return
+    now = datetime.now()
+    scan_start = time.perf_counter()
+    scanned = 0
+    full_scans = 0
+    for uid in registry.each_user():
+        tenant = registry.get(uid, touch=False)
+        if needs_full_scan(tenant):
+            if full_scans >= FULL_SCANS_PER_PASS:
+                continue
+            full_scans += 1
+        try:
+            scanned += send_reminders(tenant, now, source)
+        except Exception as e:
+            print(f"[ERROR] Reminder scan for user {uid or '(shared)'} failed: {e}")
+
+    record_reminder_scan(source, time.perf_counter() - scan_start, scanned, REMINDER_INTERVAL_SECONDS)
+
+
+_scheduler = None
+
+
+def start_scheduler(registry, source="web"):
+    """
+    Starts the reminder scheduler and the daily jobs once per process.
+
+    APScheduler is imported here, not at import time.
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+    _scheduler = BackgroundScheduler(daemon=True)
+    _scheduler.add_job(check_reminders, 'interval', seconds=REMINDER_INTERVAL_SECONDS, args=[registry, source])
+    if registry.db is not None:
+        _scheduler.add_job(registry.for_each_user, 'interval', days=1, args=[prune_deletion_log])
+        _scheduler.add_job(registry.for_each_user, 'interval', days=1, args=[archive_tasks])
+        _scheduler.add_job(registry.for_each_user, 'interval', hours=COUNTER_RECONCILE_HOURS,
+                           args=[counters.reconcile])
+    _scheduler.start()
+    start_summary_logger(source)
+    return _scheduler
+
+
+def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
@@ -0,0 +1,196 @@
+"""
+Write-behind module for Task Manager
+Queues quick task edits (status changes) and writes them to Firestore in batches
+
+Updates are merged per task while they wait, so cycling a task through
+several statuses within WRITE_BEHIND_DELAY seconds costs one write.
+Callers show the change immediately by overlaying pending fields on the
+tasks they display (overlay()). Failed flushes are retried with
+exponential backoff; newer edits to the same task always win over the
+failed ones they are merged with. A task whose write failed is retried on
+its own, so one bad update cannot hold back the rest of a batch, and after
+MAX_FLUSH_ATTEMPTS failures its update is dropped and on_drop is called
+(the web app invalidates its pages there, so they show the stored task
+again). discard() waits for a flush that is
+writing one of its tasks, so a queued status can never land after the
+direct edit that replaced it.
+"""
+import atexit
+import os
+import threading
+import time
+import counters
+from metrics import inc, describe
+
+WRITE_BEHIND_DELAY = float(os.getenv("WRITE_BEHIND_DELAY", "1.0"))
+MAX_BACKOFF_SECONDS = 30
+# Failed writes of one task's update before it is given up
+MAX_FLUSH_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
+
+describe("write_behind_updates_total", "Task updates queued for write-behind")
+describe("write_behind_coalesced_total", "Queued updates merged into an already pending write")
+describe("write_behind_flushes_total", "Write-behind flushes, by result")
+describe("write_behind_dropped_total", "Queued task updates given up after MAX_FLUSH_ATTEMPTS failed writes")
+
+
+class WriteBehindQueue:
+    """
+    Per-process queue of pending task updates, flushed by a background thread.
+
+    Args:
+        col: The tasks collection.
+        delay (float): Seconds an update waits for further edits to the same task.
+        on_flush (callable): Called with no arguments after each successful flush.
+        on_drop (callable): Called with the IDs of tasks whose updates were given up.
+    """
+
+    def __init__(self, col, delay=WRITE_BEHIND_DELAY, on_flush=None, on_drop=None):
+        self.col = col
+        self.delay = delay
+        self.on_flush = on_flush
+        self.on_drop = on_drop
+        self._cond = threading.Condition()
+        self._pending = {}
+        # IDs the current flush is writing; discard() waits for them
+        self._inflight = set()
+        # One flush at a time (the flusher thread, atexit and explicit calls)
+        self._flush_lock = threading.Lock()
+        self._due_at = None
+        self._failures = 0
+        # Failed writes so far per task, for tasks whose last write failed
+        self._attempts = {}
+        self._thread = None
+        self._pid = None
+
+    def update(self, doc_id, fields):
+        """
+        Queues fields for a task, merging them into any update still waiting for it.
+
+        Args:
+            doc_id (str): ID of the task.
+            fields (dict): Fields to update (already stamped).
+        """
+        with self._cond:
+            if doc_id in self._pending:
+                self._pending[doc_id].update(fields)
+                inc("write_behind_coalesced_total")
+            else:
+                self._pending[doc_id] = dict(fields)
+            if self._due_at is None:
+                self._due_at = time.monotonic() + self.delay
+            inc("write_behind_updates_total")
+            self._ensure_thread()
+            self._cond.notify()
+
+    def overlay(self, doc_id, task):
+        """Returns the task with its pending (unflushed) fields applied."""
+        with self._cond:
+            pending = self._pending.get(doc_id)
+            if not pending:
+                return task
+            # updated_at is a server timestamp sentinel until the write lands
+            return {**task, **{key: value for key, value in pending.items() if key != "updated_at"}}
+
+    def discard(self, doc_ids):
+        """
+        Drops pending updates for tasks that a direct write is about to overwrite.
+
+        If a flush is writing one of the tasks, waits until it has committed (or
+        failed and been requeued, in which case it is dropped too).
+        """
+        doc_ids = set(doc_ids)
+        with self._cond:
+            while self._inflight & doc_ids:
+                self._cond.wait()
+            for doc_id in doc_ids:
+                self._pending.pop(doc_id, None)
+                self._attempts.pop(doc_id, None)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Writes everything pending now, in one batched commit per counters.BULK_CHUNK tasks.
+
+        Tasks whose previous write failed are written one per commit.
+
+        Returns:
+            bool: True if every write succeeded (or nothing was pending).
+        """
+        with self._flush_lock:
+            with self._cond:
+                updates, self._pending = self._pending, {}
+                self._inflight = set(updates)
+                self._due_at = None
+            if not updates:
+                return True
+            fresh = {doc_id: fields for doc_id, fields in updates.items() if doc_id not in self._attempts}
+            groups = ([fresh] if fresh else []) + [{doc_id: fields} for doc_id, fields in updates.items()
+                                                   if doc_id not in fresh]
+            failed = {}
+            error = None
+            for group in groups:
+                try:
+                    counters.update_each(self.col, group)
+                except Exception as e:
+                    failed.update(group)
+                    error = e
+            dropped = []
+            with self._cond:
+                for doc_id, fields in updates.items():
+                    if doc_id not in failed:
+                        self._attempts.pop(doc_id, None)
+                        continue
+                    attempts = self._attempts.get(doc_id, 0) + 1
+                    if attempts >= MAX_FLUSH_ATTEMPTS:
+                        # Edits queued meanwhile are newer and still stand
+                        self._attempts.pop(doc_id, None)
+                        dropped.append(doc_id)
+                        continue
+                    self._attempts[doc_id] = attempts
+                    # Put the failed fields back underneath anything queued meanwhile
+                    self._pending[doc_id] = {**fields, **self._pending.get(doc_id, {})}
+                if failed:
+                    self._failures += 1
+                    backoff = min(MAX_BACKOFF_SECONDS, self.delay * 2 ** self._failures)
+                    if self._pending:
+                        self._due_at = time.monotonic() + backoff
+                else:
+                    self._failures = 0
+                self._inflight = set()
+                self._cond.notify_all()
+        if dropped:
+            inc("write_behind_dropped_total", len(dropped))
+            print(f"[ERROR] Gave up on queued updates for tasks {', '.join(dropped)} after "
+                  f"{MAX_FLUSH_ATTEMPTS} failed writes: {error}")
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+        if failed:
+            inc("write_behind_flushes_total", result="error")
+            if len(failed) > len(dropped):
+                print(f"[ERROR] Write-behind flush of {len(failed) - len(dropped)} tasks failed, "
+                      f"retrying in {backoff:.1f}s: {error}")
+            return False
+        inc("write_behind_flushes_total", result="ok")
+        if self.on_flush is not None:
+            self.on_flush()
+        return True
+
+    def _ensure_thread(self):
+        # Called with the lock held; the flusher thread does not survive a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="write-behind")
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._due_at is None or time.monotonic() < self._due_at:
+                    timeout = None if self._due_at is None else self._due_at - time.monotonic()
+                    self._cond.wait(timeout)
+            self.flush()